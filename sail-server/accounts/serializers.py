@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
 
+from taxonomy.tree import get_tree
+
 from . import models
 from .models import Profile
 
@@ -67,13 +69,9 @@ class ProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ["phone_e164", "created_at", "telegram_id", "telegram_username", "telegram_photo_url"]
 
     def get_location_name(self, obj):
-        if obj.location:
+        if obj.location_id:
             # Return full path like "Ташкент > Мирзо-Улугбекский район"
-            parts = []
-            loc = obj.location
-            while loc:
-                parts.insert(0, loc.name)
-                loc = loc.parent if hasattr(loc, 'parent') else None
+            parts = [loc.name for loc in get_tree().location_ancestors(obj.location_id)]
             return " > ".join(parts) if parts else obj.location.name
         return None
 
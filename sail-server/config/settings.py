@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     "moderation",
     "chat",
     "currency",
+    "recommendations",
 ]
 
 MIDDLEWARE = [
@@ -113,6 +114,21 @@ else:
             cursor.execute('PRAGMA journal_mode=WAL;')
             cursor.execute('PRAGMA busy_timeout=20000;')  # 20 seconds
 
+# Cache: must be shared by every web and Celery process in production. Version
+# and generation keys (taxonomy and rate snapshots, search caches), locks and
+# work queues all live here; a per-process cache leaves other processes stale.
+# Without CACHE_URL/REDIS_URL (dev, tasks run eagerly) a local memory cache is used.
+CACHE_URL = os.environ.get("CACHE_URL") or os.environ.get("REDIS_URL")
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 LANGUAGE_CODE = os.environ.get("LANGUAGE_CODE", "ru")
 LANGUAGES = (
     ("ru", "Russian"),
@@ -170,6 +186,54 @@ REST_FRAMEWORK = {
 OPENSEARCH_URL = os.environ.get("OPENSEARCH_URL", "http://localhost:9200")
 OPENSEARCH_INDEX_PREFIX = os.environ.get("OPENSEARCH_INDEX_PREFIX", "olxclone")
 OPENSEARCH_INDEX_VERSION = int(os.environ.get("OPENSEARCH_INDEX_VERSION", "2"))
+# Process-wide client: keep-alive pool size and per-request timeout (seconds)
+OPENSEARCH_POOL_MAXSIZE = int(os.environ.get("OPENSEARCH_POOL_MAXSIZE", "10"))
+OPENSEARCH_TIMEOUT = float(os.environ.get("OPENSEARCH_TIMEOUT", "5"))
+OPENSEARCH_MAX_RETRIES = int(os.environ.get("OPENSEARCH_MAX_RETRIES", "1"))
+# Cached ping TTL and circuit breaker (consecutive failures / seconds open)
+OPENSEARCH_HEALTH_TTL = float(os.environ.get("OPENSEARCH_HEALTH_TTL", "10"))
+OPENSEARCH_BREAKER_THRESHOLD = int(os.environ.get("OPENSEARCH_BREAKER_THRESHOLD", "3"))
+OPENSEARCH_BREAKER_COOLDOWN = float(os.environ.get("OPENSEARCH_BREAKER_COOLDOWN", "30"))
+# Seconds to coalesce listing changes before the index outbox is drained
+SEARCH_OUTBOX_WINDOW = int(os.environ.get("SEARCH_OUTBOX_WINDOW", "2"))
+# Seconds facets stay cached per filter set (index writes invalidate them sooner)
+SEARCH_FACET_CACHE_TTL = int(os.environ.get("SEARCH_FACET_CACHE_TTL", "300"))
+# Anonymous search responses: cache TTL and how long concurrent misses wait for the first one
+SEARCH_RESPONSE_CACHE_TTL = int(os.environ.get("SEARCH_RESPONSE_CACHE_TTL", "30"))
+SEARCH_RESPONSE_CACHE_WAIT = float(os.environ.get("SEARCH_RESPONSE_CACHE_WAIT", "2"))
+# Compiled query bodies are reused for this long (price bounds depend on exchange rates)
+SEARCH_COMPILED_QUERY_TTL = int(os.environ.get("SEARCH_COMPILED_QUERY_TTL", "60"))
+
+# Seconds between checks of the shared taxonomy version (in-process tree snapshot)
+TAXONOMY_VERSION_CHECK_INTERVAL = float(os.environ.get("TAXONOMY_VERSION_CHECK_INTERVAL", "5"))
+# Seconds after which a snapshot is reloaded even if no version bump was seen
+TAXONOMY_MAX_SNAPSHOT_AGE = float(os.environ.get("TAXONOMY_MAX_SNAPSHOT_AGE", "300"))
+
+# Browser/CDN max-age of the pre-rendered taxonomy endpoints; 0 = revalidate by ETag on every use.
+# Taxonomy edits reach clients only after this many seconds.
+TAXONOMY_CACHE_MAX_AGE = int(os.environ.get("TAXONOMY_CACHE_MAX_AGE", "0"))
+
+# Seconds between checks of the shared currency rates version (in-process rate snapshot)
+CURRENCY_RATES_VERSION_CHECK_INTERVAL = float(os.environ.get("CURRENCY_RATES_VERSION_CHECK_INTERVAL", "5"))
+# Seconds after which the rates snapshot is reloaded even if no version bump was seen
+CURRENCY_RATES_MAX_SNAPSHOT_AGE = float(os.environ.get("CURRENCY_RATES_MAX_SNAPSHOT_AGE", "300"))
+
+# Seconds listing view/interest increments are buffered per process before a bulk flush (0 = write through)
+LISTING_COUNTER_FLUSH_INTERVAL = float(os.environ.get("LISTING_COUNTER_FLUSH_INTERVAL", "10"))
+# Recently viewed: batch flush interval, entries kept per user/session, anonymous retention
+RECENTLY_VIEWED_FLUSH_INTERVAL = float(os.environ.get("RECENTLY_VIEWED_FLUSH_INTERVAL", "5"))
+RECENTLY_VIEWED_MAX_PER_OWNER = int(os.environ.get("RECENTLY_VIEWED_MAX_PER_OWNER", "50"))
+RECENTLY_VIEWED_SESSION_RETENTION_DAYS = int(os.environ.get("RECENTLY_VIEWED_SESSION_RETENTION_DAYS", "30"))
+# Daily saved-search digest: saved searches per subtask, queries per _msearch, concurrent Telegram senders
+SAVED_SEARCH_SHARD_SEARCHES = int(os.environ.get("SAVED_SEARCH_SHARD_SEARCHES", "5000"))
+SAVED_SEARCH_MSEARCH_BATCH = int(os.environ.get("SAVED_SEARCH_MSEARCH_BATCH", "50"))
+SAVED_SEARCH_SENDER_WORKERS = int(os.environ.get("SAVED_SEARCH_SENDER_WORKERS", "8"))
+# Recommendations: neighbours kept per listing, co-view history window and minimum shared viewers
+RECOMMENDATIONS_TOP_K = int(os.environ.get("RECOMMENDATIONS_TOP_K", "20"))
+RECOMMENDATIONS_COVIEW_WINDOW_DAYS = int(os.environ.get("RECOMMENDATIONS_COVIEW_WINDOW_DAYS", "90"))
+RECOMMENDATIONS_COVIEW_MIN_SUPPORT = int(os.environ.get("RECOMMENDATIONS_COVIEW_MIN_SUPPORT", "2"))
+# Recent listings per category compared with each incrementally updated listing
+RECOMMENDATIONS_CONTENT_CANDIDATES = int(os.environ.get("RECOMMENDATIONS_CONTENT_CANDIDATES", "5000"))
 
 # Celery (defaults are set in config/celery.py)
 CELERY_TASK_SOFT_TIME_LIMIT = int(os.environ.get("CELERY_TASK_SOFT_TIME_LIMIT", "30"))
@@ -183,6 +247,50 @@ CELERY_BEAT_SCHEDULE = {
         "schedule": crontab(hour=9, minute=0),  # Run daily at 9:00 AM
         "options": {"expires": 3600},  # Expire after 1 hour if not picked up
     },
+    # Safety net for instant alerts whose delivery task was lost
+    "send-instant-saved-search-alerts": {
+        "task": "savedsearches.send_instant_alerts",
+        "schedule": 300.0,
+        "options": {"expires": 300},
+    },
+    "expire-listings": {
+        "task": "listings.expire_listings",
+        "schedule": crontab(minute=5),  # Hourly
+        "options": {"expires": 3600},
+    },
+    # Incremental listing counts drift with bulk updates and taxonomy moves
+    "reconcile-listing-counts": {
+        "task": "listings.reconcile_listing_counts",
+        "schedule": crontab(hour=3, minute=0),
+        "options": {"expires": 3600},
+    },
+    "expire-recently-viewed": {
+        "task": "favorites.expire_recently_viewed",
+        "schedule": crontab(hour=4, minute=0),
+        "options": {"expires": 3600},
+    },
+    "build-coview-recommendations": {
+        "task": "recommendations.build_coview",
+        "schedule": crontab(hour=4, minute=30),
+        "options": {"expires": 3600},
+    },
+    "build-content-recommendations": {
+        "task": "recommendations.build_content",
+        "schedule": crontab(hour=5, minute=0),
+        "options": {"expires": 3600},
+    },
+    # Repairs index documents that drifted from the database
+    "reconcile-search-index": {
+        "task": "search.reconcile_index",
+        "schedule": crontab(hour=3, minute=30),
+        "options": {"expires": 3600},
+    },
+    # Safety net for outbox events whose scheduled drain failed (e.g. cluster down)
+    "drain-search-index-outbox": {
+        "task": "search.drain_outbox",
+        "schedule": 60.0,
+        "options": {"expires": 60},
+    },
 }
 
 # SimpleJWT defaults can be overridden via env later if needed
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CurrencyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'currency'
+
+    def ready(self):  # pragma: no cover
+        from . import signals  # noqa: F401
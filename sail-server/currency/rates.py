@@ -0,0 +1,217 @@
+"""
+Process-local snapshot of currency exchange rates.
+
+Prices are converted for every serialized listing, every indexed document
+and several times per search, so the active currencies and rates are
+loaded whole (two queries) into an immutable matrix holding a rate for
+every pair it can derive: direct rates first, then inverses of direct
+rates, then cross rates through the base currency. Conversions are dict
+lookups with no cache round-trips.
+
+Any change to Currency or ExchangeRate bumps a version number in the shared
+cache (see ``currency.signals``); each process notices the new version
+within ``CURRENCY_RATES_VERSION_CHECK_INTERVAL`` seconds and reloads.
+That requires the shared cache backend (see ``CACHES`` in settings). A
+snapshot older than ``CURRENCY_RATES_MAX_SNAPSHOT_AGE`` seconds is reloaded
+regardless, so a lost bump cannot pin stale rates.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Currency, ExchangeRate
+
+VERSION_KEY = "currency:rates:version"
+ONE = Decimal("1")
+
+
+class RateSnapshot:
+    """Immutable once built; a reload builds a new instance and swaps it in."""
+
+    __slots__ = ("version", "base", "codes", "_matrix")
+
+    def __init__(self, version: int, base: Optional[str], codes: Tuple[str, ...], matrix: Dict[Tuple[str, str], Decimal]):
+        self.version = version
+        self.base = base
+        self.codes = codes
+        self._matrix: Mapping[Tuple[str, str], Decimal] = MappingProxyType(matrix)
+
+    @classmethod
+    def load(cls, version: int) -> "RateSnapshot":
+        currencies = list(Currency.objects.values_list("code", "is_active", "is_default"))
+        active = {code for code, is_active, _ in currencies if is_active}
+        # Same choice as CurrencyService.get_default_currency
+        base = next((code for code, _, is_default in currencies if is_default), None)
+        if base is None and any(code == "UZS" for code, _, _ in currencies):
+            base = "UZS"
+
+        direct: Dict[Tuple[str, str], Decimal] = {}
+        rows = ExchangeRate.objects.filter(
+            is_active=True, from_currency__is_active=True, to_currency__is_active=True
+        ).values_list("from_currency__code", "to_currency__code", "rate")
+        for from_code, to_code, rate in rows:
+            direct[(from_code, to_code)] = rate
+        return cls(version, base, tuple(sorted(active)), _derive_matrix(active, direct, base))
+
+    def rate(self, from_code: str, to_code: str) -> Optional[Decimal]:
+        """Units of ``to_code`` per unit of ``from_code``; None if no rate can be derived."""
+        if from_code == to_code:
+            return ONE
+        return self._matrix.get((from_code, to_code))
+
+    def to_base(self, amount: Optional[Decimal], currency: str) -> Decimal:
+        """
+        ``amount`` in the base currency.
+
+        Amounts without a known rate are returned unchanged, as
+        ``CurrencyService.normalize_price_to_base`` always did.
+        """
+        if not amount:
+            return Decimal("0")
+        amount = _decimal(amount)
+        rate = ONE if self.base is None else self.rate(currency, self.base)
+        return amount * rate if rate is not None else amount
+
+    def convert_many(
+        self, amounts: Iterable[Optional[Decimal]], currencies: Iterable[str], to: Optional[str] = None
+    ) -> List[Decimal]:
+        """
+        Convert ``amounts[i]`` from ``currencies[i]`` into ``to`` (the base currency by default).
+
+        Looks up one factor per distinct currency. Like ``to_base``, amounts
+        without a known rate are returned unchanged and missing amounts are 0.
+        """
+        target = to or self.base
+        factors: Dict[str, Decimal] = {}
+        out: List[Decimal] = []
+        for amount, code in zip(amounts, currencies):
+            factor = factors.get(code)
+            if factor is None:
+                rate = ONE if target is None else self.rate(code, target)
+                factor = factors[code] = rate if rate is not None else ONE
+            out.append(_decimal(amount) * factor if amount else Decimal("0"))
+        return out
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """Nested ``{from: {to: rate}}`` of every known pair, identities included."""
+        rates: Dict[str, Dict[str, float]] = {code: {code: 1.0} for code in self.codes}
+        for (from_code, to_code), rate in self._matrix.items():
+            rates.setdefault(from_code, {})[to_code] = float(rate)
+        return rates
+
+
+def _decimal(amount) -> Decimal:
+    return amount if isinstance(amount, Decimal) else Decimal(str(amount))
+
+
+def _derive_matrix(
+    codes: Iterable[str], direct: Dict[Tuple[str, str], Decimal], base: Optional[str]
+) -> Dict[Tuple[str, str], Decimal]:
+    edges = dict(direct)
+    for (from_code, to_code), rate in direct.items():
+        edges.setdefault((to_code, from_code), ONE / rate)
+
+    # Factor to the base currency along the fewest conversions, direct rates
+    # preferred at each step
+    factors: Dict[str, Decimal] = {}
+    if base is not None:
+        incoming: Dict[str, List[Tuple[str, Decimal]]] = {}
+        for (from_code, to_code), rate in sorted(edges.items(), key=lambda e: e[0] not in direct):
+            incoming.setdefault(to_code, []).append((from_code, rate))
+        factors[base] = ONE
+        queue = deque([base])
+        while queue:
+            code = queue.popleft()
+            for from_code, rate in incoming.get(code, []):
+                if from_code not in factors:
+                    factors[from_code] = rate * factors[code]
+                    queue.append(from_code)
+
+    matrix: Dict[Tuple[str, str], Decimal] = {}
+    for a in codes:
+        for b in codes:
+            if a == b:
+                continue
+            if (a, b) in edges:
+                matrix[(a, b)] = edges[(a, b)]
+            elif a in factors and b in factors:
+                matrix[(a, b)] = factors[a] / factors[b]
+    return matrix
+
+
+_lock = threading.Lock()
+_state = {"snapshot": None, "checked_at": 0.0, "loaded_at": 0.0}
+
+
+def current_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a version lost to eviction never repeats
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY, 0)
+    return int(version)
+
+
+def bump_version() -> None:
+    """Make every process reload its rates; called when currencies or rates change."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+    # This process doesn't wait for the next version check
+    _state["checked_at"] = 0.0
+
+
+def cached_snapshot() -> Optional[RateSnapshot]:
+    """This process's snapshot as loaded, without checking for a newer version."""
+    return _state["snapshot"]
+
+
+def changed_currencies(before: Optional[RateSnapshot], after: RateSnapshot) -> Optional[List[str]]:
+    """
+    Currencies whose factor to the base currency differs between two snapshots.
+
+    Cross rates go through other currencies (EUR → USD → UZS), so editing one
+    pair can move currencies that are not part of it. None when the base
+    currency changed or ``before`` is unknown: every price may have moved.
+    """
+    if before is None or before.base is None or before.base != after.base:
+        return None
+    base = after.base
+    codes = set(before.codes) | set(after.codes)
+    return sorted(code for code in codes if before.rate(code, base) != after.rate(code, base))
+
+
+def get_rates(refresh: bool = False) -> RateSnapshot:
+    """
+    Return the current snapshot, reloading it if the shared version moved on.
+
+    ``refresh`` reloads from the database unconditionally; batch jobs that
+    run right after a rate change (``listings.renormalize_prices``) use it
+    rather than wait for the next version check.
+    """
+    snapshot: Optional[RateSnapshot] = _state["snapshot"]
+    now = time.monotonic()
+    interval = float(getattr(settings, "CURRENCY_RATES_VERSION_CHECK_INTERVAL", 5))
+    if not refresh and snapshot is not None and now - _state["checked_at"] < interval:
+        return snapshot
+    version = current_version()
+    _state["checked_at"] = now
+    max_age = float(getattr(settings, "CURRENCY_RATES_MAX_SNAPSHOT_AGE", 300))
+    if not refresh and snapshot is not None and snapshot.version == version and now - _state["loaded_at"] < max_age:
+        return snapshot
+    with _lock:
+        snapshot = _state["snapshot"]
+        if refresh or snapshot is None or snapshot.version != version or now - _state["loaded_at"] >= max_age:
+            snapshot = RateSnapshot.load(version)
+            _state["snapshot"] = snapshot
+            _state["loaded_at"] = now
+        return snapshot
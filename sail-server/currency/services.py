@@ -1,9 +1,10 @@
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 
 from django.core.cache import cache
 
-from .models import Currency, ExchangeRate
+from .models import Currency
+from .rates import bump_version, get_rates
 
 
 class CurrencyService:
@@ -47,57 +48,13 @@ class CurrencyService:
 
     @staticmethod
     def get_exchange_rates():
-        """Get all active exchange rates as a nested dictionary"""
-        cache_key = "currency:exchange_rates"
-        rates = cache.get(cache_key)
-
-        if rates is None:
-            rates = {}
-            for er in ExchangeRate.objects.filter(is_active=True).select_related(
-                "from_currency", "to_currency"
-            ):
-                from_code = er.from_currency.code
-                to_code = er.to_currency.code
-
-                if from_code not in rates:
-                    rates[from_code] = {}
-
-                rates[from_code][to_code] = float(er.rate)
-
-            # Add identity rates (USD -> USD = 1.0)
-            for currency in Currency.objects.filter(is_active=True):
-                code = currency.code
-                if code not in rates:
-                    rates[code] = {}
-                rates[code][code] = 1.0
-
-            cache.set(cache_key, rates, CurrencyService.CACHE_TIMEOUT)
-
-        return rates
+        """Get all exchange rates, including derived cross rates, as a nested dictionary"""
+        return get_rates().as_dict()
 
     @staticmethod
     def get_exchange_rate(from_currency: str, to_currency: str) -> Optional[Decimal]:
         """Get exchange rate between two currencies"""
-        if from_currency == to_currency:
-            return Decimal("1.0")
-
-        cache_key = f"currency:rate:{from_currency}:{to_currency}"
-        rate = cache.get(cache_key)
-
-        if rate is None:
-            try:
-                from_curr = Currency.objects.get(code=from_currency, is_active=True)
-                to_curr = Currency.objects.get(code=to_currency, is_active=True)
-
-                exchange_rate = ExchangeRate.objects.get(
-                    from_currency=from_curr, to_currency=to_curr, is_active=True
-                )
-                rate = exchange_rate.rate
-                cache.set(cache_key, rate, CurrencyService.CACHE_TIMEOUT)
-            except (Currency.DoesNotExist, ExchangeRate.DoesNotExist):
-                return None
-
-        return rate
+        return get_rates().rate(from_currency, to_currency)
 
     @staticmethod
     def convert_price(
@@ -126,28 +83,15 @@ class CurrencyService:
         Normalize price to base currency (UZS) for consistent sorting.
         Returns the amount in UZS regardless of original currency.
         """
-        if amount is None or amount == 0:
-            return Decimal("0")
+        return get_rates().to_base(amount, currency)
 
-        default_currency = CurrencyService.get_default_currency()
-        if not default_currency:
-            return amount
-
-        base_currency_code = default_currency.code
-
-        if currency == base_currency_code:
-            return amount
-
-        converted = CurrencyService.convert_price(amount, currency, base_currency_code)
-        return converted if converted is not None else amount
+    @staticmethod
+    def convert_many(amounts, currencies, to_currency: Optional[str] = None) -> List[Decimal]:
+        """Convert many prices at once (to the base currency by default), see RateSnapshot.convert_many"""
+        return get_rates().convert_many(amounts, currencies, to_currency)
 
     @staticmethod
     def clear_cache():
         """Clear all currency-related cache"""
-        cache.delete("currency:active_currencies")
-        cache.delete("currency:default")
-        cache.delete("currency:exchange_rates")
-        # Also clear individual exchange rate caches if needed
-        for from_curr in Currency.objects.filter(is_active=True):
-            for to_curr in Currency.objects.filter(is_active=True):
-                cache.delete(f"currency:rate:{from_curr.code}:{to_curr.code}")
+        cache.delete_many(["currency:active_currencies", "currency:default"])
+        bump_version()
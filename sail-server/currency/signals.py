@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Currency, ExchangeRate
+from .rates import bump_version, cached_snapshot, changed_currencies, get_rates
+from .services import CurrencyService
+
+
+def _rates_changed(currencies) -> None:
+    from listings.tasks import task_renormalize_listing_prices
+    from savedsearches.tasks import task_resync_priced_percolator
+    from searchapp.views.generation import bump_generation
+    from searchapp.views.opensearch_client import get_client
+    from searchapp.views.query_builder import clear_compiled_queries
+    from searchapp.views.renormalize import request_renormalize
+
+    CurrencyService.clear_cache()
+    clear_compiled_queries()
+    # Cached search pages were computed with the old rates
+    bump_generation()
+    task_renormalize_listing_prices.delay(currencies)
+    if get_client() is not None:
+        request_renormalize(currencies)
+        # Percolator queries hold price bounds converted with the old rates
+        task_resync_priced_percolator.delay(currencies)
+
+
+def _exchange_rate_changed(before, pair) -> None:
+    # Every currency whose conversion to base moved, including cross rates
+    # that went through the edited pair; the pair itself always
+    currencies = changed_currencies(before, get_rates(refresh=True))
+    _rates_changed(None if currencies is None else sorted(set(currencies) | set(pair)))
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def on_exchange_rate_changed(sender, instance, **kwargs):
+    pair = [instance.from_currency.code, instance.to_currency.code]
+    # The rates from before this change, unless this process never loaded any
+    before = cached_snapshot()
+    # This connection's own reads see the new rates right away; the commit
+    # hook bumps again so other processes never keep pre-commit rates
+    bump_version()
+    transaction.on_commit(lambda: _exchange_rate_changed(before, pair))
+
+
+@receiver(post_save, sender=Currency)
+@receiver(post_delete, sender=Currency)
+def on_currency_changed(sender, instance, **kwargs):
+    # A new default currency changes every normalized price
+    currencies = None if instance.is_default else [instance.code]
+    bump_version()
+    transaction.on_commit(lambda: _rates_changed(currencies))
@@ -1,3 +1,63 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from currency.models import Currency, ExchangeRate
+from currency.rates import get_rates
+from currency.services import CurrencyService
+
+
+class RateSnapshotTests(TestCase):
+    def setUp(self):
+        uzs = Currency.objects.create(code="UZS", name="Sum", symbol="so'm", is_default=True)
+        usd = Currency.objects.create(code="USD", name="Dollar", symbol="$")
+        eur = Currency.objects.create(code="EUR", name="Euro", symbol="€")
+        ExchangeRate.objects.create(from_currency=usd, to_currency=uzs, rate=Decimal("12500"))
+        self.eur_usd = ExchangeRate.objects.create(from_currency=eur, to_currency=usd, rate=Decimal("1.1"))
+
+    def test_cross_rates_and_batch_conversion(self):
+        rates = get_rates()
+        self.assertEqual(rates.rate("UZS", "USD"), Decimal("1") / Decimal("12500"))
+        # EUR → USD → UZS, though no EUR/UZS rate is stored
+        self.assertEqual(rates.rate("EUR", "UZS"), Decimal("13750"))
+        self.assertEqual(
+            CurrencyService.convert_many([Decimal("2"), Decimal("1"), None, Decimal("5")], ["USD", "EUR", "USD", "GBP"]),
+            [Decimal("25000"), Decimal("13750"), Decimal("0"), Decimal("5")],
+        )
+
+    def test_rate_change_replaces_snapshot(self):
+        before = get_rates()
+        self.eur_usd.rate = Decimal("1.2")
+        self.eur_usd.save()
+        after = get_rates()
+        self.assertIsNot(after, before)
+        self.assertEqual(before.rate("EUR", "UZS"), Decimal("13750"))
+        self.assertEqual(CurrencyService.normalize_price_to_base(Decimal("10"), "EUR"), Decimal("150000"))
+
+    def test_refresh_reads_rates_without_a_bump(self):
+        get_rates()
+        # An update that fires no signal, so no version bump
+        ExchangeRate.objects.filter(pk=self.eur_usd.pk).update(rate=Decimal("1.2"))
+        self.assertEqual(get_rates().rate("EUR", "UZS"), Decimal("13750"))
+        self.assertEqual(get_rates(refresh=True).rate("EUR", "UZS"), Decimal("15000"))
+
+    def test_rate_change_renormalizes_cross_rated_currencies(self):
+        from unittest import mock
+
+        from currency import signals
+
+        get_rates()
+        usd_uzs = ExchangeRate.objects.get(from_currency__code="USD")
+        usd_uzs.rate = Decimal("13000")
+        with mock.patch.object(signals, "_rates_changed") as changed:
+            with self.captureOnCommitCallbacks(execute=True):
+                usd_uzs.save()
+        # EUR has no UZS rate of its own but converts through USD
+        changed.assert_called_once_with(["EUR", "USD", "UZS"])
+
+        with mock.patch.object(signals, "_rates_changed") as changed:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.eur_usd.save()
+        changed.assert_called_once_with(["EUR", "USD"])
@@ -0,0 +1,222 @@
+"""
+Buffered recently-viewed log.
+
+Tracking a view used to cost a listing lookup plus an ``update_or_create``
+per request. Views are now appended to a per-process buffer and upserted in
+batches every ``RECENTLY_VIEWED_FLUSH_INTERVAL`` seconds. Each flush also
+trims every touched history to ``RECENTLY_VIEWED_MAX_PER_OWNER`` entries;
+old anonymous histories are removed by ``task_expire_recently_viewed``.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from listings.counters import record_view
+from listings.models import Listing
+
+from .models import RecentlyViewedListing
+
+logger = logging.getLogger(__name__)
+
+# Owner of a history: ("user", user_id) or ("session", session_key)
+Owner = Tuple[str, object]
+
+_lock = threading.Lock()
+# (owner, listing_id) -> latest view time
+_buffer: Dict[Tuple[Owner, int], datetime] = {}
+_state = {"pid": None}
+
+
+def _owner(user_id: Optional[int], session_key: Optional[str]) -> Owner:
+    # session_key is capped at the column length; longer client ids used to fail the insert
+    return ("user", user_id) if user_id else ("session", (session_key or "")[:40])
+
+
+def record(listing_id: int, user_id: Optional[int] = None, session_key: Optional[str] = None) -> None:
+    """Queue a view by a user or an anonymous session; returns without touching the database."""
+    owner = _owner(user_id, session_key)
+    with _lock:
+        _buffer[(owner, int(listing_id))] = timezone.now()
+    if _interval() <= 0:
+        flush()
+    else:
+        _ensure_flusher()
+
+
+def discard(user_id: Optional[int] = None, session_key: Optional[str] = None) -> None:
+    """Drop this process's unflushed views of one history (used when it is cleared)."""
+    owner = _owner(user_id, session_key)
+    with _lock:
+        for key in [k for k in _buffer if k[0] == owner]:
+            del _buffer[key]
+
+
+def _interval() -> float:
+    return float(getattr(settings, "RECENTLY_VIEWED_FLUSH_INTERVAL", 5))
+
+
+def _ensure_flusher() -> None:
+    # One flusher thread per process; a forked worker starts its own
+    if _state["pid"] == os.getpid():
+        return
+    with _lock:
+        if _state["pid"] == os.getpid():
+            return
+        _state["pid"] = os.getpid()
+        threading.Thread(target=_flush_loop, name="recently-viewed", daemon=True).start()
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(_interval())
+        try:
+            flush()
+        except Exception:  # pragma: no cover - keep the thread alive
+            logger.exception("Recently viewed flush failed")
+        finally:
+            connection.close()
+
+
+def flush() -> int:
+    """Upsert all buffered views; returns the number of new history rows."""
+    with _lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+    if not pending:
+        return 0
+    try:
+        return _write(pending)
+    except Exception:
+        with _lock:
+            for key, viewed_at in pending.items():
+                _buffer[key] = max(viewed_at, _buffer.get(key, viewed_at))
+        raise
+
+
+def _owner_filter(kind: str, keys) -> Dict[str, object]:
+    return {"user_id__in": keys} if kind == "user" else {"session_key__in": keys}
+
+
+def _owner_of(row: RecentlyViewedListing) -> Owner:
+    return ("user", row.user_id) if row.user_id else ("session", row.session_key)
+
+
+def _write(pending: Dict[Tuple[Owner, int], datetime]) -> int:
+    listing_ids = {listing_id for _, listing_id in pending}
+    # Views of listings deleted in the meantime are dropped
+    existing_listings = set(Listing.objects.filter(id__in=listing_ids).order_by().values_list("id", flat=True))
+    pending = {k: v for k, v in pending.items() if k[1] in existing_listings}
+    owners: Set[Owner] = {owner for owner, _ in pending}
+
+    with transaction.atomic():
+        rows: Dict[Tuple[Owner, int], RecentlyViewedListing] = {}
+        for kind in ("user", "session"):
+            keys = {key for k, key in owners if k == kind}
+            if keys:
+                qs = RecentlyViewedListing.objects.filter(
+                    listing_id__in=existing_listings, **_owner_filter(kind, keys)
+                ).order_by()
+                rows.update({(_owner_of(r), r.listing_id): r for r in qs})
+
+        updated = []
+        created = []
+        for (owner, listing_id), viewed_at in pending.items():
+            row = rows.get((owner, listing_id))
+            if row is not None:
+                row.viewed_at = viewed_at
+                updated.append(row)
+            else:
+                kind, key = owner
+                created.append(
+                    RecentlyViewedListing(
+                        listing_id=listing_id,
+                        user_id=key if kind == "user" else None,
+                        session_key=key if kind == "session" else None,
+                        viewed_at=viewed_at,
+                    )
+                )
+        RecentlyViewedListing.objects.bulk_update(updated, ["viewed_at"], batch_size=500)
+        created = _insert(created)
+        _prune({_owner_of(r) for r in created})
+
+    # Only first views of a listing count towards its view_count
+    for row in created:
+        record_view(row.listing_id)
+    return len(created)
+
+
+def _insert(rows: List[RecentlyViewedListing]) -> List[RecentlyViewedListing]:
+    """
+    Insert ``rows``; returns the ones actually inserted.
+
+    Another process may have flushed a first view of the same pair since
+    they were read. Such conflicts are rare, so the whole batch is tried at
+    once and only a failed batch falls back to row-by-row inserts.
+    """
+    try:
+        with transaction.atomic():
+            RecentlyViewedListing.objects.bulk_create(rows, batch_size=500)
+        return rows
+    except IntegrityError:
+        pass
+    inserted = []
+    for row in rows:
+        try:
+            with transaction.atomic():
+                row.save(force_insert=True)
+            inserted.append(row)
+        except IntegrityError:
+            # Already recorded elsewhere: only the view time moves on
+            kind, key = _owner_of(row)
+            RecentlyViewedListing.objects.filter(
+                listing_id=row.listing_id, viewed_at__lt=row.viewed_at, **_owner_filter(kind, [key])
+            ).update(viewed_at=row.viewed_at)
+    return inserted
+
+
+def _prune(owners: Set[Owner]) -> None:
+    """Cap each history at the newest RECENTLY_VIEWED_MAX_PER_OWNER entries."""
+    cap = int(getattr(settings, "RECENTLY_VIEWED_MAX_PER_OWNER", 50))
+    overflow = []
+    for kind, key in owners:
+        overflow += list(
+            RecentlyViewedListing.objects.filter(**_owner_filter(kind, [key]))
+            .order_by("-viewed_at", "-id")
+            .values_list("id", flat=True)[cap:]
+        )
+    if overflow:
+        RecentlyViewedListing.objects.filter(id__in=overflow).delete()
+
+
+def expire_anonymous_history(days: Optional[int] = None) -> int:
+    """Delete anonymous histories with no view for ``days`` (RECENTLY_VIEWED_SESSION_RETENTION_DAYS)."""
+    days = days if days is not None else int(getattr(settings, "RECENTLY_VIEWED_SESSION_RETENTION_DAYS", 30))
+    stale_sessions = (
+        RecentlyViewedListing.objects.filter(session_key__isnull=False)
+        .order_by()
+        .values("session_key")
+        .annotate(last_viewed=Max("viewed_at"))
+        .filter(last_viewed__lt=timezone.now() - timedelta(days=days))
+        .values("session_key")
+    )
+    deleted, _ = RecentlyViewedListing.objects.filter(session_key__in=stale_sessions).delete()
+    return deleted
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    try:
+        flush()
+    except Exception:  # pragma: no cover - nothing left to retry with
+        logger.exception("Dropping %s buffered recently viewed entries at exit", len(_buffer))
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .history import expire_anonymous_history
+
+
+@shared_task(name="favorites.expire_recently_viewed")
+def task_expire_recently_viewed():
+    """Remove anonymous recently-viewed histories past the retention period."""
+    return {"deleted": expire_anonymous_history()}
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from favorites import history
+from favorites.models import RecentlyViewedListing
+from listings import counters
+from listings.models import Listing
+from taxonomy.models import Category, Location
+
+
+@override_settings(
+    RECENTLY_VIEWED_FLUSH_INTERVAL=3600,
+    LISTING_COUNTER_FLUSH_INTERVAL=3600,
+    RECENTLY_VIEWED_MAX_PER_OWNER=3,
+)
+class RecentlyViewedTests(APITestCase):
+    def setUp(self):
+        # Buffers are process-wide; don't leak increments into other tests
+        self.addCleanup(counters._buffer.clear)
+        self.addCleanup(history._buffer.clear)
+        self.user = get_user_model().objects.create_user(username="viewer", password="pass123")
+        category = Category.objects.create(name="Phones", slug="phones", is_leaf=True)
+        location = Location.objects.create(name="Tashkent", slug="tashkent", kind=Location.Kind.CITY)
+        self.listings = [
+            Listing.objects.create(user=self.user, category=category, location=location, title=f"Phone {i}")
+            for i in range(5)
+        ]
+
+    def test_track_is_buffered_and_history_is_capped(self):
+        url = reverse("recently-viewed-track", args=[self.listings[0].id])
+        with self.assertNumQueries(0):
+            response = self.client.post(url, HTTP_X_CLIENT_SESSION_ID="abc")
+        self.assertEqual(response.status_code, 202)
+
+        self.client.post(url, HTTP_X_CLIENT_SESSION_ID="abc")
+        for listing in self.listings[1:]:
+            history.record(listing.id, session_key="abc")
+        self.assertEqual(history.flush(), 5)
+        counters.flush()
+
+        rows = RecentlyViewedListing.objects.filter(session_key="abc")
+        self.assertEqual(
+            sorted(rows.values_list("listing_id", flat=True)), [l.id for l in self.listings[2:]]
+        )
+        self.listings[0].refresh_from_db()
+        self.assertEqual(self.listings[0].view_count, 1)
+
+    def test_stale_anonymous_sessions_expire(self):
+        history.record(self.listings[0].id, session_key="old")
+        history.record(self.listings[0].id, user_id=self.user.id)
+        history.flush()
+        RecentlyViewedListing.objects.update(viewed_at=timezone.now() - timedelta(days=40))
+
+        self.assertEqual(history.expire_anonymous_history(days=30), 1)
+        self.assertTrue(RecentlyViewedListing.objects.filter(user=self.user).exists())
+
+    def test_views_flushed_elsewhere_first_are_not_counted(self):
+        RecentlyViewedListing.objects.create(user=self.user, listing=self.listings[0])
+        rows = [
+            RecentlyViewedListing(user=self.user, listing=self.listings[0], viewed_at=timezone.now()),
+            RecentlyViewedListing(user=self.user, listing=self.listings[1], viewed_at=timezone.now()),
+        ]
+        self.assertEqual([r.listing_id for r in history._insert(rows)], [self.listings[1].id])
+        self.assertEqual(RecentlyViewedListing.objects.filter(user=self.user).count(), 2)
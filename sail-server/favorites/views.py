@@ -6,6 +6,9 @@ from rest_framework.views import APIView
 
 from listings.models import Listing
 from listings.serializers import ListingSerializer
+from recommendations.models import ListingNeighbors
+from recommendations.neighbors import merged_neighbors
+from . import history
 from .models import FavoriteListing, RecentlyViewedListing
 from .serializers import FavoriteListingSerializer, RecentlyViewedListingSerializer
 
@@ -112,67 +115,28 @@ class RecentlyViewedListingTrackView(APIView):
 
     For anonymous users, uses X-Client-Session-Id header to identify the browser.
     This is necessary because credentials: 'omit' prevents cookie-based sessions.
+
+    Views are buffered and written in batches (see favorites.history), so the
+    request never touches the listing or history tables.
     """
     permission_classes = [permissions.AllowAny]
 
     def post(self, request, listing_id: int):
-        import time
-        from django.db import OperationalError
+        if request.user.is_authenticated:
+            history.record(listing_id, user_id=request.user.id)
+        else:
+            # For anonymous users, use client-provided session ID
+            # This is needed because credentials: 'omit' prevents cookie sessions
+            client_session_id = request.headers.get('X-Client-Session-Id', '')
 
-        try:
-            listing = Listing.objects.get(id=listing_id)
-        except Listing.DoesNotExist:
-            return Response(
-                {"detail": "Listing not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
+            if not client_session_id:
+                # No session ID provided, just return OK without tracking
+                return Response({"tracked": False}, status=status.HTTP_200_OK)
 
-        # Retry logic for database locks (SQLite)
-        max_retries = 3
-        retry_delay = 0.1  # Start with 100ms
-
-        for attempt in range(max_retries):
-            try:
-                if request.user.is_authenticated:
-                    # For authenticated users
-                    obj, created = RecentlyViewedListing.objects.update_or_create(
-                        user=request.user,
-                        listing=listing,
-                        defaults={"session_key": None}
-                    )
-                else:
-                    # For anonymous users, use client-provided session ID
-                    # This is needed because credentials: 'omit' prevents cookie sessions
-                    client_session_id = request.headers.get('X-Client-Session-Id', '')
-
-                    if not client_session_id:
-                        # No session ID provided, just return OK without tracking
-                        return Response({"tracked": False}, status=status.HTTP_200_OK)
-
-                    obj, created = RecentlyViewedListing.objects.update_or_create(
-                        session_key=client_session_id,
-                        listing=listing,
-                        defaults={"user": None}
-                    )
-
-                # Increment view count only for new views
-                if created:
-                    from django.db.models import F
-                    Listing.objects.filter(id=listing_id).update(view_count=F('view_count') + 1)
-
-                return Response(
-                    {"tracked": True},
-                    status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
-                )
-
-            except OperationalError as e:
-                if "database is locked" in str(e) and attempt < max_retries - 1:
-                    # Wait and retry with exponential backoff
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Double the delay for next attempt
-                else:
-                    # Last attempt or different error - raise it
-                    raise
+            history.record(listing_id, session_key=client_session_id)
+
+        # Stored by the next batched flush (unknown listings are dropped there)
+        return Response({"tracked": True}, status=status.HTTP_202_ACCEPTED)
 
 
 class RecentlyViewedListingClearView(APIView):
@@ -184,10 +148,12 @@ class RecentlyViewedListingClearView(APIView):
 
     def delete(self, request):
         if request.user.is_authenticated:
+            history.discard(user_id=request.user.id)
             count, _ = RecentlyViewedListing.objects.filter(user=request.user).delete()
         else:
             session_key = request.session.session_key
             if session_key:
+                history.discard(session_key=session_key)
                 count, _ = RecentlyViewedListing.objects.filter(session_key=session_key).delete()
             else:
                 count = 0
@@ -202,10 +168,11 @@ class SuggestedListingsView(APIView):
     Returns suggested/recommended listings based on user's recently viewed items.
 
     Algorithm:
-    1. Get categories from user's recently viewed listings
-    2. Find active listings in those categories
+    1. Merge the precomputed "viewed together" neighbours of the recently
+       viewed listings (see ``recommendations.coview``), most recent first
+    2. Fill remaining slots with fresh active listings from the same categories
     3. Exclude listings the user has already viewed
-    4. Return up to 12 listings, ordered by freshness
+    4. Without any history, return the newest listings
 
     For anonymous users, uses session-based recently viewed history.
     """
@@ -214,53 +181,40 @@ class SuggestedListingsView(APIView):
     def get(self, request):
         limit = int(request.query_params.get('limit', 12))
 
-        # Get user's recently viewed categories
+        # Get user's recently viewed listings, newest first
         if request.user.is_authenticated:
-            recent_views = RecentlyViewedListing.objects.filter(
-                user=request.user
-            ).select_related('listing__category')[:10]
+            recent_views = RecentlyViewedListing.objects.filter(user=request.user)
         else:
             session_key = request.session.session_key
             if not session_key:
                 # No session, return newest listings
                 return self._get_default_suggestions(limit)
+            recent_views = RecentlyViewedListing.objects.filter(session_key=session_key)
 
-            recent_views = RecentlyViewedListing.objects.filter(
-                session_key=session_key
-            ).select_related('listing__category')[:10]
-
-        if not recent_views.exists():
+        # One query for both the viewed ids and their categories
+        recent = list(recent_views.order_by('-viewed_at').values_list('listing_id', 'listing__category_id')[:10])
+        if not recent:
             # No viewing history, return newest listings
             return self._get_default_suggestions(limit)
 
-        # Extract category IDs from recently viewed listings
-        category_ids = list(set([
-            rv.listing.category_id
-            for rv in recent_views
-            if rv.listing and rv.listing.category_id
-        ]))
+        viewed_listing_ids = [listing_id for listing_id, _ in recent]
+        category_ids = list(dict.fromkeys(category_id for _, category_id in recent if category_id))
 
-        if not category_ids:
-            return self._get_default_suggestions(limit)
+        # Over-fetch: neighbours may have been sold or expired since the last run
+        ranked = merged_neighbors(ListingNeighbors.Kind.COVIEW, viewed_listing_ids)[:limit * 2]
+        by_id = Listing.objects.filter(id__in=ranked, status=Listing.Status.ACTIVE).in_bulk()
+        suggested_listings = [by_id[i] for i in ranked if i in by_id][:limit]
 
-        # Get IDs of listings already viewed by user
-        viewed_listing_ids = list(recent_views.values_list('listing_id', flat=True))
+        if len(suggested_listings) < limit and category_ids:
+            suggested_listings += Listing.objects.filter(
+                category_id__in=category_ids,
+                status=Listing.Status.ACTIVE
+            ).exclude(
+                id__in=viewed_listing_ids + [l.id for l in suggested_listings]
+            ).order_by('-refreshed_at', '-created_at')[:limit - len(suggested_listings)]
 
-        # Find suggested listings:
-        # - In the same categories as recently viewed
-        # - Exclude already viewed listings
-        # - Only active listings
-        # - Order by most recent first
-        suggested_listings = Listing.objects.filter(
-            category_id__in=category_ids,
-            status=Listing.Status.ACTIVE
-        ).exclude(
-            id__in=viewed_listing_ids
-        ).select_related(
-            'category', 'location', 'user'
-        ).prefetch_related(
-            'media'
-        ).order_by('-refreshed_at', '-created_at')[:limit]
+        if not suggested_listings:
+            return self._get_default_suggestions(limit)
 
         serializer = ListingSerializer(suggested_listings, many=True, context={'request': request})
 
@@ -274,10 +228,6 @@ class SuggestedListingsView(APIView):
         """Return newest active listings when no viewing history exists."""
         default_listings = Listing.objects.filter(
             status=Listing.Status.ACTIVE
-        ).select_related(
-            'category', 'location', 'user'
-        ).prefetch_related(
-            'media'
         ).order_by('-refreshed_at', '-created_at')[:limit]
 
         serializer = ListingSerializer(default_listings, many=True, context={'request': self.request})
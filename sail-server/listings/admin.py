@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Listing, ListingAttributeValue, ListingMedia
+from .models import Listing, ListingAttributeValue, ListingDailyStats, ListingMedia
 
 
 class ListingMediaInline(admin.TabularInline):
@@ -29,3 +29,9 @@ class ListingMediaAdmin(admin.ModelAdmin):
     list_display = ("listing", "type", "order", "uploaded_at")
     autocomplete_fields = ("listing",)
 
+
+@admin.register(ListingDailyStats)
+class ListingDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ("listing", "day", "views", "interests")
+    list_filter = ("day",)
+    raw_id_fields = ("listing",)
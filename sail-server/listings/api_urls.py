@@ -17,6 +17,7 @@ from .views import (
     MyListingsView,
     UserListingsView,
     ListingShareView,
+    ListingStatsView,
 )
 
 urlpatterns = [
@@ -31,6 +32,7 @@ urlpatterns = [
     path("listings/<int:pk>/delete", ListingDeleteView.as_view(), name="listing-delete"),
     path("listings/<int:pk>/share", ListingShareView.as_view(), name="listing-share"),
     path("listings/<int:pk>/interest", ListingInterestView.as_view(), name="listing-interest"),
+    path("listings/<int:pk>/stats", ListingStatsView.as_view(), name="listing-stats"),
     path("listings/<int:pk>/media", ListingMediaUploadView.as_view(), name="listing-media-upload"),
     path("listings/<int:pk>/media/<int:media_id>", ListingMediaDeleteView.as_view(), name="listing-media-delete"),
     path("listings/<int:pk>/media/reorder", ListingMediaReorderView.as_view(), name="listing-media-reorder"),
@@ -0,0 +1,151 @@
+"""
+Write-buffered view and interest counters.
+
+Incrementing ``view_count`` on every page view turns popular listings into
+write hot spots (and serializes all writers on SQLite). Instead, increments
+are accumulated in a per-process buffer and flushed every
+``LISTING_COUNTER_FLUSH_INTERVAL`` seconds as one aggregated ``UPDATE`` on
+the listings table plus one on the daily rollup table. Counts shown to users
+lag by at most one interval; a crash loses at most one interval of views.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Listing, ListingDailyStats
+
+logger = logging.getLogger(__name__)
+
+VIEWS = "views"
+INTERESTS = "interests"
+# Buffer field -> Listing counter column
+_LISTING_FIELDS = {VIEWS: "view_count", INTERESTS: "interest_count"}
+
+_lock = threading.Lock()
+# (field, listing_id, day) -> pending increment
+_buffer: Counter = Counter()
+_state = {"pid": None}
+
+
+def record_view(listing_id: int) -> None:
+    _record(VIEWS, listing_id)
+
+
+def record_interest(listing_id: int) -> None:
+    _record(INTERESTS, listing_id)
+
+
+def _interval() -> float:
+    return float(getattr(settings, "LISTING_COUNTER_FLUSH_INTERVAL", 10))
+
+
+def _record(field: str, listing_id: int) -> None:
+    with _lock:
+        _buffer[(field, int(listing_id), timezone.localdate())] += 1
+    if _interval() <= 0:
+        # Buffering disabled: write through
+        flush()
+    else:
+        _ensure_flusher()
+
+
+def _ensure_flusher() -> None:
+    # One flusher thread per process; a forked worker starts its own
+    if _state["pid"] == os.getpid():
+        return
+    with _lock:
+        if _state["pid"] == os.getpid():
+            return
+        _state["pid"] = os.getpid()
+        threading.Thread(target=_flush_loop, name="listing-counters", daemon=True).start()
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(_interval())
+        try:
+            flush()
+        except Exception:  # pragma: no cover - keep the thread alive
+            logger.exception("Listing counter flush failed")
+        finally:
+            connection.close()
+
+
+def flush() -> int:
+    """
+    Write all buffered increments; returns the number of listings touched.
+
+    Deltas that fail to write are put back into the buffer for the next run.
+    """
+    with _lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+    if not pending:
+        return 0
+    try:
+        _write(pending)
+    except Exception:
+        with _lock:
+            _buffer.update(pending)
+        raise
+    return len({listing_id for _, listing_id, _ in pending})
+
+
+def _write(pending: Dict[Tuple[str, int, date], int]) -> None:
+    totals: Dict[str, Counter] = {VIEWS: Counter(), INTERESTS: Counter()}
+    daily: Dict[date, Dict[str, Counter]] = {}
+    for (field, listing_id, day), delta in pending.items():
+        totals[field][listing_id] += delta
+        daily.setdefault(day, {VIEWS: Counter(), INTERESTS: Counter()})[field][listing_id] += delta
+
+    with transaction.atomic():
+        listing_ids = set(totals[VIEWS]) | set(totals[INTERESTS])
+        existing = set(Listing.objects.filter(id__in=listing_ids).order_by().values_list("id", flat=True))
+        Listing.objects.filter(id__in=existing).update(
+            **{
+                column: F(column) + _delta_case("id", totals[field])
+                for field, column in _LISTING_FIELDS.items()
+                if totals[field]
+            }
+        )
+        for day, fields in daily.items():
+            ids = (set(fields[VIEWS]) | set(fields[INTERESTS])) & existing
+            # Create missing rows first so the additive UPDATE covers every listing
+            ListingDailyStats.objects.bulk_create(
+                [ListingDailyStats(listing_id=i, day=day) for i in ids], ignore_conflicts=True
+            )
+            ListingDailyStats.objects.filter(day=day, listing_id__in=ids).update(
+                **{
+                    field: F(field) + _delta_case("listing_id", fields[field])
+                    for field in (VIEWS, INTERESTS)
+                    if fields[field]
+                }
+            )
+
+
+def _delta_case(column: str, deltas: Counter) -> Case:
+    return Case(
+        *[When(**{column: listing_id}, then=Value(delta)) for listing_id, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    try:
+        flush()
+    except Exception:  # pragma: no cover - nothing left to retry with
+        logger.exception("Dropping %s buffered listing counters at exit", len(_buffer))
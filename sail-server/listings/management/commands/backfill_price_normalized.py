@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from listings.pricing import CHUNK_SIZE, renormalize_listing_prices
+
+
+class Command(BaseCommand):
+    help = "Fill in or recompute the stored normalized listing prices, in id-range chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Listing ids covered by one UPDATE')
+        parser.add_argument('--currency', action='append', dest='currencies', help='Only listings in this currency (repeatable)')
+        parser.add_argument('--all', action='store_true', help='Recompute every row, not only rows without a value')
+
+    def handle(self, *args, **options):
+        updated = renormalize_listing_prices(
+            options['currencies'],
+            chunk_size=options['chunk_size'],
+            only_missing=not options['all'],
+        )
+        for code, count in updated.items():
+            self.stdout.write(f"{code}: {count} listings updated")
+        self.stdout.write(self.style.SUCCESS(f"Done: {sum(updated.values())} listings updated"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from listings.rollups import reconcile_listing_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute the active listing counts of every category and location"
+
+    def handle(self, *args, **options):
+        fixed = reconcile_listing_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f"Corrected {fixed['categories']} category and {fixed['locations']} location counts"
+        ))
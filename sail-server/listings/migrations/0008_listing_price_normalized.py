@@ -0,0 +1,26 @@
+# Generated by Django 4.2.28 on 2026-10-16 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_listing_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='price_normalized',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=20, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['status', 'category', 'price_normalized'], name='listings_li_status_124728_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['user', 'status', 'price_normalized'], name='listings_li_user_id_0a7964_idx'),
+        ),
+    ]
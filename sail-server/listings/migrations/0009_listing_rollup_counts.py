@@ -0,0 +1,29 @@
+# Generated by Django 4.2.28 on 2026-10-16 23:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxonomy', '0010_tree_paths'),
+        ('listings', '0008_listing_price_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryListingCount',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing_count', serialize=False, to='taxonomy.category')),
+                ('active_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LocationListingCount',
+            fields=[
+                ('location', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing_count', serialize=False, to='taxonomy.location')),
+                ('active_count', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
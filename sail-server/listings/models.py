@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from decimal import Decimal
+from typing import Union
 
 from django.conf import settings
 from django.db import models
@@ -9,6 +10,34 @@ from django.utils import timezone
 from taxonomy.models import Attribute, Category, Location
 
 
+class ListingQuerySet(models.QuerySet):
+    """Subtree filters on the taxonomy's materialized paths (see taxonomy.paths)."""
+
+    def in_category(self, category: Union[Category, str]) -> "ListingQuerySet":
+        """Listings in a category (an instance or slug) or anywhere below it."""
+        return self.filter(category__path__startswith=_subtree_prefix(Category, category))
+
+    def in_location(self, location: Union[Location, str]) -> "ListingQuerySet":
+        """Listings in a location (an instance or slug) or anywhere below it."""
+        return self.filter(location__path__startswith=_subtree_prefix(Location, location))
+
+
+def _subtree_prefix(model, node):
+    if isinstance(node, model):
+        if not node.path:
+            # An empty prefix would match every listing
+            raise ValueError(f"{model.__name__} {node.pk} has no materialized path; run rebuild_tree_paths")
+        return node.path
+    # Rows without a path resolve to NULL, which matches nothing, like an unknown slug
+    nodes = model.objects.filter(slug=node).exclude(path="")
+    if not model._meta.get_field("slug").unique:
+        # Location slugs repeat across regions; refuse to pick one
+        if nodes.count() > 1:
+            raise ValueError(f"{model.__name__} slug {node!r} is ambiguous; pass the instance instead")
+    # The slug resolves inside the same query
+    return models.Subquery(nodes.values("path")[:1])
+
+
 class Listing(models.Model):
     class Status(models.TextChoices):
         DRAFT = "draft", "Draft"
@@ -38,6 +67,8 @@ class Listing(models.Model):
     description = models.TextField(blank=True)
     price_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0"))
     price_currency = models.CharField(max_length=3, default="UZS")
+    # Price in the base currency, kept in sync by save() and listings.pricing
+    price_normalized = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
     condition = models.CharField(max_length=16, choices=Condition.choices, default=Condition.USED)
     deal_type = models.CharField(max_length=16, choices=DealType.choices, default=DealType.SELL)
     seller_type = models.CharField(max_length=16, choices=SellerType.choices, default=SellerType.PERSON)
@@ -60,15 +91,54 @@ class Listing(models.Model):
     view_count = models.PositiveIntegerField(default=0)
     interest_count = models.PositiveIntegerField(default=0)
 
+    objects = ListingQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=["status", "category", "location", "refreshed_at"]),
+            models.Index(fields=["status", "category", "price_normalized"]),
+            models.Index(fields=["user", "status", "price_normalized"]),
         ]
         ordering = ["-refreshed_at", "-created_at"]
 
     def __str__(self) -> str:  # pragma: no cover
         return self.title
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"price_amount", "price_currency"} & set(update_fields):
+            from .pricing import normalized_price
+
+            self.price_normalized = normalized_price(self.price_amount, self.price_currency)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "price_normalized"}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so signals can detect status transitions
+        instance._loaded_status = instance.__dict__.get("status")
+        # ...and where it was counted (see listings.rollups)
+        instance._loaded_category_id = instance.__dict__.get("category_id")
+        instance._loaded_location_id = instance.__dict__.get("location_id")
+        return instance
+
+
+class CategoryListingCount(models.Model):
+    """Active listings in a category and all categories below it; see listings.rollups."""
+
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name="listing_count")
+    # Signed: increments may briefly drift below zero until the nightly reconcile
+    active_count = models.IntegerField(default=0)
+
+
+class LocationListingCount(models.Model):
+    """Active listings in a location and all locations below it; see listings.rollups."""
+
+    location = models.OneToOneField(Location, on_delete=models.CASCADE, primary_key=True, related_name="listing_count")
+    active_count = models.IntegerField(default=0)
+
 
 class ListingAttributeValue(models.Model):
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="attributes")
@@ -103,3 +173,18 @@ class ListingMedia(models.Model):
 
     class Meta:
         ordering = ["order", "id"]
+
+
+class ListingDailyStats(models.Model):
+    """Per-listing daily views and interests, filled by the counter flush (see counters.py)."""
+
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    interests = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "day"], name="uniq_listing_daily_stats"),
+        ]
+        ordering = ["-day"]
@@ -0,0 +1,76 @@
+"""
+Stored ``Listing.price_normalized``: the price in the base currency.
+
+The column is set on every save from the current rates and rewritten in
+id-range chunks when rates change, so the database can sort and filter
+listings by price across currencies and use the composite indexes.
+"""
+from __future__ import annotations
+
+import logging
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from django.db.models import F, Max, Min, Q, Value
+from django.db.models.functions import Round
+
+logger = logging.getLogger(__name__)
+
+# Rows rewritten per UPDATE statement
+CHUNK_SIZE = 5000
+
+
+def normalized_price(amount: Optional[Decimal], currency: str) -> Decimal:
+    from currency.services import CurrencyService
+
+    return CurrencyService.normalize_price_to_base(amount or Decimal("0"), currency).quantize(Decimal("0.01"))
+
+
+def base_rates(currencies: Optional[Iterable[str]] = None) -> Dict[str, Decimal]:
+    """Factor from each listed currency (all used by listings if None) to the base currency."""
+    from currency.rates import get_rates
+
+    from .models import Listing
+
+    codes = set(currencies) if currencies else set(
+        Listing.objects.order_by().values_list("price_currency", flat=True).distinct()
+    )
+    # Read the rates from the database: this runs right after they changed.
+    # to_base leaves amounts in unknown currencies as they are
+    rates = get_rates(refresh=True)
+    return {code: rates.to_base(Decimal("1"), code) for code in sorted(codes)}
+
+
+def renormalize_listing_prices(
+    currencies: Optional[Iterable[str]] = None,
+    chunk_size: Optional[int] = None,
+    only_missing: bool = False,
+) -> Dict[str, int]:
+    """
+    Rewrite ``price_normalized`` for listings priced in ``currencies`` (all if None).
+
+    Each UPDATE covers one currency and one id range of ``chunk_size`` ids,
+    so no statement locks a large part of the table. Rows that already hold
+    the right value are not written. Returns rows updated per currency.
+    """
+    from .models import Listing
+
+    chunk_size = chunk_size or CHUNK_SIZE
+    updated: Dict[str, int] = {}
+    for code, rate in base_rates(currencies).items():
+        rows = Listing.objects.filter(price_currency=code)
+        target = Round(F("price_amount") * Value(rate), 2)
+        stale = Q(price_normalized__isnull=True) if only_missing else (
+            Q(price_normalized__isnull=True) | ~Q(price_normalized=target)
+        )
+        bounds = rows.aggregate(lo=Min("id"), hi=Max("id"))
+        updated[code] = 0
+        if bounds["lo"] is None:
+            continue
+        for start in range(bounds["lo"], bounds["hi"] + 1, chunk_size):
+            updated[code] += (
+                rows.filter(stale, id__gte=start, id__lt=start + chunk_size)
+                .update(price_normalized=target)
+            )
+    logger.info("Re-normalized stored listing prices: %s", updated)
+    return updated
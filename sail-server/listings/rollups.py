@@ -0,0 +1,156 @@
+"""
+Active listing counts per category and location, descendants included.
+
+The pickers show how many listings each node holds; aggregating that per
+request would scan the listings table. Instead every status transition
+(and every category or location change of an active listing) adds ±1 to
+the node and all of its ancestors in ``CategoryListingCount`` /
+``LocationListingCount``. Ancestors are read from the materialized
+``path`` columns, never from a possibly stale taxonomy snapshot. The
+increments run once the listing's transaction has committed, so the root
+rows every listing touches are only locked for one short statement
+instead of for the whole listing write. ``reconcile_listing_counts``
+recomputes everything from scratch nightly, which also covers bulk
+updates, taxonomy moves and increments lost to a crash after commit.
+"""
+from __future__ import annotations
+
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from taxonomy.models import Category, Location
+from taxonomy.paths import SEPARATOR
+
+from .models import CategoryListingCount, Listing, LocationListingCount
+
+logger = logging.getLogger(__name__)
+
+# (category_id, location_id, delta)
+Change = Tuple[Optional[int], Optional[int], int]
+
+
+def listing_changes(instance: Listing, created: bool = False, deleted: bool = False) -> list:
+    """The count changes caused by saving (or deleting) ``instance``."""
+    changes = []
+    if not created and getattr(instance, "_loaded_status", None) == Listing.Status.ACTIVE:
+        changes.append((instance._loaded_category_id, instance._loaded_location_id, -1))
+    if not deleted and instance.status == Listing.Status.ACTIVE:
+        changes.append((instance.category_id, instance.location_id, 1))
+    # A save that kept the listing active in the same place cancels out
+    if len(changes) == 2 and changes[0][:2] == changes[1][:2]:
+        return []
+    return changes
+
+
+def apply_changes(changes: Iterable[Change]) -> None:
+    """Add each change to its category and location and all their ancestors, after commit."""
+    changes = list(changes)
+    if changes:
+        transaction.on_commit(lambda: _apply(changes))
+
+
+def _apply(changes: List[Change]) -> None:
+    categories, locations = _rollup(changes)
+    with transaction.atomic():
+        _increment(CategoryListingCount, "category_id", categories)
+        _increment(LocationListingCount, "location_id", locations)
+
+
+def _rollup(changes: Iterable[Change], everything: bool = False) -> Tuple[Counter, Counter]:
+    changes = list(changes)
+    # ``everything`` reads all paths at once instead of a long id list
+    category_paths = _ancestor_ids(Category, None if everything else {c[0] for c in changes})
+    location_paths = _ancestor_ids(Location, None if everything else {c[1] for c in changes})
+    categories: Counter = Counter()
+    locations: Counter = Counter()
+    for category_id, location_id, delta in changes:
+        for node_id in category_paths.get(category_id, ()):
+            categories[node_id] += delta
+        for node_id in location_paths.get(location_id, ()):
+            locations[node_id] += delta
+    return categories, locations
+
+
+def _ancestor_ids(model, ids: Optional[Set[Optional[int]]]) -> Dict[int, List[int]]:
+    """Root → self ids of each node, parsed from its materialized path."""
+    rows = model.objects.all()
+    if ids is not None:
+        ids = {i for i in ids if i}
+        if not ids:
+            return {}
+        rows = rows.filter(id__in=ids)
+    # A node whose path was never filled in counts for itself only
+    return {
+        pk: [int(segment) for segment in path.split(SEPARATOR) if segment] or [pk]
+        for pk, path in rows.values_list("id", "path")
+    }
+
+
+def _increment(model, field: str, deltas: Counter) -> None:
+    deltas = {node_id: delta for node_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    model.objects.bulk_create([model(**{field: node_id}) for node_id in deltas], ignore_conflicts=True)
+    by_delta: Dict[int, list] = defaultdict(list)
+    for node_id, delta in deltas.items():
+        by_delta[delta].append(node_id)
+    for delta, node_ids in by_delta.items():
+        model.objects.filter(**{f"{field}__in": node_ids}).update(active_count=F("active_count") + delta)
+
+
+def reconcile_listing_counts() -> Dict[str, int]:
+    """Recompute every count from the listings table; returns the number of rows corrected."""
+    rows = (
+        Listing.objects.filter(status=Listing.Status.ACTIVE)
+        .values_list("category_id", "location_id")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    categories, locations = _rollup(rows, everything=True)
+    fixed = {
+        "categories": _overwrite(
+            CategoryListingCount, "category_id", categories, Category.objects.values_list("id", flat=True)
+        ),
+        "locations": _overwrite(
+            LocationListingCount, "location_id", locations, Location.objects.values_list("id", flat=True)
+        ),
+    }
+    logger.info("Reconciled listing counts: %s", fixed)
+    return fixed
+
+
+def _overwrite(model, field: str, counts: Counter, node_ids: Iterable[int]) -> int:
+    current = dict(model.objects.values_list(field, "active_count"))
+    stale = [
+        model(**{field: node_id, "active_count": counts.get(node_id, 0)})
+        for node_id in node_ids
+        if current.get(node_id) != counts.get(node_id, 0)
+    ]
+    model.objects.bulk_create(
+        stale,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=[field.removesuffix("_id")],
+        update_fields=["active_count"],
+    )
+    return len(stale)
+
+
+def category_counts(ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    """Active listings per category; only the ``ids`` given, all when None."""
+    rows = CategoryListingCount.objects.all()
+    if ids is not None:
+        rows = rows.filter(category_id__in=list(ids))
+    return dict(rows.values_list("category_id", "active_count"))
+
+
+def location_counts(ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    """Active listings per location; only the ``ids`` given, all when None."""
+    rows = LocationListingCount.objects.all()
+    if ids is not None:
+        rows = rows.filter(location_id__in=list(ids))
+    return dict(rows.values_list("location_id", "active_count"))
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Sequence
 
 from rest_framework import serializers
 from django.conf import settings
+from django.db.models import Count, prefetch_related_objects
 
 from taxonomy.models import Attribute
+from taxonomy.tree import get_tree
 
 from .models import Listing, ListingAttributeValue, ListingMedia
 
@@ -25,6 +27,64 @@ class ListingMediaSerializer(serializers.ModelSerializer):
         return obj.image.url
 
 
+def preload_listing_data(listings: Sequence[Listing]) -> Dict[str, Any]:
+    """
+    Load everything ListingSerializer reads besides the listing row itself.
+
+    Runs a constant number of queries for any number of listings: media,
+    attribute values with their Attribute rows, favorite counts and seller
+    profiles. Prices are converted in one pass over the in-memory rate
+    snapshot. Category and location names come from the taxonomy snapshot.
+    """
+    from accounts.models import Profile
+    from currency.services import CurrencyService
+    from favorites.models import FavoriteListing
+
+    ids = [l.id for l in listings]
+    prefetch_related_objects(list(listings), "media")
+
+    attrs: Dict[int, List[ListingAttributeValue]] = {}
+    rows = (
+        ListingAttributeValue.objects.filter(listing_id__in=ids)
+        .select_related("attribute")
+        .order_by("attribute_id", "id")
+    )
+    for row in rows:
+        attrs.setdefault(row.listing_id, []).append(row)
+
+    favorite_counts = dict(
+        FavoriteListing.objects.filter(listing_id__in=ids)
+        .values("listing_id")
+        .annotate(n=Count("id"))
+        .values_list("listing_id", "n")
+    )
+    profiles = {p.user_id: p for p in Profile.objects.filter(user_id__in={l.user_id for l in listings})}
+
+    prices = dict(zip(ids, CurrencyService.convert_many(
+        [l.price_amount for l in listings], [l.price_currency for l in listings]
+    )))
+
+    return {
+        "ids": set(ids),
+        "attrs": attrs,
+        "favorite_counts": favorite_counts,
+        "profiles": profiles,
+        "prices": prices,
+    }
+
+
+class ListingListSerializer(serializers.ListSerializer):
+    """Serializes a page of listings with batched lookups instead of per-row queries."""
+
+    def to_representation(self, data):
+        listings = list(data.all() if hasattr(data, "all") else data)
+        self.child._preloaded = preload_listing_data(listings)
+        try:
+            return [self.child.to_representation(item) for item in listings]
+        finally:
+            self.child._preloaded = None
+
+
 class ListingSerializer(serializers.ModelSerializer):
     media = ListingMediaSerializer(many=True, read_only=True)
     attributes = serializers.SerializerMethodField()
@@ -73,6 +133,7 @@ class ListingSerializer(serializers.ModelSerializer):
             "favorite_count",
             "interest_count",
         ]
+        list_serializer_class = ListingListSerializer
         read_only_fields = [
             "status",
             "created_at",
@@ -86,12 +147,16 @@ class ListingSerializer(serializers.ModelSerializer):
             "interest_count",
         ]
 
+    _preloaded: Optional[Dict[str, Any]] = None
+
+    def _data(self, obj: Listing) -> Dict[str, Any]:
+        # Filled per page by ListingListSerializer; a single listing loads its own
+        if self._preloaded is None or obj.id not in self._preloaded["ids"]:
+            self._preloaded = preload_listing_data([obj])
+        return self._preloaded
+
     def get_attributes(self, obj: Listing) -> List[Dict[str, Any]]:  # pragma: no cover
-        rows = (
-            ListingAttributeValue.objects.filter(listing=obj)
-            .select_related("attribute")
-            .order_by("attribute_id", "id")
-        )
+        rows = self._data(obj)["attrs"].get(obj.id, [])
         grouped: Dict[int, Dict[str, Any]] = {}
         for row in rows:
             attr = row.attribute
@@ -130,36 +195,25 @@ class ListingSerializer(serializers.ModelSerializer):
         return getattr(attr, "label_ru", None) or attr.label or getattr(attr, "label_uz", None)
 
     def get_category_name(self, obj: Listing) -> str:  # pragma: no cover
-        cat = getattr(obj, "category", None)
-        if not cat:
-            return ""
-        lang = self._lang()
-        if lang == "uz":
-            return getattr(cat, "name_uz", None) or cat.name or getattr(cat, "name_ru", None)
-        return getattr(cat, "name_ru", None) or cat.name or getattr(cat, "name_uz", None)
+        cat = get_tree().category(obj.category_id)
+        return cat.display_name("uz" if self._lang() == "uz" else "ru") if cat else ""
 
     def get_category_slug(self, obj: Listing) -> str:  # pragma: no cover
-        cat = getattr(obj, "category", None)
-        return getattr(cat, "slug", "") if cat else ""
+        cat = get_tree().category(obj.category_id)
+        return cat.slug if cat else ""
 
     def get_location_name(self, obj: Listing) -> str:  # pragma: no cover
-        loc = getattr(obj, "location", None)
-        if not loc:
-            return ""
-        lang = self._lang()
-        if lang == "uz":
-            return getattr(loc, "name_uz", None) or loc.name or getattr(loc, "name_ru", None)
-        return getattr(loc, "name_ru", None) or loc.name or getattr(loc, "name_uz", None)
+        loc = get_tree().location(obj.location_id)
+        return loc.display_name("uz" if self._lang() == "uz" else "ru") if loc else ""
 
     def get_location_slug(self, obj: Listing) -> str:  # pragma: no cover
-        loc = getattr(obj, "location", None)
-        return getattr(loc, "slug", "") if loc else ""
+        loc = get_tree().location(obj.location_id)
+        return loc.slug if loc else ""
 
     def get_seller(self, obj: Listing) -> Dict[str, Any]:  # pragma: no cover
-        user = getattr(obj, "user", None)
-        if not user:
+        if not obj.user_id:
             return {}
-        profile = getattr(user, "profile", None)
+        profile = self._data(obj)["profiles"].get(obj.user_id)
         name = ""
         avatar_url = ""
         logo = ""
@@ -174,7 +228,7 @@ class ListingSerializer(serializers.ModelSerializer):
             banner = profile.banner.url if profile.banner else ""
             last_active = profile.last_active_at
         return {
-            "id": user.id,
+            "id": obj.user_id,
             "name": name,
             "avatar_url": avatar_url,
             "since": since,
@@ -185,19 +239,11 @@ class ListingSerializer(serializers.ModelSerializer):
 
     def get_price_normalized(self, obj: Listing) -> float:  # pragma: no cover
         """Return price normalized to base currency (UZS) for consistent sorting"""
-        from currency.services import CurrencyService
-
-        if obj.price_amount is None or obj.price_amount == 0:
-            return 0.0
-
-        normalized = CurrencyService.normalize_price_to_base(
-            obj.price_amount, obj.price_currency
-        )
-        return float(normalized)
+        return float(self._data(obj)["prices"].get(obj.id, 0))
 
     def get_favorite_count(self, obj: Listing) -> int:  # pragma: no cover
         """Return the number of users who favorited this listing"""
-        return obj.favorited_by.count()
+        return self._data(obj)["favorite_counts"].get(obj.id, 0)
 
 
 class ListingAttributeInputSerializer(serializers.Serializer):
@@ -317,14 +363,8 @@ class ListingCreateSerializer(serializers.ModelSerializer):
         return listing
 
     def _save_attributes(self, listing: Listing, attrs_payload: List[Dict[str, Any]]):
-        # Determine allowed attributes: listing.category and its ancestors
-        allowed_category_ids = set()
-        cat = listing.category
-        while cat:
-            allowed_category_ids.add(cat.id)
-            cat = cat.parent  # type: ignore[attr-defined]
-        # Fetch all attributes for allowed categories
-        attrs = Attribute.objects.filter(category_id__in=allowed_category_ids)
+        # Allowed attributes: listing.category and its ancestors
+        attrs = get_tree().category_attributes(listing.category_id)
         attrs_by_id = {a.id: a for a in attrs}
         attrs_by_key = {a.key: a for a in attrs}
         # Validate using nested serializer with context
@@ -454,16 +494,8 @@ class ListingUpdateSerializer(serializers.ModelSerializer):
         if not category_id:
             return data
 
-        # Get allowed attributes for this category and its ancestors
-        allowed_category_ids = set()
-        from taxonomy.models import Category
-        cat = Category.objects.filter(pk=category_id).first()
-        while cat:
-            allowed_category_ids.add(cat.id)
-            cat = cat.parent
-
-        # Fetch all attributes for allowed categories
-        attrs = Attribute.objects.filter(category_id__in=allowed_category_ids)
+        # Allowed attributes for this category and its ancestors
+        attrs = get_tree().category_attributes(getattr(category_id, "pk", category_id))
         attrs_by_id = {a.id: a for a in attrs}
         attrs_by_key = {a.key: a for a in attrs}
 
@@ -495,12 +527,7 @@ class ListingUpdateSerializer(serializers.ModelSerializer):
 
     def _save_attributes(self, listing: Listing, attrs_payload: List[Dict[str, Any]]):
         # Same logic as in create serializer
-        allowed_category_ids = set()
-        cat = listing.category
-        while cat:
-            allowed_category_ids.add(cat.id)
-            cat = cat.parent  # type: ignore[attr-defined]
-        attrs = Attribute.objects.filter(category_id__in=allowed_category_ids)
+        attrs = get_tree().category_attributes(listing.category_id)
         attrs_by_id = {a.id: a for a in attrs}
         attrs_by_key = {a.key: a for a in attrs}
         ser = ListingAttributeInputSerializer(
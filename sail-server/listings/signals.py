@@ -3,37 +3,61 @@ from __future__ import annotations
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from searchapp.tasks import task_delete_listing, task_index_listing
+from searchapp.views.outbox import mark_listing_dirty, sync_listings_on_commit
 
 from .models import Listing, ListingAttributeValue, ListingMedia
+from .rollups import apply_changes, listing_changes
+
+
+def _status_changed(instance: Listing, created: bool, update_fields) -> bool:
+    if created:
+        return True
+    if update_fields is not None and "status" not in update_fields:
+        return False
+    return instance.status != getattr(instance, "_loaded_status", None)
+
+
+def _update_counts(instance: Listing, created: bool, update_fields) -> None:
+    if update_fields is not None and not {"status", "category", "location"} & set(update_fields):
+        return
+    apply_changes(listing_changes(instance, created=created))
+    instance._loaded_category_id = instance.category_id
+    instance._loaded_location_id = instance.location_id
 
 
 @receiver(post_save, sender=Listing)
-def on_listing_saved(sender, instance: Listing, created, **kwargs):
-    task_index_listing.delay(instance.id)
+def on_listing_saved(sender, instance: Listing, created, update_fields=None, **kwargs):
+    mark_listing_dirty(instance.id)
+    # Before _status_changed() moves _loaded_status on
+    _update_counts(instance, created, update_fields)
+    if _status_changed(instance, created, update_fields):
+        # Activation/deactivation must show up in search without waiting for the outbox
+        sync_listings_on_commit([instance.id], activated=instance.status == Listing.Status.ACTIVE)
+        instance._loaded_status = instance.status
 
 
 @receiver(post_delete, sender=Listing)
 def on_listing_deleted(sender, instance: Listing, **kwargs):
-    task_delete_listing.delay(instance.id)
+    apply_changes(listing_changes(instance, deleted=True))
+    mark_listing_dirty(instance.id)
+    sync_listings_on_commit([instance.id])
 
 
 @receiver(post_save, sender=ListingAttributeValue)
 def on_attr_saved(sender, instance: ListingAttributeValue, created, **kwargs):
-    task_index_listing.delay(instance.listing_id)
+    mark_listing_dirty(instance.listing_id)
 
 
 @receiver(post_delete, sender=ListingAttributeValue)
 def on_attr_deleted(sender, instance: ListingAttributeValue, **kwargs):
-    task_index_listing.delay(instance.listing_id)
+    mark_listing_dirty(instance.listing_id)
 
 
 @receiver(post_save, sender=ListingMedia)
 def on_media_saved(sender, instance: ListingMedia, created, **kwargs):
-    task_index_listing.delay(instance.listing_id)
+    mark_listing_dirty(instance.listing_id)
 
 
 @receiver(post_delete, sender=ListingMedia)
 def on_media_deleted(sender, instance: ListingMedia, **kwargs):
-    task_index_listing.delay(instance.listing_id)
-
+    mark_listing_dirty(instance.listing_id)
@@ -1,4 +1,11 @@
 from celery import shared_task
+from django.db import transaction
+from django.utils import timezone
+
+from searchapp.views.outbox import mark_listings_dirty, sync_listings_on_commit
+
+from .models import Listing
+from .rollups import apply_changes
 from .telegram_sharing import TelegramSharingService
 
 @shared_task
@@ -7,3 +14,40 @@ def share_listing_to_telegram_task(listing_id: int, chat_ids: list[int]):
     Celery task to share a listing to Telegram channels asynchronously.
     """
     TelegramSharingService.share_listing(listing_id, chat_ids)
+
+
+@shared_task(name="listings.expire_listings")
+def task_expire_listings():
+    """Mark active listings past their expires_at as expired and drop them from search."""
+    with transaction.atomic():
+        rows = list(
+            Listing.objects.select_for_update()
+            .filter(status=Listing.Status.ACTIVE, expires_at__lte=timezone.now())
+            .values_list("id", "category_id", "location_id")
+        )
+        if not rows:
+            return {"expired": 0}
+        ids = [row[0] for row in rows]
+        # Queryset update skips post_save, so index and count the transition explicitly
+        Listing.objects.filter(id__in=ids).update(status=Listing.Status.EXPIRED)
+        apply_changes((category_id, location_id, -1) for _, category_id, location_id in rows)
+        mark_listings_dirty(ids)
+        sync_listings_on_commit(ids)
+    return {"expired": len(ids)}
+
+
+# Batch jobs over the whole listings table, far past the global 30s/60s limits
+@shared_task(name="listings.renormalize_prices", soft_time_limit=3600, time_limit=3600 + 300)
+def task_renormalize_listing_prices(currencies=None):
+    """Rewrite stored normalized prices after exchange rates changed."""
+    from .pricing import renormalize_listing_prices
+
+    return renormalize_listing_prices(currencies)
+
+
+@shared_task(name="listings.reconcile_listing_counts", soft_time_limit=1800, time_limit=1800 + 300)
+def task_reconcile_listing_counts():
+    """Recompute the per-category and per-location active listing counts."""
+    from .rollups import reconcile_listing_counts
+
+    return reconcile_listing_counts()
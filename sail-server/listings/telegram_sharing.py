@@ -3,6 +3,7 @@ import requests
 import html
 from django.conf import settings
 from django.urls import reverse
+from taxonomy.tree import get_tree
 from .models import Listing
 
 logger = logging.getLogger(__name__)
@@ -32,12 +33,10 @@ class TelegramSharingService:
         price_text = f"{listing.price_amount:,.0f}".replace(",", " ") + f" {listing.price_currency}" if listing.price_amount else "Договорная"
         
         # Hashtags from category hierarchy
-        hashtags = []
-        cat = listing.category
-        while cat:
-            slug = cat.slug.replace("-", "_")
-            hashtags.append(f"#{slug}")
-            cat = cat.parent
+        hashtags = [
+            f"#{slug.replace('-', '_')}"
+            for slug in reversed(get_tree().category_path_slugs(listing.category_id))
+        ]
         hashtags_str = " ".join(hashtags)
 
         # Escape HTML content to prevent parse errors
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from accounts.models import Profile
+from currency.models import Currency, ExchangeRate
+from favorites.models import FavoriteListing
+from listings import counters
+from listings.models import CategoryListingCount, Listing, ListingAttributeValue, ListingDailyStats, LocationListingCount
+from listings.rollups import reconcile_listing_counts
+from listings.tasks import task_expire_listings
+from taxonomy.models import Attribute, Category, Location
+from taxonomy.tree import get_tree
+
+
+class ListingListQueryCountTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.seller = User.objects.create_user(username="seller", password="pass123")
+        self.buyer = User.objects.create_user(username="buyer", password="pass123")
+        Profile.objects.create(user=self.seller, phone_e164="+998901112233", display_name="Seller")
+        uzs = Currency.objects.create(code="UZS", name="Sum", symbol="so'm", is_default=True)
+        usd = Currency.objects.create(code="USD", name="Dollar", symbol="$")
+        ExchangeRate.objects.create(from_currency=usd, to_currency=uzs, rate=Decimal("12500"))
+
+        parent = Category.objects.create(name="Electronics", slug="electronics")
+        self.category = Category.objects.create(name="Phones", slug="phones", parent=parent, is_leaf=True)
+        self.brand = Attribute.objects.create(
+            category=parent, key="brand", label="Brand", type=Attribute.Type.SELECT, options=["apple", "samsung"]
+        )
+        self.location = Location.objects.create(name="Tashkent", slug="tashkent", kind=Location.Kind.CITY)
+        self._create_listings(2)
+
+    def _create_listings(self, count: int):
+        for i in range(count):
+            listing = Listing.objects.create(
+                user=self.seller,
+                category=self.category,
+                location=self.location,
+                title=f"Phone {i}",
+                price_amount=Decimal("100.00"),
+                price_currency="USD" if i % 2 else "UZS",
+            )
+            ListingAttributeValue.objects.create(listing=listing, attribute=self.brand, value_option_key="apple")
+            FavoriteListing.objects.create(user=self.buyer, listing=listing)
+
+    def _assert_constant_queries(self, url: str, expected: int):
+        # Warm the taxonomy snapshot and currency caches first
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(expected):
+            small = self.client.get(url).json()
+        self._create_listings(8)
+        with self.assertNumQueries(expected):
+            large = self.client.get(url).json()
+        self.assertEqual(len(large), len(small) + 8)
+        return large
+
+    def test_my_listings_query_count(self):
+        self.client.force_authenticate(user=self.seller)
+        data = self._assert_constant_queries(reverse("my-listings"), 5)
+        first = data[0]
+        self.assertEqual(first["category_slug"], "phones")
+        self.assertEqual(first["favorite_count"], 1)
+        self.assertEqual(first["seller"]["name"], "Seller")
+        self.assertEqual(first["attributes"][0]["value"], "apple")
+
+    def test_user_listings_query_count(self):
+        data = self._assert_constant_queries(reverse("user-listings", args=[self.seller.id]), 5)
+        prices = {item["price_currency"]: item["price_normalized"] for item in data}
+        self.assertEqual(prices, {"UZS": 100.0, "USD": 1250000.0})
+
+    def test_price_sort_follows_exchange_rate_changes(self):
+        url = reverse("user-listings", args=[self.seller.id])
+        data = self.client.get(url, {"sort": "price_desc"}).json()
+        self.assertEqual([item["price_currency"] for item in data], ["USD", "UZS"])
+
+        rate = ExchangeRate.objects.get()
+        rate.rate = Decimal("0.5")
+        # The rates cached here would outlive this test's transaction
+        self.addCleanup(cache.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            rate.save()
+        self.assertEqual(Listing.objects.get(price_currency="USD").price_normalized, Decimal("50.00"))
+        data = self.client.get(url, {"sort": "price_desc"}).json()
+        self.assertEqual([item["price_currency"] for item in data], ["UZS", "USD"])
+
+
+@override_settings(LISTING_COUNTER_FLUSH_INTERVAL=3600)
+class ListingCounterTests(APITestCase):
+    def setUp(self):
+        self.seller = get_user_model().objects.create_user(username="seller", password="pass123")
+        category = Category.objects.create(name="Phones", slug="phones", is_leaf=True)
+        location = Location.objects.create(name="Tashkent", slug="tashkent", kind=Location.Kind.CITY)
+        self.listing = Listing.objects.create(
+            user=self.seller, category=category, location=location, title="Phone"
+        )
+
+    def test_increments_are_buffered_and_flushed_in_bulk(self):
+        for _ in range(3):
+            self.client.post(reverse("listing-interest", args=[self.listing.id]))
+        counters.record_view(self.listing.id)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.interest_count, 0)
+
+        with self.assertNumQueries(6):
+            self.assertEqual(counters.flush(), 1)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.view_count, self.listing.interest_count), (1, 3))
+
+        counters.record_view(self.listing.id)
+        counters.flush()
+        stats = ListingDailyStats.objects.get(listing=self.listing)
+        self.assertEqual((stats.views, stats.interests), (2, 3))
+
+        self.client.force_authenticate(user=self.seller)
+        data = self.client.get(reverse("listing-stats", args=[self.listing.id])).json()
+        self.assertEqual(data["daily"][0]["views"], 2)
+
+
+class ListingRollupCountTests(APITestCase):
+    def setUp(self):
+        self.seller = get_user_model().objects.create_user(username="seller", password="pass123")
+        self.electronics = Category.objects.create(name="Electronics", slug="electronics")
+        self.phones = Category.objects.create(name="Phones", slug="phones", parent=self.electronics, is_leaf=True)
+        self.laptops = Category.objects.create(name="Laptops", slug="laptops", parent=self.electronics, is_leaf=True)
+        self.region = Location.objects.create(name="Tashkent Region", slug="tashkent-region", kind=Location.Kind.REGION)
+        self.city = Location.objects.create(name="Chirchiq", slug="chirchiq", kind=Location.Kind.CITY, parent=self.region)
+
+    def _counts(self):
+        return (
+            dict(CategoryListingCount.objects.filter(active_count__gt=0).values_list("category__slug", "active_count")),
+            dict(LocationListingCount.objects.filter(active_count__gt=0).values_list("location__slug", "active_count")),
+        )
+
+    def test_counts_follow_transitions_and_match_reconcile(self):
+        # Increments are applied once the listing write has committed
+        with self.captureOnCommitCallbacks(execute=True):
+            phone = Listing.objects.create(user=self.seller, category=self.phones, location=self.city, title="Phone")
+            laptop = Listing.objects.create(user=self.seller, category=self.laptops, location=self.region, title="Laptop")
+            Listing.objects.create(
+                user=self.seller, category=self.phones, location=self.city, title="Draft", status=Listing.Status.DRAFT
+            )
+            self.assertEqual(self._counts(), ({}, {}))
+        self.assertEqual(self._counts(), (
+            {"electronics": 2, "phones": 1, "laptops": 1},
+            {"tashkent-region": 2, "chirchiq": 1},
+        ))
+
+        phone = Listing.objects.get(pk=phone.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            phone.category = self.laptops
+            phone.save()
+            laptop.status = Listing.Status.PAUSED
+            laptop.save()
+        self.assertEqual(self._counts(), ({"electronics": 1, "laptops": 1}, {"tashkent-region": 1, "chirchiq": 1}))
+
+        Listing.objects.filter(pk=phone.pk).update(expires_at=timezone.now())
+        with self.captureOnCommitCallbacks(execute=True):
+            task_expire_listings()
+        self.assertEqual(self._counts(), ({}, {}))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            laptop.status = Listing.Status.ACTIVE
+            laptop.save()
+        expected = self._counts()
+        CategoryListingCount.objects.update(active_count=7)
+        self.assertEqual(reconcile_listing_counts()["categories"], 3)
+        self.assertEqual(self._counts(), expected)
+
+        get_tree()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("categories-tree"), {"with_counts": 1})
+        self.assertEqual(response.json()[0]["listing_count"], 1)
+        self.assertNotIn("listing_count", self.client.get(reverse("categories-tree")).json()[0])
+        response = self.client.get(reverse("locations"), {"with_counts": 1})
+        self.assertEqual(response.json()[0]["listing_count"], 1)
+        # Only the returned children's rollup rows are read
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("locations"), {"with_counts": 1, "parent_id": self.region.id})
+        self.assertEqual(response.json(), [{**response.json()[0], "slug": "chirchiq", "listing_count": 0}])
+        self.assertIn(f"IN ({self.city.id})", queries[0]["sql"])
+        response = self.client.get(reverse("categories-tree"), {"with_counts": 1, "parent_id": self.electronics.id})
+        self.assertEqual({c["slug"]: c["listing_count"] for c in response.json()}, {"phones": 0, "laptops": 1})
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-from django.db.models import F
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from ..counters import record_interest
 from ..models import Listing
 
 
@@ -16,15 +16,13 @@ class ListingInterestView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request, pk: int):
-        try:
-            listing = Listing.objects.get(id=pk, status=Listing.Status.ACTIVE)
-        except Listing.DoesNotExist:
+        if not Listing.objects.filter(id=pk, status=Listing.Status.ACTIVE).exists():
             return Response(
                 {"detail": "Listing not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Increment the interest count
-        Listing.objects.filter(id=pk).update(interest_count=F('interest_count') + 1)
+        # Buffered; flushed to interest_count and the daily stats in bulk
+        record_interest(pk)
 
         return Response({"tracked": True}, status=status.HTTP_200_OK)
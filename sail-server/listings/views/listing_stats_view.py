@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..models import Listing, ListingDailyStats
+
+
+class ListingStatsView(APIView):
+    """
+    GET /api/v1/listings/<pk>/stats?days=30
+    Daily views and interests of the seller's own listing, newest first.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk: int):
+        try:
+            listing = Listing.objects.only("id", "view_count", "interest_count").get(pk=pk, user=request.user)
+        except Listing.DoesNotExist:
+            return Response({"detail": "Not found"}, status=404)
+        try:
+            days = max(1, min(int(request.query_params.get("days", 30)), 365))
+        except ValueError:
+            days = 30
+        since = timezone.localdate() - timedelta(days=days - 1)
+        rows = ListingDailyStats.objects.filter(listing=listing, day__gte=since).values("day", "views", "interests")
+        return Response({
+            "listing_id": listing.id,
+            "view_count": listing.view_count,
+            "interest_count": listing.interest_count,
+            "daily": list(rows),
+        })
@@ -16,12 +16,12 @@ class UserListingsView(generics.ListAPIView):
         queryset = Listing.objects.filter(
             user_id=user_id,
             status=Listing.Status.ACTIVE
-        ).select_related("category", "location", "user").prefetch_related("media")
+        ).prefetch_related("media")
 
-        # Apply filters
+        # Apply filters; a category includes its subcategories
         category_slug = self.request.query_params.get("category")
         if category_slug:
-            queryset = queryset.filter(category__slug=category_slug)
+            queryset = queryset.in_category(category_slug)
 
         sort = self.request.query_params.get("sort", "newest")
         if sort == "newest":
@@ -29,8 +29,8 @@ class UserListingsView(generics.ListAPIView):
         elif sort == "oldest":
             queryset = queryset.order_by("refreshed_at", "created_at")
         elif sort == "price_asc":
-            queryset = queryset.order_by("price_amount")
+            queryset = queryset.order_by("price_normalized")
         elif sort == "price_desc":
-            queryset = queryset.order_by("-price_amount")
+            queryset = queryset.order_by("-price_normalized")
 
         return queryset
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import ListingNeighbors
+
+
+@admin.register(ListingNeighbors)
+class ListingNeighborsAdmin(admin.ModelAdmin):
+    list_display = ("listing", "kind", "computed_at")
+    list_filter = ("kind",)
+    raw_id_fields = ("listing",)
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import SimilarListingsView
+
+urlpatterns = [
+    path("listings/<int:pk>/similar", SimilarListingsView.as_view(), name="listing-similar"),
+]
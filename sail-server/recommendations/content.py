@@ -0,0 +1,314 @@
+"""
+Content-based "similar listings".
+
+Every active listing is turned into a hashed TF-IDF vector over the words
+of its title (counted twice) and description, its category path and its
+attribute option keys. Listings are only compared within their top-level
+category, which keeps each similarity product small and is where almost
+all useful neighbours live anyway. Within a partition the cosine top-K is
+exact, computed a block of rows at a time.
+
+``build_content_neighbors`` recomputes everything and stores each
+partition's document frequencies (``ContentVocabulary``).
+``update_content_neighbors`` handles listings (re)indexed since: it weights
+them with the stored IDF and compares them to a bounded candidate set (the
+most recent listings of the same categories and the listings' previous
+neighbours) rather than the whole partition, then slots them into their
+neighbours' lists. The nightly build restores exact lists.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import zlib
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from listings.models import Listing, ListingAttributeValue
+from taxonomy.tree import get_tree
+
+from .models import ContentVocabulary, ListingNeighbors
+from .neighbors import store_neighbors, upsert_neighbors
+
+try:
+    import numpy as np
+    from scipy import sparse
+except Exception:  # pragma: no cover - only needed by the offline jobs
+    np = None  # type: ignore
+    sparse = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 2 ** 18
+# Upper bound on similarity scores held in memory per block
+BLOCK_CELLS = 2_000_000
+# Below this, listings only share boilerplate
+MIN_SCORE = 0.05
+
+_WORD_RE = re.compile(r"\w{2,}", re.UNICODE)
+
+Neighbors = Dict[int, Tuple[List[int], List[float]]]
+
+
+def content_available() -> bool:
+    return np is not None and sparse is not None
+
+
+def _require_numpy() -> None:
+    if not content_available():
+        raise RuntimeError("numpy and scipy are required to build similar listings")
+
+
+def _top_k_setting(top_k: Optional[int]) -> int:
+    return top_k or int(getattr(settings, "RECOMMENDATIONS_TOP_K", 20))
+
+
+def _tokens(title: str, description: str, category_slugs: List[str], option_keys: List[str]) -> List[str]:
+    title_words = _WORD_RE.findall((title or "").lower())
+    return (
+        title_words * 2
+        + _WORD_RE.findall((description or "").lower())
+        + [f"cat:{slug}" for slug in category_slugs]
+        + [f"opt:{key}" for key in option_keys]
+    )
+
+
+def _feature(token: str) -> int:
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(token.encode("utf-8")) % N_FEATURES
+
+
+def _partition_of(category_id: Optional[int]) -> Optional[int]:
+    node = get_tree().category(category_id)
+    return node.path_ids[0] if node else None
+
+
+def _partition_listings(root_id: int):
+    """Active listings under one top-level category."""
+    return Listing.objects.filter(
+        status=Listing.Status.ACTIVE, category_id__in=get_tree().category_descendants(root_id)
+    )
+
+
+def _load_listings(queryset) -> Tuple[List[int], List[List[str]]]:
+    """Ids and token lists of the listings in ``queryset``, by id."""
+    tree = get_tree()
+    rows = list(queryset.order_by("id").values_list("id", "title", "description", "category_id"))
+    options: Dict[int, List[str]] = defaultdict(list)
+    attrs = (
+        ListingAttributeValue.objects.filter(listing_id__in=[r[0] for r in rows])
+        .exclude(value_option_key="")
+        .order_by()
+        .values_list("listing_id", "attribute__key", "value_option_key")
+    )
+    for listing_id, key, option in attrs.iterator(chunk_size=5000):
+        options[listing_id].append(f"{key}={option}")
+    ids = [r[0] for r in rows]
+    tokens = [
+        _tokens(title, description, tree.category_path_slugs(category_id), options.get(listing_id, []))
+        for listing_id, title, description, category_id in rows
+    ]
+    return ids, tokens
+
+
+def _term_frequencies(tokens: List[List[str]]):
+    """Sublinear term frequencies, one row per token list."""
+    indptr, indices, counts = [0], [], []
+    for doc in tokens:
+        features = Counter(_feature(t) for t in doc)
+        indices.extend(features.keys())
+        counts.extend(features.values())
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix(
+        (np.array(counts, dtype=np.float32), np.array(indices, dtype=np.int64), np.array(indptr)),
+        shape=(len(tokens), N_FEATURES),
+    )
+    matrix.data = 1.0 + np.log(matrix.data)
+    return matrix
+
+
+def _document_frequencies(matrix) -> np.ndarray:
+    return np.bincount(matrix.indices, minlength=N_FEATURES)
+
+
+def _idf(df: np.ndarray, documents: int) -> np.ndarray:
+    """Smoothed idf; features missing from ``df`` weigh as much as the rarest ones."""
+    return (np.log((1.0 + documents) / (1.0 + df)) + 1.0).astype(np.float32)
+
+
+def _weigh(matrix, idf: np.ndarray):
+    """L2-normalized TF-IDF rows."""
+    matrix = (matrix @ sparse.diags(idf)).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (sparse.diags(1.0 / norms) @ matrix).tocsr().astype(np.float32)
+
+
+def _top_k(queries, query_ids: np.ndarray, corpus, corpus_ids: np.ndarray, k: int) -> Neighbors:
+    """Cosine top-K of every query row against the corpus, excluding the row's own listing."""
+    result: Neighbors = {}
+    if corpus.shape[0] == 0:
+        return result
+    block = max(1, BLOCK_CELLS // corpus.shape[0])
+    corpus_t = corpus.T.tocsc()
+    for start in range(0, queries.shape[0], block):
+        scores = (queries[start:start + block] @ corpus_t).toarray()
+        ids = query_ids[start:start + block]
+        scores[corpus_ids[None, :] == ids[:, None]] = 0.0
+        kk = min(k, scores.shape[1])
+        best = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        for row, listing_id in enumerate(ids):
+            keep = best_scores[row] >= MIN_SCORE
+            result[int(listing_id)] = (
+                corpus_ids[best[row][keep]].tolist(),
+                best_scores[row][keep].tolist(),
+            )
+    return result
+
+
+def _store_vocabularies(vocabularies: List[ContentVocabulary], computed_at) -> None:
+    ContentVocabulary.objects.bulk_create(
+        vocabularies,
+        update_conflicts=True,
+        unique_fields=["root_category_id"],
+        update_fields=["documents", "features", "counts", "computed_at"],
+    )
+    ContentVocabulary.objects.filter(computed_at__lt=computed_at).delete()
+
+
+def _vocabulary(root_id: int, df: np.ndarray, documents: int, computed_at) -> ContentVocabulary:
+    features = np.flatnonzero(df)
+    return ContentVocabulary(
+        root_category_id=root_id,
+        documents=documents,
+        features=features.astype(np.int32).tobytes(),
+        counts=df[features].astype(np.int32).tobytes(),
+        computed_at=computed_at,
+    )
+
+
+def _stored_idf(root_id: int) -> Optional[np.ndarray]:
+    """IDF of a partition as of the last full build; None if it was never built."""
+    row = (
+        ContentVocabulary.objects.filter(root_category_id=root_id)
+        .values_list("documents", "features", "counts")
+        .first()
+    )
+    if row is None:
+        return None
+    documents, features, counts = row
+    df = np.zeros(N_FEATURES, dtype=np.int64)
+    df[np.frombuffer(features, dtype=np.int32)] = np.frombuffer(counts, dtype=np.int32)
+    return _idf(df, documents)
+
+
+def build_content_neighbors(top_k: Optional[int] = None) -> Dict[str, int]:
+    """Recompute the similar listings of every active listing; returns run statistics."""
+    _require_numpy()
+    k = _top_k_setting(top_k)
+    computed_at = timezone.now()
+    neighbors: Neighbors = {}
+    vocabularies: List[ContentVocabulary] = []
+    listings = 0
+    for root in get_tree().category_roots():
+        ids, tokens = _load_listings(_partition_listings(root.id))
+        if not ids:
+            continue
+        tf = _term_frequencies(tokens)
+        df = _document_frequencies(tf)
+        vectors = _weigh(tf, _idf(df, len(ids)))
+        id_array = np.array(ids, dtype=np.int64)
+        neighbors.update(_top_k(vectors, id_array, vectors, id_array, k))
+        vocabularies.append(_vocabulary(root.id, df, len(ids), computed_at))
+        listings += len(ids)
+    stored = store_neighbors(ListingNeighbors.Kind.CONTENT, neighbors, computed_at)
+    _store_vocabularies(vocabularies, computed_at)
+    logger.info("Stored similar listings for %s of %s listings", stored, listings)
+    return {"listings": listings, "stored": stored}
+
+
+def update_content_neighbors(listing_ids: Iterable[int], top_k: Optional[int] = None) -> int:
+    """
+    Refresh the similar listings of recently (re)indexed listings.
+
+    Per touched partition, the batch and its candidates (the most recent
+    ``RECOMMENDATIONS_CONTENT_CANDIDATES`` active listings of the batch's
+    categories plus the listings' previous neighbours) are weighted with the
+    IDF stored by the last full build. The listings get fresh neighbour
+    lists, and each of their neighbours gets the listing inserted into its
+    own list if it now ranks in its top-K. Rows of listings that are no
+    longer active are dropped. Returns the number of rows written.
+    """
+    _require_numpy()
+    k = _top_k_setting(top_k)
+    limit = int(getattr(settings, "RECOMMENDATIONS_CONTENT_CANDIDATES", 5000))
+    listing_ids = set(listing_ids)
+    active = dict(
+        Listing.objects.filter(id__in=listing_ids, status=Listing.Status.ACTIVE)
+        .order_by()
+        .values_list("id", "category_id")
+    )
+    by_partition: Dict[int, List[int]] = defaultdict(list)
+    for listing_id, category_id in active.items():
+        root_id = _partition_of(category_id)
+        if root_id is not None:
+            by_partition[root_id].append(listing_id)
+
+    computed_at = timezone.now()
+    fresh: Neighbors = {}
+    for root_id, new_ids in by_partition.items():
+        recent = list(
+            Listing.objects.filter(
+                status=Listing.Status.ACTIVE, category_id__in={active[i] for i in new_ids}
+            ).order_by("-id").values_list("id", flat=True)[:limit]
+        )
+        previous = [
+            n
+            for neighbor_ids in ListingNeighbors.objects.filter(
+                kind=ListingNeighbors.Kind.CONTENT, listing_id__in=new_ids
+            ).values_list("neighbor_ids", flat=True)
+            for n in neighbor_ids
+        ]
+        ids, tokens = _load_listings(_partition_listings(root_id).filter(id__in={*new_ids, *recent, *previous}))
+        tf = _term_frequencies(tokens)
+        idf = _stored_idf(root_id)
+        if idf is None:
+            # Partition not built yet: the candidates are all there is to count
+            idf = _idf(_document_frequencies(tf), len(ids))
+        vectors = _weigh(tf, idf)
+        id_array = np.array(ids, dtype=np.int64)
+        wanted = set(new_ids)
+        rows = [i for i, listing_id in enumerate(ids) if listing_id in wanted]
+        fresh.update(_top_k(vectors[rows], id_array[rows], vectors, id_array, k))
+
+    # Reverse edges: cosine is symmetric, so a new listing's neighbours may now rank it
+    reverse: Neighbors = {
+        listing_id: (ids, scores)
+        for listing_id, ids, scores in ListingNeighbors.objects.filter(
+            kind=ListingNeighbors.Kind.CONTENT,
+            listing_id__in={n for ids, _ in fresh.values() for n in ids} - set(fresh),
+        ).values_list("listing_id", "neighbor_ids", "scores")
+    }
+    changed = set()
+    for listing_id, (ids, scores) in fresh.items():
+        for neighbor_id, score in zip(ids, scores):
+            old_ids, old_scores = reverse.get(neighbor_id, ([], []))
+            merged = {n: s for n, s in zip(old_ids, old_scores) if n != listing_id}
+            merged[listing_id] = score
+            ranked = sorted(merged.items(), key=lambda item: (-item[1], item[0]))[:k]
+            if any(n == listing_id for n, _ in ranked):
+                reverse[neighbor_id] = ([n for n, _ in ranked], [s for _, s in ranked])
+                changed.add(neighbor_id)
+
+    # Inactive listings and ones left without neighbours lose their row
+    emptied = (listing_ids - set(fresh)) | {i for i, (ids, _) in fresh.items() if not ids}
+    ListingNeighbors.objects.filter(kind=ListingNeighbors.Kind.CONTENT, listing_id__in=emptied).delete()
+    fresh.update({i: reverse[i] for i in changed})
+    return upsert_neighbors(ListingNeighbors.Kind.CONTENT, fresh, computed_at)
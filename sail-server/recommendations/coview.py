@@ -0,0 +1,130 @@
+"""
+Offline item-to-item "viewed together" similarity.
+
+Recently viewed entries and favorites form a sparse owner × listing matrix
+(owners are users and anonymous sessions). Its Gram matrix counts how often
+two listings share an owner; normalizing it by the listings' own weights
+gives the cosine similarity of their audiences. The top
+``RECOMMENDATIONS_TOP_K`` active neighbours of every listing are stored in
+``ListingNeighbors`` so the suggestions endpoint never computes anything.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from favorites.models import FavoriteListing, RecentlyViewedListing
+from listings.models import Listing
+
+from .models import ListingNeighbors
+from .neighbors import store_neighbors
+
+try:
+    import numpy as np
+    from scipy import sparse
+except Exception:  # pragma: no cover - only needed by the offline job
+    np = None  # type: ignore
+    sparse = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# A favorite says more about a listing than a view
+FAVORITE_WEIGHT = 3.0
+
+
+def _interactions(since) -> Tuple[List[Tuple[object, int, float]], int]:
+    """(owner, listing_id, weight) triples from views in the window and all favorites."""
+    triples: List[Tuple[object, int, float]] = []
+    views = (
+        RecentlyViewedListing.objects.filter(viewed_at__gte=since)
+        .order_by()
+        .values_list("user_id", "session_key", "listing_id")
+    )
+    for user_id, session_key, listing_id in views.iterator(chunk_size=5000):
+        owner = ("u", user_id) if user_id else ("s", session_key)
+        triples.append((owner, listing_id, 1.0))
+    favorites = FavoriteListing.objects.order_by().values_list("user_id", "listing_id")
+    for user_id, listing_id in favorites.iterator(chunk_size=5000):
+        triples.append((("u", user_id), listing_id, FAVORITE_WEIGHT))
+    return triples, len(triples)
+
+
+def build_coview_neighbors(
+    top_k: Optional[int] = None, window_days: Optional[int] = None, min_support: Optional[int] = None
+) -> Dict[str, int]:
+    """Recompute and store co-view neighbours of every listing; returns run statistics."""
+    if np is None or sparse is None:
+        raise RuntimeError("numpy and scipy are required to build co-view recommendations")
+    top_k = top_k or int(getattr(settings, "RECOMMENDATIONS_TOP_K", 20))
+    window_days = window_days or int(getattr(settings, "RECOMMENDATIONS_COVIEW_WINDOW_DAYS", 90))
+    min_support = min_support or int(getattr(settings, "RECOMMENDATIONS_COVIEW_MIN_SUPPORT", 2))
+    computed_at = timezone.now()
+
+    triples, total = _interactions(computed_at - timedelta(days=window_days))
+    owners: Dict[object, int] = {}
+    items: Dict[int, int] = {}
+    rows, cols, weights = [], [], []
+    for owner, listing_id, weight in triples:
+        rows.append(owners.setdefault(owner, len(owners)))
+        cols.append(items.setdefault(listing_id, len(items)))
+        weights.append(weight)
+    if not items:
+        store_neighbors(ListingNeighbors.Kind.COVIEW, {}, computed_at)
+        return {"interactions": 0, "owners": 0, "listings": 0, "stored": 0}
+
+    shape = (len(owners), len(items))
+    # Duplicate (owner, listing) pairs, e.g. viewed and favorited, are summed
+    weighted = sparse.csr_matrix((np.array(weights), (np.array(rows), np.array(cols))), shape=shape)
+    seen = (weighted > 0).astype(np.float32)
+    # Owners with long histories say less about any single pair
+    per_owner = np.asarray(seen.sum(axis=1)).ravel()
+    damping = sparse.diags(1.0 / np.log2(1.0 + np.maximum(per_owner, 1.0)))
+    weighted = damping @ weighted
+
+    similarity = (weighted.T @ weighted).tocsr()
+    norms = np.sqrt(similarity.diagonal())
+    inverse = sparse.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0))
+    similarity = (inverse @ similarity @ inverse).tocsr()
+
+    # Pairs seen together by fewer than min_support owners are noise
+    support = (seen.T @ seen).tocsr()
+    support.data = (support.data >= min_support).astype(np.float32)
+    similarity = similarity.multiply(support).tocsr()
+
+    # Only active listings are worth recommending; a sold one can still be a source
+    index_of = np.empty(len(items), dtype=np.int64)
+    for listing_id, column in items.items():
+        index_of[column] = listing_id
+    active = set(
+        Listing.objects.filter(id__in=list(items), status=Listing.Status.ACTIVE)
+        .order_by()
+        .values_list("id", flat=True)
+    )
+    mask = np.fromiter((listing_id in active for listing_id in index_of), dtype=np.float32, count=len(items))
+    similarity = (similarity @ sparse.diags(mask)).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    neighbors: Dict[int, Tuple[List[int], List[float]]] = {}
+    for row in range(similarity.shape[0]):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        if start == end:
+            continue
+        data = similarity.data[start:end]
+        columns = similarity.indices[start:end]
+        if len(data) > top_k:
+            best = np.argpartition(-data, top_k)[:top_k]
+            data, columns = data[best], columns[best]
+        order = np.lexsort((index_of[columns], -data))
+        neighbors[int(index_of[row])] = (
+            index_of[columns[order]].tolist(),
+            [float(s) for s in data[order]],
+        )
+
+    stored = store_neighbors(ListingNeighbors.Kind.COVIEW, neighbors, computed_at)
+    logger.info("Stored co-view neighbours for %s of %s listings", stored, len(items))
+    return {"interactions": total, "owners": len(owners), "listings": len(items), "stored": stored}
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from recommendations.content import build_content_neighbors
+from recommendations.coview import build_coview_neighbors
+
+
+class Command(BaseCommand):
+    help = "Recompute precomputed listing recommendations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            choices=['coview', 'content', 'all'],
+            default='all',
+            help='Which neighbour lists to rebuild'
+        )
+        parser.add_argument('--top-k', type=int, default=None, help='Neighbours stored per listing')
+        parser.add_argument('--window-days', type=int, default=None, help='Only use views from the last N days (co-view)')
+        parser.add_argument('--min-support', type=int, default=None, help='Owners two listings must share (co-view)')
+
+    def handle(self, *args, **options):
+        if options['kind'] in ('coview', 'all'):
+            stats = build_coview_neighbors(
+                top_k=options['top_k'],
+                window_days=options['window_days'],
+                min_support=options['min_support'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Co-view: {stats['stored']} listings with neighbours "
+                f"({stats['interactions']} interactions, {stats['listings']} listings)"
+            ))
+        if options['kind'] in ('content', 'all'):
+            stats = build_content_neighbors(top_k=options['top_k'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Content: {stats['stored']} of {stats['listings']} active listings with similar listings"
+            ))
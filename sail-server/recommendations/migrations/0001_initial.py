@@ -0,0 +1,34 @@
+# Generated by Django 4.2.28 on 2026-10-16 22:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('listings', '0007_listing_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingNeighbors',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('coview', 'Co-viewed')], max_length=16)),
+                ('neighbor_ids', models.JSONField(default=list)),
+                ('scores', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField()),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='listings.listing')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'computed_at'], name='recommendat_kind_2fc702_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='listingneighbors',
+            constraint=models.UniqueConstraint(fields=('listing', 'kind'), name='uniq_listing_neighbors_kind'),
+        ),
+    ]
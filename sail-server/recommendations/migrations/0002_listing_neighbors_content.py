@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-16 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listingneighbors',
+            name='kind',
+            field=models.CharField(choices=[('coview', 'Co-viewed'), ('content', 'Similar content')], max_length=16),
+        ),
+    ]
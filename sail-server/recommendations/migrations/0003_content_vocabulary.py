@@ -0,0 +1,24 @@
+# Generated by Django 4.2.28 on 2026-10-16 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0002_listing_neighbors_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentVocabulary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('root_category_id', models.BigIntegerField(unique=True)),
+                ('documents', models.IntegerField()),
+                ('features', models.BinaryField()),
+                ('counts', models.BinaryField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from django.db import models
+
+
+class ListingNeighbors(models.Model):
+    """
+    Precomputed top-K similar listings of one listing, built offline.
+
+    ``neighbor_ids`` and ``scores`` are parallel lists ordered by descending
+    score, so a page of recommendations is one row read instead of a query
+    per candidate.
+    """
+
+    class Kind(models.TextChoices):
+        COVIEW = "coview", "Co-viewed"
+        CONTENT = "content", "Similar content"
+
+    listing = models.ForeignKey("listings.Listing", on_delete=models.CASCADE, related_name="neighbors")
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    neighbor_ids = models.JSONField(default=list)
+    scores = models.JSONField(default=list)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "kind"], name="uniq_listing_neighbors_kind"),
+        ]
+        indexes = [
+            models.Index(fields=["kind", "computed_at"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.kind} neighbors of {self.listing_id}"
+
+
+class ContentVocabulary(models.Model):
+    """
+    Document frequencies of one content partition (a top-level category), from the nightly build.
+
+    ``features`` and ``counts`` are parallel int32 arrays of the hashed
+    features that occur in the partition and the number of listings holding
+    each. Incremental updates weight new listings with this IDF instead of
+    re-counting the partition.
+    """
+
+    root_category_id = models.BigIntegerField(unique=True)
+    documents = models.IntegerField()
+    features = models.BinaryField()
+    counts = models.BinaryField()
+    computed_at = models.DateTimeField()
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"content vocabulary of category {self.root_category_id}"
@@ -0,0 +1,79 @@
+"""
+Storage and lookup of precomputed neighbour lists.
+
+Offline jobs write one ``ListingNeighbors`` row per (listing, kind); request
+paths only ever read them, merging the lists of several source listings
+from a single query.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from .models import ListingNeighbors
+
+# Weight of the n-th most recent source listing when merging neighbour lists
+RECENCY_DECAY = 0.85
+
+
+def store_neighbors(
+    kind: str, neighbors: Dict[int, Tuple[List[int], List[float]]], computed_at: datetime, batch_size: int = 1000
+) -> int:
+    """
+    Replace all neighbour lists of one kind with the result of a full run.
+
+    ``neighbors`` maps a listing id to parallel (neighbor_ids, scores) lists
+    sorted by descending score; rows of listings not in it are dropped.
+    """
+    stored = upsert_neighbors(kind, neighbors, computed_at, batch_size=batch_size)
+    ListingNeighbors.objects.filter(kind=kind, computed_at__lt=computed_at).delete()
+    return stored
+
+
+def upsert_neighbors(
+    kind: str, neighbors: Dict[int, Tuple[List[int], List[float]]], computed_at: datetime, batch_size: int = 1000
+) -> int:
+    """Write the given neighbour lists, leaving other listings' rows alone; empty lists are skipped."""
+    rows = [
+        ListingNeighbors(
+            listing_id=listing_id,
+            kind=kind,
+            neighbor_ids=[int(i) for i in ids],
+            scores=[round(float(s), 4) for s in scores],
+            computed_at=computed_at,
+        )
+        for listing_id, (ids, scores) in neighbors.items()
+        if ids
+    ]
+    ListingNeighbors.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["listing", "kind"],
+        update_fields=["neighbor_ids", "scores", "computed_at"],
+    )
+    return len(rows)
+
+
+def merged_neighbors(kind: str, source_ids: Sequence[int], exclude: Iterable[int] = ()) -> List[int]:
+    """
+    Candidate ids ranked by the summed scores of the sources' neighbour lists.
+
+    ``source_ids`` are ordered most relevant (e.g. most recently viewed)
+    first; later sources count for geometrically less.
+    """
+    if not source_ids:
+        return []
+    rank = {listing_id: i for i, listing_id in reversed(list(enumerate(source_ids)))}
+    excluded = set(exclude) | set(rank)
+    totals: Dict[int, float] = defaultdict(float)
+    rows = ListingNeighbors.objects.filter(kind=kind, listing_id__in=list(rank)).values_list(
+        "listing_id", "neighbor_ids", "scores"
+    )
+    for listing_id, neighbor_ids, scores in rows:
+        weight = RECENCY_DECAY ** rank[listing_id]
+        for neighbor_id, score in zip(neighbor_ids, scores):
+            if neighbor_id not in excluded:
+                totals[neighbor_id] += weight * score
+    return sorted(totals, key=lambda i: (-totals[i], i))
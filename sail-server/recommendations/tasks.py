@@ -0,0 +1,25 @@
+from celery import shared_task
+
+from .content import build_content_neighbors, content_available, update_content_neighbors
+from .coview import build_coview_neighbors
+
+
+# The nightly builds run far past the global 30s/60s task limits
+@shared_task(name="recommendations.build_coview", soft_time_limit=2 * 3600, time_limit=2 * 3600 + 300)
+def task_build_coview_neighbors():
+    """Recompute the "viewed together" neighbours of every listing."""
+    return build_coview_neighbors()
+
+
+@shared_task(name="recommendations.build_content", soft_time_limit=2 * 3600, time_limit=2 * 3600 + 300)
+def task_build_content_neighbors():
+    """Recompute the content-based similar listings of every active listing."""
+    return build_content_neighbors()
+
+
+@shared_task(name="recommendations.update_content")
+def task_update_content_neighbors(listing_ids: list[int]):
+    """Refresh similar listings of listings the search outbox just synced."""
+    if not content_available():
+        return {"status": "skipped", "reason": "numpy-unavailable"}
+    return {"updated": update_content_neighbors(listing_ids)}
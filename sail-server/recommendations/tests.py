@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from favorites.models import FavoriteListing, RecentlyViewedListing
+from listings.models import Listing
+from recommendations.content import build_content_neighbors, update_content_neighbors
+from recommendations.coview import build_coview_neighbors
+from recommendations.models import ContentVocabulary, ListingNeighbors
+from taxonomy.models import Category, Location
+
+
+class CoviewRecommendationTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.seller = User.objects.create_user(username="seller", password="pass123")
+        phones = Category.objects.create(name="Phones", slug="phones", is_leaf=True)
+        cases = Category.objects.create(name="Cases", slug="cases", is_leaf=True)
+        location = Location.objects.create(name="Tashkent", slug="tashkent", kind=Location.Kind.CITY)
+
+        def listing(title, category):
+            return Listing.objects.create(user=self.seller, category=category, location=location, title=title)
+
+        self.phone = listing("Phone", phones)
+        self.case = listing("Case", cases)
+        self.other_phone = listing("Other phone", phones)
+        # Two viewers looked at the phone and its case together
+        for name in ("a", "b"):
+            user = User.objects.create_user(username=name, password="pass123")
+            RecentlyViewedListing.objects.create(user=user, listing=self.phone)
+            RecentlyViewedListing.objects.create(user=user, listing=self.case)
+        FavoriteListing.objects.create(user=self.seller, listing=self.other_phone)
+
+    def test_coview_neighbors_are_suggested_first(self):
+        stats = build_coview_neighbors(min_support=2)
+        self.assertEqual(stats["stored"], 2)
+        row = ListingNeighbors.objects.get(listing=self.phone, kind=ListingNeighbors.Kind.COVIEW)
+        self.assertEqual(row.neighbor_ids, [self.case.id])
+
+        viewer = get_user_model().objects.create_user(username="viewer", password="pass123")
+        RecentlyViewedListing.objects.create(user=viewer, listing=self.phone)
+        self.client.force_authenticate(viewer)
+        response = self.client.get(reverse("suggested-listings"), {"limit": 2})
+
+        self.assertEqual(response.status_code, 200)
+        # The co-viewed case comes first even though it is in another category
+        self.assertEqual([r["id"] for r in response.data["results"]], [self.case.id, self.other_phone.id])
+
+
+class ContentSimilarityTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="seller", password="pass123")
+        electronics = Category.objects.create(name="Electronics", slug="electronics")
+        self.phones = Category.objects.create(name="Phones", slug="phones", parent=electronics, is_leaf=True)
+        cars = Category.objects.create(name="Cars", slug="cars", is_leaf=True)
+        self.location = Location.objects.create(name="Tashkent", slug="tashkent", kind=Location.Kind.CITY)
+        self.iphone = self._listing("iPhone 13 Pro 256GB", self.phones, "Apple smartphone in great condition")
+        self.iphone_mini = self._listing("iPhone 13 mini", self.phones, "Apple smartphone, small and light")
+        self.samsung = self._listing("Samsung Galaxy S21", self.phones, "Android phone with charger")
+        # Same words, other top-level category: never compared
+        self._listing("iPhone 13 Pro car mount", cars, "Apple smartphone holder")
+
+    def _listing(self, title, category, description):
+        return Listing.objects.create(
+            user=self.user, category=category, location=self.location, title=title, description=description
+        )
+
+    def test_similar_listings_stay_in_partition_and_update_incrementally(self):
+        build_content_neighbors()
+        response = self.client.get(reverse("listing-similar", args=[self.iphone.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r["id"] for r in response.data["results"]], [self.iphone_mini.id, self.samsung.id]
+        )
+        response = self.client.get(reverse("listing-similar", args=[self.iphone.id]), {"limit": "abc"})
+        self.assertEqual(response.status_code, 200)
+
+        # Incremental updates reuse the IDF of the full build
+        self.assertEqual(ContentVocabulary.objects.get(root_category_id=self.phones.parent_id).documents, 3)
+        iphone_max = self._listing("iPhone 13 Pro Max 256GB", self.phones, "Apple smartphone in great condition")
+        update_content_neighbors([iphone_max.id])
+        row = ListingNeighbors.objects.get(listing=self.iphone, kind=ListingNeighbors.Kind.CONTENT)
+        self.assertEqual(row.neighbor_ids[0], iphone_max.id)
+
+        self.iphone_mini.status = Listing.Status.CLOSED
+        self.iphone_mini.save()
+        update_content_neighbors([self.iphone_mini.id])
+        self.assertFalse(ListingNeighbors.objects.filter(listing=self.iphone_mini).exists())
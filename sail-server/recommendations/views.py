@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from django.shortcuts import get_object_or_404
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from listings.models import Listing
+from listings.serializers import ListingSerializer
+from .models import ListingNeighbors
+
+
+class SimilarListingsView(APIView):
+    """
+    GET /api/v1/listings/<pk>/similar
+
+    Active listings with similar content (title, description, category,
+    attributes), precomputed by ``recommendations.content``.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk: int):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 12)), 1), 50)
+        except (TypeError, ValueError):
+            limit = 12
+        listing = get_object_or_404(Listing.objects.only('id'), pk=pk)
+        row = ListingNeighbors.objects.filter(
+            listing=listing, kind=ListingNeighbors.Kind.CONTENT
+        ).values_list('neighbor_ids', flat=True).first() or []
+
+        # Neighbours may have been deactivated since they were computed
+        ranked = row[:limit * 2]
+        by_id = Listing.objects.filter(id__in=ranked, status=Listing.Status.ACTIVE).in_bulk()
+        similar = [by_id[i] for i in ranked if i in by_id][:limit]
+
+        serializer = ListingSerializer(similar, many=True, context={'request': request})
+        return Response({
+            'results': serializer.data,
+            'count': len(serializer.data),
+        }, status=status.HTTP_200_OK)
@@ -5,3 +5,5 @@ class SavedsearchesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "savedsearches"
 
+    def ready(self):  # pragma: no cover
+        from . import signals  # noqa: F401
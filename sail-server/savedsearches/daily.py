@@ -0,0 +1,229 @@
+"""
+Daily saved-search digest.
+
+The job used to send one search request and one blocking Telegram POST per
+saved search, serially. Now:
+
+* the coordinator groups all eligible saved searches by filter spec and
+  runs one Celery subtask per batch of whole groups;
+* saved searches with the same filter spec share one query, whoever owns
+  them: a ``range`` aggregation on ``created_at`` returns the "new since"
+  count of every subscriber (each has their own ``last_viewed_at``) at once;
+* those queries go out in ``_msearch`` batches;
+* messages are sent by a bounded thread pool.
+
+Per-run totals are accumulated in ``DailyDigestRun`` (see ``last_run_metrics``).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from searchapp.views.index import index_name
+from searchapp.views.opensearch_client import get_client
+from searchapp.views.query_builder import saved_query_spec
+
+from .models import DailyDigestRun, SavedSearch
+from .utils import saved_search_query
+
+logger = logging.getLogger(__name__)
+
+METRIC_FIELDS = (
+    "shards_done", "searches", "unique_queries", "msearch_requests", "query_errors",
+    "notifications_sent", "notification_failures", "elapsed_ms",
+)
+
+
+def eligible_searches():
+    return SavedSearch.objects.filter(
+        is_active=True,
+        frequency=SavedSearch.Frequency.DAILY,
+        user__profile__telegram_id__isnull=False,
+    )
+
+
+def normalized_query_key(query: Optional[Dict[str, Any]]) -> str:
+    """Identical searches map to the same key regardless of param order, spelling, case or paging."""
+    filters, q = saved_query_spec(query)
+    canonical = {
+        **filters,
+        "attrs": {k: sorted(set(v)) for k, v in filters.get("attrs", {}).items()},
+        "q": " ".join((q or "").lower().split()),
+    }
+    return hashlib.sha1(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+def plan_shards(shard_size: Optional[int] = None) -> List[List[int]]:
+    """
+    Saved search ids per subtask, about ``shard_size`` each.
+
+    Searches are grouped by normalized query here, across all users, and a
+    group is never split, so every distinct query is run exactly once.
+    """
+    shard_size = shard_size or int(getattr(settings, "SAVED_SEARCH_SHARD_SEARCHES", 5000))
+    groups: Dict[str, List[int]] = {}
+    rows = eligible_searches().filter(last_viewed_at__isnull=False).order_by("id").values_list("id", "query")
+    for saved_id, query in rows.iterator(chunk_size=5000):
+        groups.setdefault(normalized_query_key(query), []).append(saved_id)
+    shards: List[List[int]] = []
+    current: List[int] = []
+    for ids in groups.values():
+        if current and len(current) + len(ids) > shard_size:
+            shards.append(current)
+            current = []
+        current += ids
+    if current:
+        shards.append(current)
+    return shards
+
+
+def run_shard(saved_search_ids: Iterable[int], run_id: Optional[str] = None) -> Dict[str, Any]:
+    """Count and notify the given daily saved searches (whole query groups, see ``plan_shards``)."""
+    started = time.monotonic()
+    metrics = dict.fromkeys(METRIC_FIELDS, 0)
+    searches = list(
+        eligible_searches()
+        .filter(id__in=list(saved_search_ids), last_viewed_at__isnull=False)
+        .values("id", "title", "query", "last_viewed_at", "user__profile__telegram_id")
+    )
+    metrics["searches"] = len(searches)
+
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for saved in searches:
+        groups.setdefault(normalized_query_key(saved["query"]), []).append(saved)
+    metrics["unique_queries"] = len(groups)
+
+    counts = _count_new_items(list(groups.values()), metrics)
+    due = [saved for saved in searches if counts.get(saved["id"], 0) > 0]
+    sent_ids = _send_notifications(due, counts, metrics)
+    if sent_ids:
+        SavedSearch.objects.filter(id__in=sent_ids).update(last_sent_at=timezone.now())
+
+    metrics["shards_done"] = 1
+    metrics["elapsed_ms"] = int((time.monotonic() - started) * 1000)
+    record_metrics(run_id, metrics)
+    logger.info(
+        "Saved search shard: %s searches, %s unique queries, %s notifications in %sms",
+        metrics["searches"], metrics["unique_queries"], metrics["notifications_sent"], metrics["elapsed_ms"],
+    )
+    return metrics
+
+
+def _count_new_items(groups: List[List[Dict[str, Any]]], metrics: Dict[str, int]) -> Dict[int, int]:
+    """New-item counts per saved search id, one aggregation per group, sent via ``_msearch``."""
+    client = get_client()
+    if not client or not groups:
+        return {}
+    batch_size = int(getattr(settings, "SAVED_SEARCH_MSEARCH_BATCH", 50))
+    counts: Dict[int, int] = {}
+    for start in range(0, len(groups), batch_size):
+        batch = groups[start:start + batch_size]
+        body: List[Dict[str, Any]] = []
+        for group in batch:
+            body.append({"index": index_name()})
+            body.append({
+                "size": 0,
+                "track_total_hits": False,
+                "query": saved_search_query(group[0]["query"]),
+                "aggs": {"new_since": {"range": {
+                    "field": "created_at",
+                    # "from" is inclusive; new means strictly after the last visit
+                    "ranges": [
+                        {"key": str(saved["id"]), "from": (saved["last_viewed_at"] + timedelta(milliseconds=1)).isoformat()}
+                        for saved in group
+                    ],
+                }}},
+            })
+        try:
+            responses = client.msearch(body=body).get("responses", [])
+        except Exception:
+            logger.exception("Saved search _msearch batch failed")
+            metrics["query_errors"] += len(batch)
+            continue
+        finally:
+            metrics["msearch_requests"] += 1
+        for response in responses:
+            if "error" in response:
+                metrics["query_errors"] += 1
+                continue
+            for bucket in response.get("aggregations", {}).get("new_since", {}).get("buckets", []):
+                counts[int(bucket["key"])] = bucket["doc_count"]
+    return counts
+
+
+def _send_notifications(due: List[Dict[str, Any]], counts: Dict[int, int], metrics: Dict[str, int]) -> List[int]:
+    from .tasks import send_telegram_notification
+
+    if not due:
+        return []
+    frontend_url = getattr(settings, "WEB_BASE_URL", "https://sail.uz").rstrip("/")
+
+    def send(saved: Dict[str, Any]) -> bool:
+        message = digest_message(saved["title"], counts[saved["id"]], frontend_url)
+        return send_telegram_notification(saved["user__profile__telegram_id"], message)
+
+    workers = max(1, int(getattr(settings, "SAVED_SEARCH_SENDER_WORKERS", 8)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(send, due))
+    sent_ids = [saved["id"] for saved, ok in zip(due, results) if ok]
+    metrics["notifications_sent"] += len(sent_ids)
+    metrics["notification_failures"] += len(due) - len(sent_ids)
+    return sent_ids
+
+
+def digest_message(title: str, new_count: int, frontend_url: str) -> str:
+    # Pluralize based on count
+    if new_count == 1:
+        items_text = "новое объявление"
+    elif 2 <= new_count <= 4:
+        items_text = "новых объявления"
+    else:
+        items_text = "новых объявлений"
+    return (
+        f"🔔 <b>Новые объявления по вашему запросу</b>\n\n"
+        f"📋 <b>{title}</b>\n"
+        f"📊 Найдено: {new_count} {items_text}\n\n"
+        f"👉 <a href='{frontend_url}/favorites'>Посмотреть результаты</a>"
+    )
+
+
+def start_run(shards: int) -> str:
+    run_id = uuid.uuid4().hex[:12]
+    DailyDigestRun.objects.create(run_id=run_id, started_at=timezone.now(), shards=shards)
+    return run_id
+
+
+def record_metrics(run_id: Optional[str], metrics: Dict[str, int]) -> None:
+    if not run_id:
+        return
+    # One additive UPDATE: shards finishing together never overwrite each other
+    DailyDigestRun.objects.filter(run_id=run_id).update(
+        **{field: F(field) + metrics[field] for field in METRIC_FIELDS if metrics[field]}
+    )
+
+
+def last_run_metrics() -> Optional[Dict[str, Any]]:
+    """Totals of the latest run so far, including throughput in searches per second."""
+    run = (
+        DailyDigestRun.objects.order_by("-started_at", "-id")
+        .values("run_id", "started_at", "shards", *METRIC_FIELDS)
+        .first()
+    )
+    if not run:
+        return None
+    run["started_at"] = run["started_at"].isoformat()
+    # Shards run in parallel, so this is per worker-second
+    run["searches_per_second"] = (
+        round(run["searches"] / (run["elapsed_ms"] / 1000), 2) if run["elapsed_ms"] else None
+    )
+    return run
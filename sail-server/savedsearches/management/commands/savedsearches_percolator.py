@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from savedsearches.percolator import rebuild_percolator_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the percolator index of instant saved searches"
+
+    def handle(self, *args, **options):
+        registered = rebuild_percolator_index()
+        self.stdout.write(self.style.SUCCESS(f"Registered {registered} instant saved searches"))
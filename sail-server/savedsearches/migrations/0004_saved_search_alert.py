@@ -0,0 +1,32 @@
+# Generated by Django 4.2.28 on 2026-10-16 23:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_listing_daily_stats'),
+        ('savedsearches', '0003_savedsearch_last_viewed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearchAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_search_alerts', to='listings.listing')),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='savedsearches.savedsearch')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sent_at', 'created_at'], name='savedsearch_sent_at_30d267_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='savedsearchalert',
+            constraint=models.UniqueConstraint(fields=('saved_search', 'listing'), name='uniq_saved_search_alert'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-16 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('savedsearches', '0004_saved_search_alert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedsearchalert',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
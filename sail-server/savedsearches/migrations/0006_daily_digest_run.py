@@ -0,0 +1,30 @@
+# Generated by Django 4.2.28 on 2026-10-16 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('savedsearches', '0005_saved_search_alert_attempts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDigestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.CharField(max_length=32, unique=True)),
+                ('started_at', models.DateTimeField()),
+                ('shards', models.IntegerField(default=0)),
+                ('shards_done', models.IntegerField(default=0)),
+                ('searches', models.IntegerField(default=0)),
+                ('unique_queries', models.IntegerField(default=0)),
+                ('msearch_requests', models.IntegerField(default=0)),
+                ('query_errors', models.IntegerField(default=0)),
+                ('notifications_sent', models.IntegerField(default=0)),
+                ('notification_failures', models.IntegerField(default=0)),
+                ('elapsed_ms', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-16 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('savedsearches', '0006_daily_digest_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedsearchalert',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -26,3 +26,46 @@ class SavedSearch(models.Model):
     def __str__(self) -> str:  # pragma: no cover
         return f"{self.user_id}:{self.title}"
 
+
+
+class SavedSearchAlert(models.Model):
+    """A new listing matched by an instant saved search; at most one per pair."""
+
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name="alerts")
+    listing = models.ForeignKey("listings.Listing", on_delete=models.CASCADE, related_name="saved_search_alerts")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Failed deliveries; retried by later runs up to MAX_SEND_ATTEMPTS
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Set while a send run owns the alert; stale claims (crashed workers) expire
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["saved_search", "listing"], name="uniq_saved_search_alert"),
+        ]
+        indexes = [
+            models.Index(fields=["sent_at", "created_at"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.saved_search_id} → {self.listing_id}"
+
+
+class DailyDigestRun(models.Model):
+    """Totals of one daily digest run; every shard adds its own (see ``savedsearches.daily``)."""
+
+    run_id = models.CharField(max_length=32, unique=True)
+    started_at = models.DateTimeField()
+    shards = models.IntegerField(default=0)
+    shards_done = models.IntegerField(default=0)
+    searches = models.IntegerField(default=0)
+    unique_queries = models.IntegerField(default=0)
+    msearch_requests = models.IntegerField(default=0)
+    query_errors = models.IntegerField(default=0)
+    notifications_sent = models.IntegerField(default=0)
+    notification_failures = models.IntegerField(default=0)
+    elapsed_ms = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"daily digest {self.run_id}"
@@ -0,0 +1,203 @@
+"""
+Instant saved-search alerts via an OpenSearch percolator index.
+
+Every active instant saved search is stored as a query document, compiled
+with the same ``build_query`` as the listing search. When a listing
+becomes active, its document is percolated against that index once:
+the matches are exactly the saved searches to alert, so the cost grows
+with new listings, not with the number of saved searches. Price bounds
+are stored converted to the base currency, so a rate change re-registers
+the affected searches (``resync_priced_searches``).
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from searchapp.views.index import mapping_body
+from searchapp.views.query_builder import build_query, clear_compiled_queries, saved_query_spec
+from searchapp.views.opensearch_client import get_client
+
+from .models import SavedSearch, SavedSearchAlert
+
+try:
+    from opensearchpy import helpers
+except Exception:  # pragma: no cover - library may be missing in some envs
+    helpers = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Listing documents sent in one percolate request
+PERCOLATE_BATCH = 100
+INDEX_EXISTS_TTL = 60.0
+
+_index_ensured_until = 0.0
+
+
+def percolator_index_name() -> str:
+    prefix = getattr(settings, "OPENSEARCH_INDEX_PREFIX", "olxclone")
+    return f"{prefix}_saved_searches"
+
+
+def percolator_mapping_body() -> Dict[str, Any]:
+    """The listings mapping (so queries parse the same way) plus the stored query."""
+    body = mapping_body()
+    body["mappings"]["properties"].update({
+        "query": {"type": "percolator"},
+        "saved_search_id": {"type": "long"},
+        "owner_id": {"type": "long"},
+    })
+    return body
+
+
+def ensure_percolator_index() -> None:
+    global _index_ensured_until
+    client = get_client()
+    if not client or time.monotonic() < _index_ensured_until:
+        return
+    name = percolator_index_name()
+    if not client.indices.exists(index=name):  # type: ignore[attr-defined]
+        client.indices.create(index=name, body=percolator_mapping_body())  # type: ignore[attr-defined]
+    _index_ensured_until = time.monotonic() + INDEX_EXISTS_TTL
+
+
+def compile_saved_query(query: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Percolator query for a saved search's stored params."""
+    filters, q = saved_query_spec(query)
+    return build_query(filters, q, active_only=False)
+
+
+def is_percolated(saved: SavedSearch) -> bool:
+    return saved.is_active and saved.frequency == SavedSearch.Frequency.INSTANT
+
+
+def sync_saved_search(saved_search_id: int) -> bool:
+    """Register (or remove) one saved search in the percolator index; True if registered."""
+    client = get_client()
+    if not client:
+        return False
+    ensure_percolator_index()
+    saved = SavedSearch.objects.filter(id=saved_search_id).first()
+    if saved is None or not is_percolated(saved):
+        client.delete(index=percolator_index_name(), id=str(saved_search_id), ignore=[404])
+        return False
+    client.index(index=percolator_index_name(), id=str(saved.id), body=_percolator_source(saved))
+    return True
+
+
+def _percolator_source(saved: SavedSearch) -> Dict[str, Any]:
+    return {
+        "query": compile_saved_query(saved.query),
+        "saved_search_id": saved.id,
+        "owner_id": saved.user_id,
+    }
+
+
+def resync_priced_searches(currencies: Optional[Iterable[str]] = None) -> int:
+    """
+    Re-register the instant saved searches whose price bounds depend on exchange rates.
+
+    Bounds are converted to the base currency when a query is compiled, so
+    after a rate change every search priced in another currency is compiled
+    again and overwritten in place (the index is not dropped, so alerts keep
+    flowing). ``currencies`` None means the base currency itself may have
+    changed and every search with price bounds is re-registered. Returns the
+    number re-registered.
+    """
+    from currency.rates import get_rates
+
+    client = get_client()
+    if not client or helpers is None:
+        return 0
+    ensure_percolator_index()
+    # This worker may not have noticed the new rates yet
+    base = get_rates(refresh=True).base
+    clear_compiled_queries()
+
+    def affected(saved: SavedSearch) -> bool:
+        filters, _ = saved_query_spec(saved.query)
+        if not (filters.get("min_price") or filters.get("max_price")):
+            return False
+        return currencies is None or str(filters.get("currency") or "UZS").upper() != base
+
+    saved_searches = SavedSearch.objects.filter(is_active=True, frequency=SavedSearch.Frequency.INSTANT)
+    actions = (
+        {"_index": percolator_index_name(), "_id": str(saved.id), "_source": _percolator_source(saved)}
+        for saved in saved_searches.iterator()
+        if affected(saved)
+    )
+    registered, _ = helpers.bulk(client, actions, chunk_size=500)
+    return registered
+
+
+def rebuild_percolator_index() -> int:
+    """Drop and re-register every instant saved search; returns the number registered."""
+    client = get_client()
+    if not client or helpers is None:
+        return 0
+    global _index_ensured_until
+    client.indices.delete(index=percolator_index_name(), ignore=[404])  # type: ignore[attr-defined]
+    _index_ensured_until = 0.0
+    ensure_percolator_index()
+    saved_searches = SavedSearch.objects.filter(is_active=True, frequency=SavedSearch.Frequency.INSTANT)
+    actions = (
+        {"_index": percolator_index_name(), "_id": str(saved.id), "_source": _percolator_source(saved)}
+        for saved in saved_searches.iterator()
+    )
+    registered, _ = helpers.bulk(client, actions, chunk_size=500)
+    return registered
+
+
+def percolate_listings(docs: List[Dict[str, Any]]) -> int:
+    """
+    Match freshly activated listing documents against all instant saved searches.
+
+    Creates one ``SavedSearchAlert`` per (saved search, listing) match,
+    skipping the seller's own searches, and schedules delivery. Returns the
+    number of matches (pairs alerted before are not alerted again).
+    """
+    client = get_client()
+    if not client or helpers is None or not docs:
+        return 0
+    ensure_percolator_index()
+    matches: Dict[int, set] = defaultdict(set)
+    for start in range(0, len(docs), PERCOLATE_BATCH):
+        batch = docs[start:start + PERCOLATE_BATCH]
+        body = {
+            "query": {"percolate": {"field": "query", "documents": batch}},
+            "_source": ["saved_search_id"],
+        }
+        for hit in helpers.scan(client, index=percolator_index_name(), query=body, size=500):
+            # With several documents, the slots say which of them this query matched
+            slots = hit.get("fields", {}).get("_percolator_document_slot", [0])
+            matches[int(hit["_id"])].update(int(batch[slot]["id"]) for slot in slots)
+    return create_alerts(matches, {int(d["id"]): d.get("user_id") for d in docs})
+
+
+def create_alerts(matches: Dict[int, Iterable[int]], sellers: Dict[int, Any]) -> int:
+    if not matches:
+        return 0
+    owners = dict(
+        SavedSearch.objects.filter(
+            id__in=list(matches), is_active=True, frequency=SavedSearch.Frequency.INSTANT
+        ).values_list("id", "user_id")
+    )
+    alerts = [
+        SavedSearchAlert(saved_search_id=saved_id, listing_id=listing_id)
+        for saved_id, listing_ids in matches.items()
+        if saved_id in owners
+        for listing_id in listing_ids
+        if str(sellers.get(listing_id)) != str(owners[saved_id])
+    ]
+    # Re-percolating a listing never alerts the same search twice
+    SavedSearchAlert.objects.bulk_create(alerts, batch_size=500, ignore_conflicts=True)
+    if alerts:
+        from .tasks import task_send_instant_alerts
+
+        transaction.on_commit(task_send_instant_alerts.delay)
+    return len(alerts)
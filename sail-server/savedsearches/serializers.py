@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from rest_framework import serializers
 
+from searchapp.views.query_builder import saved_query, saved_query_spec
+
 from .models import SavedSearch
 from .utils import count_new_items_for_saved_search
 
@@ -14,6 +16,13 @@ class SavedSearchSerializer(serializers.ModelSerializer):
         fields = ["id", "title", "query", "frequency", "is_active", "last_sent_at", "last_viewed_at", "created_at", "new_items_count"]
         read_only_fields = ["new_items_count"]
 
+    def validate_query(self, value):
+        """Store the canonical filter spec, so every consumer compiles the same query."""
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Expected an object of search params.")
+        filters, q = saved_query_spec(value)
+        return saved_query(filters, q, sort=value.get("params", value).get("sort"))
+
     def get_new_items_count(self, obj: SavedSearch) -> int:
         """Get count of new items since last viewed."""
         return count_new_items_for_saved_search(obj)
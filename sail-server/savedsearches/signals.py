@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from searchapp.views.opensearch_client import get_client
+
+from .models import SavedSearch
+
+# Bookkeeping fields that never change the registered query
+UNINDEXED_FIELDS = {"last_sent_at", "last_viewed_at"}
+
+
+@receiver(post_save, sender=SavedSearch)
+@receiver(post_delete, sender=SavedSearch)
+def on_saved_search_changed(sender, instance, update_fields=None, **kwargs):
+    # Keeps the percolator index in line with instant, active saved searches
+    if get_client() is None:
+        return
+    if update_fields is not None and set(update_fields) <= UNINDEXED_FIELDS:
+        return
+    from .tasks import task_sync_saved_search_percolator
+
+    saved_search_id = instance.id
+    transaction.on_commit(lambda: task_sync_saved_search_percolator.delay(saved_search_id))
@@ -1,17 +1,29 @@
 from __future__ import annotations
 
 import logging
-from datetime import datetime, timezone as dt_timezone
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 import requests
 from celery import shared_task
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
 
-from .models import SavedSearch
-from .utils import count_new_items_for_saved_search
+from .daily import plan_shards, run_shard, start_run
+from .models import SavedSearch, SavedSearchAlert
 
 logger = logging.getLogger(__name__)
 
+# Deliveries of an instant alert tried before it is given up
+MAX_SEND_ATTEMPTS = 5
+# Seconds one instant-alert run keeps claiming and sending
+SEND_BUDGET = 240
+INSTANT_ALERTS_TIME_LIMIT = 300
+# A claim older than this belongs to a run that died; longer than the hard limit
+CLAIM_TIMEOUT = 600
+
 
 def send_telegram_notification(telegram_id: int, message: str) -> bool:
     """Send a notification message to a user via Telegram."""
@@ -40,69 +52,132 @@ def send_telegram_notification(telegram_id: int, message: str) -> bool:
         return False
 
 
-@shared_task(name="savedsearches.run_daily_notifications")
+# Groups every eligible saved search by query, past the global 30s/60s limits
+@shared_task(name="savedsearches.run_daily_notifications", soft_time_limit=600, time_limit=600 + 300)
 def task_run_daily_saved_search_notifications():
     """
     Send daily Telegram notifications to users about new items in their saved searches.
     This task should be scheduled to run once daily (e.g., via Celery Beat).
+
+    Fans out one ``savedsearches.run_daily_shard`` subtask per batch of
+    query groups; see ``savedsearches.daily``.
     """
-    from accounts.models import Profile
+    shards = plan_shards()
+    run_id = start_run(len(shards))
+    for saved_search_ids in shards:
+        task_run_daily_saved_search_shard.delay(saved_search_ids, run_id)
+    return {"status": "ok", "run_id": run_id, "shards": len(shards)}
+
+
+# Queries and Telegram sends for thousands of searches, far past the global 30s/60s limits
+@shared_task(name="savedsearches.run_daily_shard", soft_time_limit=1800, time_limit=1800 + 300)
+def task_run_daily_saved_search_shard(saved_search_ids: list[int], run_id: str | None = None):
+    return {"status": "ok", **run_shard(saved_search_ids, run_id)}
+
+
+@shared_task(name="savedsearches.sync_percolator")
+def task_sync_saved_search_percolator(saved_search_id: int):
+    """Register or remove one saved search in the instant-alert percolator index."""
+    from .percolator import sync_saved_search
+
+    return {"registered": sync_saved_search(saved_search_id)}
 
-    processed = 0
-    notifications_sent = 0
 
-    # Get all daily saved searches for users with Telegram connected
-    saved_searches = SavedSearch.objects.filter(
-        is_active=True,
-        frequency=SavedSearch.Frequency.DAILY,
-        user__profile__telegram_id__isnull=False,
-    ).select_related("user__profile")
+@shared_task(name="savedsearches.resync_priced_percolator")
+def task_resync_priced_percolator(currencies: list[str] | None = None):
+    """Recompile instant saved searches with converted price bounds after a rate change."""
+    from .percolator import resync_priced_searches
 
-    for saved_search in saved_searches.iterator():
+    return {"registered": resync_priced_searches(currencies)}
+
+
+# Telegram sends (10s timeout each), past the global 30s/60s limits
+@shared_task(
+    name="savedsearches.send_instant_alerts",
+    soft_time_limit=INSTANT_ALERTS_TIME_LIMIT,
+    time_limit=INSTANT_ALERTS_TIME_LIMIT + 60,
+)
+def task_send_instant_alerts(batch_size: int = 100):
+    """
+    Deliver pending instant alerts: one Telegram message per saved search.
+
+    A batch is claimed in a short transaction (``claimed_at``) so overlapping
+    runs never send the same alert twice, and the sends happen outside of it:
+    each saved search's alerts are marked sent, or get one more attempt,
+    right after its message. Claims of a worker that died expire after
+    ``CLAIM_TIMEOUT``. A run stops claiming after ``SEND_BUDGET`` seconds
+    and leaves the rest to the next one (the beat schedule runs this every
+    few minutes). Failed sends are retried until ``MAX_SEND_ATTEMPTS``.
+    """
+    frontend_url = getattr(settings, "WEB_BASE_URL", "https://sail.uz").rstrip("/")
+    deadline = time.monotonic() + SEND_BUDGET
+    sent = failed = 0
+    # Walk by id so alerts that failed in this run are not picked up again
+    cursor = 0
+    while time.monotonic() < deadline:
+        alerts = _claim_alerts(cursor, batch_size)
+        if not alerts:
+            break
+        cursor = alerts[-1].id
+        by_search: dict[int, list[SavedSearchAlert]] = {}
+        for alert in alerts:
+            by_search.setdefault(alert.saved_search_id, []).append(alert)
+        groups = list(by_search.values())
         try:
-            # Count new items since last notification
-            new_count = count_new_items_for_saved_search(saved_search)
-
-            if new_count > 0:
-                profile = saved_search.user.profile
-                telegram_id = profile.telegram_id
-
-                if telegram_id:
-                    # Build notification message
-                    frontend_url = getattr(settings, "WEB_BASE_URL", "https://sail.uz").rstrip("/")
-                    search_url = f"{frontend_url}/favorites"
-
-                    # Pluralize based on count
-                    if new_count == 1:
-                        items_text = "новое объявление"
-                    elif 2 <= new_count <= 4:
-                        items_text = "новых объявления"
-                    else:
-                        items_text = "новых объявлений"
-
-                    message = (
-                        f"🔔 <b>Новые объявления по вашему запросу</b>\n\n"
-                        f"📋 <b>{saved_search.title}</b>\n"
-                        f"📊 Найдено: {new_count} {items_text}\n\n"
-                        f"👉 <a href='{search_url}'>Посмотреть результаты</a>"
-                    )
-
-                    if send_telegram_notification(telegram_id, message):
-                        notifications_sent += 1
-                        saved_search.last_sent_at = datetime.now(dt_timezone.utc)
-                        saved_search.save(update_fields=["last_sent_at"])
-
-            processed += 1
-
-        except Exception as e:
-            logger.error(f"Error processing saved search {saved_search.id}: {e}")
-            continue
-
-    return {
-        "status": "ok",
-        "processed": processed,
-        "notifications_sent": notifications_sent,
-    }
+            while groups and time.monotonic() < deadline:
+                group = groups[0]
+                ids = [a.id for a in group]
+                saved_search = group[0].saved_search
+                profile = getattr(saved_search.user, "profile", None)
+                telegram_id = getattr(profile, "telegram_id", None)
+                # Alerts of users without Telegram are marked handled too
+                if not telegram_id:
+                    SavedSearchAlert.objects.filter(id__in=ids).update(sent_at=timezone.now(), claimed_at=None)
+                elif send_telegram_notification(telegram_id, _instant_alert_message(saved_search, group, frontend_url)):
+                    now = timezone.now()
+                    SavedSearchAlert.objects.filter(id__in=ids).update(sent_at=now, claimed_at=None)
+                    SavedSearch.objects.filter(id=saved_search.id).update(last_sent_at=now)
+                    sent += 1
+                else:
+                    SavedSearchAlert.objects.filter(id__in=ids).update(attempts=F("attempts") + 1, claimed_at=None)
+                    failed += len(ids)
+                groups.pop(0)
+        finally:
+            # Out of time (or interrupted): hand the rest back to the next run
+            unsent = [a.id for group in groups for a in group]
+            if unsent:
+                SavedSearchAlert.objects.filter(id__in=unsent).update(claimed_at=None)
+    if failed:
+        logger.warning("Could not deliver %s instant alerts; will retry", failed)
+    return {"status": "ok", "sent": sent, "failed": failed}
+
+
+def _claim_alerts(cursor: int, batch_size: int) -> list[SavedSearchAlert]:
+    """Claim the next unsent alerts after ``cursor``; row locks are held only for the claim."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            SavedSearchAlert.objects.select_for_update(skip_locked=True)
+            .filter(sent_at__isnull=True, attempts__lt=MAX_SEND_ATTEMPTS, id__gt=cursor)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=CLAIM_TIMEOUT)))
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        SavedSearchAlert.objects.filter(id__in=ids).update(claimed_at=now)
+    return list(
+        SavedSearchAlert.objects.filter(id__in=ids)
+        .select_related("saved_search__user__profile", "listing")
+        .order_by("id")
+    )
+
+
+def _instant_alert_message(saved_search, alerts, frontend_url: str) -> str:
+    lines = [f"🔔 <b>Новое по запросу «{saved_search.title}»</b>\n"]
+    for alert in alerts[:5]:
+        lines.append(f"• <a href='{frontend_url}/l/{alert.listing_id}'>{alert.listing.title}</a>")
+    if len(alerts) > 5:
+        lines.append(f"… и ещё {len(alerts) - 5}")
+    return "\n".join(lines)
 
 
 @shared_task(name="savedsearches.run")
@@ -110,15 +185,14 @@ def task_run_saved_searches():
     """Legacy task - runs all saved searches (without notifications)."""
     from searchapp.views.opensearch_client import get_client
     from searchapp.views.index import index_name
+    from .utils import saved_search_query
 
     client = get_client()
     if not client:
         return {"status": "skipped", "reason": "no-opensearch"}
     processed = 0
     for s in SavedSearch.objects.filter(is_active=True).iterator():
-        q = s.query or {}
-        body = q.get("body") or {"query": {"bool": {}}}
-        client.search(index=index_name(), body=body)
+        client.search(index=index_name(), body={"query": saved_search_query(s.query)})
         s.last_sent_at = datetime.now(dt_timezone.utc)
         s.save(update_fields=["last_sent_at"])
         processed += 1
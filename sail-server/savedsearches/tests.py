@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import Profile
+from currency.models import Currency, ExchangeRate
+from listings.models import Listing
+from savedsearches import daily, percolator, tasks
+from savedsearches.models import DailyDigestRun, SavedSearch, SavedSearchAlert
+from taxonomy.models import Category, Location
+
+
+class SavedSearchTestCase(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        User = get_user_model()
+        self.owner = User.objects.create_user(username="owner", password="pass123")
+        self.seller = User.objects.create_user(username="seller", password="pass123")
+        Profile.objects.create(user=self.owner, telegram_id=1001)
+        uzs = Currency.objects.create(code="UZS", name="Sum", symbol="so'm", is_default=True)
+        usd = Currency.objects.create(code="USD", name="Dollar", symbol="$")
+        ExchangeRate.objects.create(from_currency=usd, to_currency=uzs, rate=Decimal("12500"))
+        self.category = Category.objects.create(name="Phones", slug="phones", is_leaf=True)
+        self.location = Location.objects.create(name="Tashkent", slug="tashkent", kind=Location.Kind.CITY)
+
+    def saved_search(self, query=None, frequency=SavedSearch.Frequency.INSTANT, user=None):
+        return SavedSearch.objects.create(
+            user=user or self.owner, title="Phones", query=query or {"params": {"q": "iphone"}}, frequency=frequency
+        )
+
+    def listing(self, title="iPhone"):
+        return Listing.objects.create(user=self.seller, category=self.category, location=self.location, title=title)
+
+
+class PercolatorRegistrationTests(SavedSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_mock = mock.Mock()
+        self.client_mock.indices.exists.return_value = True
+        patcher = mock.patch.object(percolator, "get_client", return_value=self.client_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, percolator, "_index_ensured_until", 0.0)
+
+    def test_instant_searches_are_registered_and_others_removed(self):
+        instant = self.saved_search()
+        daily = self.saved_search(frequency=SavedSearch.Frequency.DAILY)
+
+        self.assertTrue(percolator.sync_saved_search(instant.id))
+        kwargs = self.client_mock.index.call_args.kwargs
+        self.assertEqual(kwargs["id"], str(instant.id))
+        self.assertEqual(kwargs["body"]["query"], percolator.compile_saved_query(instant.query))
+        self.assertEqual(kwargs["body"]["owner_id"], self.owner.id)
+
+        self.assertFalse(percolator.sync_saved_search(daily.id))
+        self.client_mock.delete.assert_called_once_with(
+            index=percolator.percolator_index_name(), id=str(daily.id), ignore=[404]
+        )
+
+    def test_rate_changes_reregister_searches_priced_in_other_currencies(self):
+        usd = self.saved_search({"params": {"q": "iphone", "min_price": "100", "currency": "USD"}})
+        uzs = self.saved_search({"params": {"q": "iphone", "min_price": "100000", "currency": "UZS"}})
+        self.saved_search()
+
+        def bulk(client, actions, **kwargs):
+            actions = list(actions)
+            bulk.ids = [action["_id"] for action in actions]
+            return len(actions), []
+
+        with mock.patch.object(percolator, "helpers") as helpers:
+            helpers.bulk.side_effect = bulk
+            self.assertEqual(percolator.resync_priced_searches(["USD"]), 1)
+            self.assertEqual(bulk.ids, [str(usd.id)])
+            # Base currency changed: every search with price bounds
+            self.assertEqual(percolator.resync_priced_searches(None), 2)
+            self.assertEqual(sorted(bulk.ids), sorted([str(usd.id), str(uzs.id)]))
+
+    def test_alerts_skip_the_sellers_own_searches(self):
+        listing = self.listing()
+        own = self.saved_search(user=self.seller)
+        other = self.saved_search()
+        with mock.patch.object(tasks.task_send_instant_alerts, "delay"):
+            with self.captureOnCommitCallbacks(execute=True):
+                created = percolator.create_alerts(
+                    {own.id: [listing.id], other.id: [listing.id]}, {listing.id: self.seller.id}
+                )
+        self.assertEqual(created, 1)
+        self.assertEqual(list(SavedSearchAlert.objects.values_list("saved_search_id", flat=True)), [other.id])
+
+
+class InstantAlertTaskTests(SavedSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.search = self.saved_search()
+        self.alerts = [
+            SavedSearchAlert.objects.create(saved_search=self.search, listing=self.listing(f"iPhone {i}"))
+            for i in range(2)
+        ]
+
+    def test_failed_sends_are_retried_until_the_attempt_limit(self):
+        with mock.patch.object(tasks, "send_telegram_notification", return_value=False) as send:
+            for _ in range(tasks.MAX_SEND_ATTEMPTS + 1):
+                self.assertEqual(tasks.task_send_instant_alerts()["sent"], 0)
+        # One message per saved search, and none once the attempts are used up
+        self.assertEqual(send.call_count, tasks.MAX_SEND_ATTEMPTS)
+        for alert in SavedSearchAlert.objects.all():
+            self.assertIsNone(alert.sent_at)
+            self.assertIsNone(alert.claimed_at)
+            self.assertEqual(alert.attempts, tasks.MAX_SEND_ATTEMPTS)
+
+    def test_delivery_is_recorded_per_saved_search(self):
+        SavedSearchAlert.objects.update(attempts=2)
+        with mock.patch.object(tasks, "send_telegram_notification", return_value=True) as send:
+            self.assertEqual(tasks.task_send_instant_alerts()["sent"], 1)
+            self.assertEqual(tasks.task_send_instant_alerts()["sent"], 0)
+        send.assert_called_once()
+        self.assertEqual(send.call_args.args[0], 1001)
+        self.assertFalse(SavedSearchAlert.objects.filter(sent_at__isnull=True).exists())
+        self.search.refresh_from_db()
+        self.assertIsNotNone(self.search.last_sent_at)
+
+    def test_claimed_alerts_are_skipped_until_the_claim_expires(self):
+        SavedSearchAlert.objects.update(claimed_at=timezone.now())
+        with mock.patch.object(tasks, "send_telegram_notification", return_value=True) as send:
+            tasks.task_send_instant_alerts()
+            send.assert_not_called()
+            SavedSearchAlert.objects.update(claimed_at=timezone.now() - timedelta(seconds=tasks.CLAIM_TIMEOUT + 1))
+            self.assertEqual(tasks.task_send_instant_alerts()["sent"], 1)
+
+    def test_unsent_groups_are_released_when_the_budget_runs_out(self):
+        other = self.saved_search()
+        SavedSearchAlert.objects.create(saved_search=other, listing=self.listing("Pixel"))
+        sends = []
+
+        def send(telegram_id, message):
+            sends.append(telegram_id)
+            # The first message eats the whole budget
+            clock.return_value += tasks.SEND_BUDGET
+            return True
+
+        with mock.patch.object(tasks.time, "monotonic", return_value=0.0) as clock:
+            with mock.patch.object(tasks, "send_telegram_notification", side_effect=send):
+                self.assertEqual(tasks.task_send_instant_alerts()["sent"], 1)
+        self.assertEqual(len(sends), 1)
+        pending = SavedSearchAlert.objects.filter(sent_at__isnull=True)
+        self.assertEqual(list(pending.values_list("saved_search_id", flat=True)), [other.id])
+        self.assertIsNone(pending.get().claimed_at)
+
+
+class DailyDigestTests(SavedSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = get_user_model().objects.create_user(username="other", password="pass123")
+        Profile.objects.create(user=self.other, telegram_id=1002)
+        self.viewed = timezone.now() - timedelta(days=1)
+        phones = {"params": {"q": " iPhone  13", "category_slug": "phones", "attrs.color": ["red", "blue"]}}
+        # The same search, spelled differently, saved by another user
+        same = {"category_slug": "phones", "q": "iphone 13", "attrs.color": ["blue", "red", "red"]}
+        self.phones = self.daily_search(phones)
+        self.same = self.daily_search(same, user=self.other)
+        self.cars = self.daily_search({"params": {"q": "cobalt"}})
+        self.bikes = self.daily_search({"params": {"q": "bmx"}}, user=self.other)
+        # Never viewed, or no Telegram: not part of the digest
+        self.saved_search({"params": {"q": "never viewed"}}, frequency=SavedSearch.Frequency.DAILY)
+        self.daily_search({"params": {"q": "no telegram"}}, user=self.seller)
+
+    def daily_search(self, query, user=None):
+        saved = self.saved_search(query, frequency=SavedSearch.Frequency.DAILY, user=user)
+        SavedSearch.objects.filter(id=saved.id).update(last_viewed_at=self.viewed)
+        saved.last_viewed_at = self.viewed
+        return saved
+
+    def test_queries_are_grouped_across_users_and_never_split(self):
+        self.assertEqual(daily.normalized_query_key(self.phones.query), daily.normalized_query_key(self.same.query))
+        self.assertNotEqual(daily.normalized_query_key(self.phones.query), daily.normalized_query_key(self.cars.query))
+
+        pair = [self.phones.id, self.same.id]
+        self.assertEqual(daily.plan_shards(2), [pair, [self.cars.id, self.bikes.id]])
+        # A group larger than the shard size still stays in one shard
+        self.assertEqual(daily.plan_shards(1), [pair, [self.cars.id], [self.bikes.id]])
+
+    def test_shard_counts_new_items_per_search_and_adds_up_metrics(self):
+        client = mock.Mock()
+
+        def msearch(body):
+            msearch.bodies.append(body)
+            ranges = body[1]["aggs"]["new_since"]["range"]["ranges"]
+            return {"responses": [
+                {"aggregations": {"new_since": {"buckets": [
+                    {"key": r["key"], "doc_count": 3 if r["key"] == str(self.phones.id) else 0} for r in ranges
+                ]}}},
+                {"error": {"type": "search_phase_execution_exception"}},
+            ]}
+
+        msearch.bodies = []
+        client.msearch.side_effect = msearch
+        run_id = daily.start_run(shards=2)
+        with mock.patch.object(daily, "get_client", return_value=client):
+            with mock.patch.object(tasks, "send_telegram_notification", return_value=True) as send:
+                metrics = daily.run_shard([self.phones.id, self.same.id, self.cars.id], run_id)
+
+        # One query per group, one range bucket per subscriber
+        body = msearch.bodies[0]
+        self.assertEqual(len(body), 4)
+        ranges = body[1]["aggs"]["new_since"]["range"]["ranges"]
+        self.assertEqual([r["key"] for r in ranges], [str(self.phones.id), str(self.same.id)])
+        # "from" is inclusive, so the boundary is one millisecond past the last visit
+        self.assertEqual(ranges[0]["from"], (self.viewed + timedelta(milliseconds=1)).isoformat())
+
+        send.assert_called_once()
+        self.assertEqual(send.call_args.args[0], 1001)
+        self.assertIn("3 новых объявления", send.call_args.args[1])
+        self.assertEqual(
+            {k: metrics[k] for k in ("searches", "unique_queries", "msearch_requests", "query_errors", "notifications_sent")},
+            {"searches": 3, "unique_queries": 2, "msearch_requests": 1, "query_errors": 1, "notifications_sent": 1},
+        )
+        sent = set(SavedSearch.objects.filter(last_sent_at__isnull=False).values_list("id", flat=True))
+        self.assertEqual(sent, {self.phones.id})
+
+        with mock.patch.object(daily, "get_client", return_value=client):
+            with mock.patch.object(tasks, "send_telegram_notification", return_value=False):
+                daily.run_shard([self.bikes.id], run_id)
+        run = DailyDigestRun.objects.get(run_id=run_id)
+        self.assertEqual(
+            (run.shards_done, run.searches, run.unique_queries, run.msearch_requests, run.query_errors),
+            (2, 4, 3, 2, 2),
+        )
+        self.assertEqual((run.notifications_sent, run.notification_failures), (1, 0))
+        self.assertEqual(daily.last_run_metrics()["run_id"], run_id)
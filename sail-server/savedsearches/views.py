@@ -1,7 +1,5 @@
 from __future__ import annotations
 
-from typing import Any, Dict
-
 from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -10,6 +8,7 @@ from .models import SavedSearch
 from .serializers import SavedSearchSerializer
 from searchapp.views.opensearch_client import get_client
 from searchapp.views.index import index_name
+from searchapp.views.query_builder import build_query, saved_query_spec
 
 
 class SavedSearchListCreateView(generics.ListCreateAPIView):
@@ -62,15 +61,8 @@ class SavedSearchRunNowView(APIView):
         if not client:
             return Response({"results": [], "total": 0, "note": "OpenSearch not configured"})
 
-        q: Dict[str, Any] = saved.query or {}
-        body = q.get("body")
-        if not body:
-            # If user stored a param bag, translate to a simple bool
-            params = q.get("params", {})
-            must = []
-            if kw := params.get("q"):
-                must.append({"multi_match": {"query": kw, "fields": ["title^2", "description"]}})
-            body = {"query": {"bool": {"must": must}}}
+        filters, q = saved_query_spec(saved.query)
+        body = {"query": build_query(filters, q), "size": 5, "sort": [{"refreshed_at": {"order": "desc"}}]}
         resp = client.search(index=index_name(), body=body)
         hits = resp.get("hits", {}).get("hits", [])
         total = resp.get("hits", {}).get("total", {}).get("value", 0)
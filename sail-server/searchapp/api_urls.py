@@ -1,8 +1,10 @@
 from django.urls import path
 
-from .views import ListingSearchView
+from .views import ListingFacetsView, ListingSearchView, RenormalizeStatusView, SearchCacheStatsView
 
 urlpatterns = [
     path("search/listings", ListingSearchView.as_view(), name="search-listings"),
+    path("search/listings/facets", ListingFacetsView.as_view(), name="search-listings-facets"),
+    path("search/cache-stats", SearchCacheStatsView.as_view(), name="search-cache-stats"),
+    path("search/renormalize", RenormalizeStatusView.as_view(), name="search-renormalize"),
 ]
-
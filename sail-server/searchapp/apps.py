@@ -5,3 +5,6 @@ class SearchappConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "searchapp"
 
+
+    def ready(self):  # pragma: no cover
+        from . import checks  # noqa: F401
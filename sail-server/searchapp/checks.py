@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core import checks
+
+PROCESS_LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@checks.register(checks.Tags.caches)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Search cache generations, cache stats and the snapshot versions are
+    bumped by Celery workers and read by web processes, so they need a cache
+    every process shares. Only eager (in-process) task execution gets away
+    with a local one.
+    """
+    from config.celery import app
+
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend in PROCESS_LOCAL_BACKENDS and not app.conf.task_always_eager:
+        return [
+            checks.Warning(
+                "Celery tasks run in worker processes but the default cache is process-local.",
+                hint="Set REDIS_URL or CACHE_URL so web and worker processes share the cache.",
+                id="searchapp.W001",
+            )
+        ]
+    return []
@@ -9,7 +9,7 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 
 from searchapp.views.opensearch_client import get_client
-from searchapp.views.index import index_name
+from searchapp.views.index import alias_indices, index_name, write_alias
 
 
 class Command(BaseCommand):
@@ -83,6 +83,8 @@ class Command(BaseCommand):
                 ok = False
             else:
                 self.stdout.write(self.style.SUCCESS(f"Index '{idx}' exists."))
+                self.stdout.write(f"  Read alias -> {', '.join(alias_indices(idx)) or '(not an alias)'}")
+                self.stdout.write(f"  Write alias -> {', '.join(alias_indices(write_alias())) or '(missing)'}")
                 try:
                     cnt = client.count(index=idx).get("count", 0)  # type: ignore[attr-defined]
                     self.stdout.write(f"Documents in index: {cnt}")
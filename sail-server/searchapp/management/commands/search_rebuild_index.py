@@ -0,0 +1,91 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from listings.models import Listing
+from searchapp.views.bulk import bulk_reindex
+from searchapp.views.index import (
+    WRITE_TARGETS_TTL,
+    add_write_target,
+    create_rebuild_index,
+    ensure_index,
+    finish_rebuild_index,
+    index_name,
+    remove_write_target,
+    swap_aliases,
+    versioned_index_name,
+)
+from searchapp.views.opensearch_client import get_client
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the listings index without downtime: load a new versioned index while "
+        "live writes go to both indices, then atomically swap the read alias"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Listings loaded per DB chunk')
+        parser.add_argument('--batch-size', type=int, default=500, help='Documents per _bulk request')
+        parser.add_argument('--workers', type=int, default=4, help='Threads building documents')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent _bulk requests')
+        parser.add_argument(
+            '--keep-old',
+            action='store_true',
+            help='Keep the previous index after the swap instead of deleting it'
+        )
+
+    def handle(self, *args, **options):
+        client = get_client()
+        if not client:
+            raise CommandError("OpenSearch client not available")
+
+        ensure_index()
+        new_index = versioned_index_name(timezone.now().strftime("%Y%m%d%H%M%S"))
+        self.stdout.write(f"Creating {new_index}...")
+        create_rebuild_index(new_index)
+
+        try:
+            # Live updates start dual-writing once every process has refreshed its
+            # cached write targets; only then is it safe to start reading the DB.
+            add_write_target(new_index)
+            time.sleep(WRITE_TARGETS_TTL + 1)
+
+            qs = Listing.objects.filter(status=Listing.Status.ACTIVE)
+            count = qs.count()
+            self.stdout.write(f"Loading {count} active listings...")
+            stats = bulk_reindex(
+                client,
+                qs,
+                index=new_index,
+                op_type="create",
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                concurrency=options['concurrency'],
+                progress=lambda s: self.stdout.write(
+                    f"Loaded {s.indexed}/{count}, {s.docs_per_sec:.0f} docs/sec"
+                ),
+            )
+            if stats.failed:
+                raise CommandError(f"{stats.failed} documents failed to load; aborting before swap")
+
+            finish_rebuild_index(new_index)
+        except BaseException:
+            self.stderr.write(self.style.ERROR(f"Rebuild failed, dropping {new_index}"))
+            try:
+                remove_write_target(new_index)
+            finally:
+                client.indices.delete(index=new_index, ignore=[404])
+            raise
+
+        old = swap_aliases(new_index)
+        self.stdout.write(self.style.SUCCESS(f"Alias {index_name()} now points to {new_index}"))
+
+        if old and not options.get('keep_old'):
+            # Let processes that cached the old write targets drain before dropping them
+            time.sleep(WRITE_TARGETS_TTL + 1)
+            for idx in old:
+                client.indices.delete(index=idx, ignore=[404])
+                self.stdout.write(f"Deleted old index {idx}")
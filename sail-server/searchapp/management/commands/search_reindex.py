@@ -1,7 +1,8 @@
 from django.core.management.base import BaseCommand
 
 from listings.models import Listing
-from searchapp.views.index import index_listing, index_name
+from searchapp.views.bulk import bulk_reindex
+from searchapp.views.index import ensure_index, index_listing, index_name
 from searchapp.views.opensearch_client import get_client
 
 
@@ -19,6 +20,26 @@ class Command(BaseCommand):
             action='store_true',
             help='Delete documents from index that no longer exist in database'
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Use the batched _bulk pipeline instead of indexing listings one by one'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Listings loaded per DB chunk (bulk mode)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Documents per _bulk request (bulk mode)')
+        parser.add_argument('--workers', type=int, default=4, help='Threads building documents (bulk mode)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent _bulk requests (bulk mode)')
+        parser.add_argument('--max-retries', type=int, default=3, help='Retry rounds for failed documents (bulk mode)')
+        parser.add_argument(
+            '--checkpoint',
+            default=None,
+            help='File storing the last fully indexed listing id (bulk mode)'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue after the id stored in --checkpoint instead of starting over'
+        )
 
     def handle(self, *args, **options):
         client = get_client()
@@ -72,6 +93,10 @@ class Command(BaseCommand):
             except Exception as e:
                 self.stdout.write(self.style.WARNING(f"Failed to check stale documents: {e}"))
 
+        if options.get('bulk'):
+            self._bulk_reindex(client, idx, options)
+            return
+
         # Reindex all listings
         qs = Listing.objects.filter(status=Listing.Status.ACTIVE).only("id")
         count = qs.count()
@@ -93,3 +118,36 @@ class Command(BaseCommand):
             f"Reindex complete. Success: {success}, Failed: {failed}"
         ))
 
+    def _bulk_reindex(self, client, idx, options):
+        ensure_index()
+        qs = Listing.objects.filter(status=Listing.Status.ACTIVE)
+        if options.get('resume') and not options.get('checkpoint'):
+            self.stdout.write(self.style.WARNING("--resume has no effect without --checkpoint"))
+        count = qs.count()
+        self.stdout.write(f"Bulk reindexing {count} active listings...")
+
+        def progress(stats):
+            self.stdout.write(
+                f"Indexed {stats.indexed}/{count} (up to id {stats.last_id}), "
+                f"{stats.docs_per_sec:.0f} docs/sec"
+            )
+
+        stats = bulk_reindex(
+            client,
+            qs,
+            index=idx,
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            concurrency=options['concurrency'],
+            max_retries=options['max_retries'],
+            checkpoint=options.get('checkpoint'),
+            resume=options.get('resume', False),
+            progress=progress,
+        )
+        for failed_id in stats.failed_ids[:20]:
+            self.stdout.write(self.style.WARNING(f"Failed to index {failed_id}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Reindex complete. Success: {stats.indexed}, Failed: {stats.failed}, "
+            f"{stats.docs_per_sec:.0f} docs/sec"
+        ))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.28 on 2026-10-16 23:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('searchapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenormalizeRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=8)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
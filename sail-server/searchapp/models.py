@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from django.db import models
+
+
+class ListingIndexEvent(models.Model):
+    """
+    Transactional outbox row: "listing X changed, rebuild its search document".
+
+    Rows are written in the same transaction as the change and drained in
+    batches, so a burst of edits to one listing costs a single reindex.
+    """
+
+    listing_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["listing_id"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"listing {self.listing_id} dirty"
+
+
+class RenormalizeRequest(models.Model):
+    """
+    Queued price re-normalization for listings priced in ``currency``.
+
+    One row per requested currency ("*" for all). The running job claims
+    every row up to the highest id it saw and deletes them once its pass is
+    done, so concurrent requests are never lost.
+    """
+
+    currency = models.CharField(max_length=8)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"renormalize {self.currency}"
@@ -2,7 +2,12 @@ from __future__ import annotations
 
 from celery import shared_task
 
-from .views.index import delete_listing, index_listing
+from .views.index import delete_listing, ensure_index, index_listing
+from .views.opensearch_client import search_available
+from .views.outbox import drain_outbox, mark_location_listings_dirty, sync_listings
+from .views.reconcile import reconcile_index
+from .views.renormalize import TIME_LIMIT as RENORMALIZE_TIME_LIMIT
+from .views.renormalize import renormalize_pending
 
 
 @shared_task(name="search.index_listing")
@@ -14,3 +19,45 @@ def task_index_listing(listing_id: int):
 def task_delete_listing(listing_id: int):
     delete_listing(listing_id)
 
+
+@shared_task(name="search.drain_outbox")
+def task_drain_index_outbox():
+    return {"processed": drain_outbox()}
+
+
+# A region can hold a large share of all listings
+@shared_task(name="search.reindex_location", soft_time_limit=1800, time_limit=1800 + 300)
+def task_reindex_location(location_id: int, fallback_only: bool = True):
+    """Rebuild the documents of listings whose location data changed (path or centroid)."""
+    return {"queued": mark_location_listings_dirty(location_id, fallback_only=fallback_only)}
+
+
+@shared_task(name="search.sync_listings")
+def task_sync_listings(listing_ids: list[int], activated: bool = False):
+    if not search_available():
+        # The outbox event written with the change is drained once the cluster is back
+        # (without instant alerts; the daily digest still covers these listings)
+        return {"synced": 0}
+    ensure_index()
+    return {"synced": len(sync_listings(set(listing_ids), activated=listing_ids if activated else ()))}
+
+
+# Walks the whole index and listings table, far past the global 30s/60s limits
+@shared_task(name="search.reconcile_index", soft_time_limit=3600, time_limit=3600 + 300)
+def task_reconcile_index():
+    if not search_available():
+        return {"status": "skipped", "reason": "search-unavailable"}
+    return reconcile_index()
+
+
+# Polls update_by_query until it finishes, well past the global 30s soft limit
+@shared_task(
+    name="search.renormalize_prices",
+    soft_time_limit=RENORMALIZE_TIME_LIMIT - 60,
+    time_limit=RENORMALIZE_TIME_LIMIT,
+)
+def task_renormalize_prices():
+    if not search_available():
+        # Pending currencies stay queued; the next rate change or manual run picks them up
+        return {"status": "skipped", "reason": "search-unavailable"}
+    return renormalize_pending() or {"status": "merged"}
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import base64
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase
+
+from searchapp.views.query_builder import build_query, parse_filters, saved_query, saved_query_spec
+
+
+class QueryBuilderTests(SimpleTestCase):
+    def test_saved_search_compiles_like_the_search_url(self):
+        params = QueryDict("q=iphone&category_slug=phones&location_slug=tashkent&attrs.color=red,blue&attrs.ram_min=4")
+        filters = parse_filters(params)
+        stored = saved_query(filters, "iphone", sort="newest")
+
+        self.assertEqual(stored["params"]["attrs.color"], ["red", "blue"])
+        self.assertEqual(saved_query_spec(stored), (filters, "iphone"))
+        self.assertEqual(build_query(*saved_query_spec(stored)), build_query(filters, "iphone"))
+
+        body = build_query(filters, "iphone")
+        fields = {k for clause in body["bool"]["filter"] for inner in clause.values() if isinstance(inner, dict) for k in inner}
+        self.assertIn("location_path", fields)
+        self.assertNotIn("location_slug", fields)
+
+    def test_compiled_bodies_are_copies(self):
+        body = build_query({"condition": "new"}, None)
+        body["bool"]["filter"].append({"term": {"id": "1"}})
+        self.assertNotIn({"term": {"id": "1"}}, build_query({"condition": "new"}, None)["bool"]["filter"])
+
+    def test_geo_filters(self):
+        filters = parse_filters(QueryDict("lat=41.31&lon=69.28&radius_km=5&bbox=69,41,70,42"))
+        clauses = build_query(filters, None)["bool"]["filter"]
+        self.assertIn({"geo_distance": {"distance": "5.0km", "geo": {"lat": 41.31, "lon": 69.28}}}, clauses)
+        self.assertIn(
+            {"geo_bounding_box": {"geo": {"top_left": {"lat": 42.0, "lon": 69.0}, "bottom_right": {"lat": 41.0, "lon": 70.0}}}},
+            clauses,
+        )
+        # Malformed coordinates are ignored rather than sent to OpenSearch
+        invalid = parse_filters(QueryDict("lat=abc&lon=69.28&radius_km=5&bbox=1,2"))
+        self.assertEqual(build_query(invalid, None), build_query({}, None))
+        unbounded = parse_filters(QueryDict("lat=41.31&lon=69.28&radius_km=inf"))
+        self.assertEqual(build_query(unbounded, None), build_query({}, None))
+
+
+class RenormalizeQueueTests(TestCase):
+    def test_requests_merge_and_failed_passes_stay_queued(self):
+        from searchapp.models import RenormalizeRequest
+        from searchapp.views import renormalize
+
+        self.addCleanup(cache.clear)
+        with mock.patch("searchapp.tasks.task_renormalize_prices.delay"):
+            renormalize.request_renormalize(["USD"])
+            renormalize.request_renormalize(["EUR", "USD"])
+        self.assertEqual(renormalize.renormalize_progress()["pending"], ["EUR", "USD"])
+
+        with mock.patch.object(renormalize, "renormalize_prices", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                renormalize.renormalize_pending()
+        self.assertEqual(RenormalizeRequest.objects.count(), 3)
+
+        with mock.patch.object(renormalize, "renormalize_prices", return_value={"done": True}) as run:
+            renormalize.renormalize_pending()
+        run.assert_called_once_with(["EUR", "USD"])
+        self.assertFalse(RenormalizeRequest.objects.exists())
+
+
+    def test_post_requires_a_list_of_known_currencies(self):
+        from django.contrib.auth import get_user_model
+        from currency.models import Currency
+        from searchapp.models import RenormalizeRequest
+
+        self.addCleanup(cache.clear)
+        Currency.objects.create(code="USD", name="Dollar", symbol="$")
+        admin = get_user_model().objects.create_superuser(username="admin", password="pass123")
+        self.client.force_login(admin)
+        url = "/api/v1/search/renormalize"
+        for currencies in ("USD", ["GBP"], [1]):
+            resp = self.client.post(url, {"currencies": currencies}, content_type="application/json")
+            self.assertEqual(resp.status_code, 400, currencies)
+        self.assertFalse(RenormalizeRequest.objects.exists())
+        with mock.patch("searchapp.tasks.task_renormalize_prices.delay"):
+            resp = self.client.post(url, {"currencies": ["USD"]}, content_type="application/json")
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(list(RenormalizeRequest.objects.values_list("currency", flat=True)), ["USD"])
+
+
+class SearchCursorTests(SimpleTestCase):
+    def setUp(self):
+        from searchapp.views import listing_search_view, opensearch_client
+
+        self.view = listing_search_view
+        self.breaker = opensearch_client.breaker
+        self.client_mock = mock.Mock()
+        for target, value in (
+            ("get_client", self.client_mock),
+            ("search_available", True),
+            ("ensure_index", None),
+        ):
+            patcher = mock.patch.object(listing_search_view, target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.breaker.record_success()
+        self.addCleanup(self.breaker.record_success)
+        self.addCleanup(cache.clear)
+
+    def _get(self, cursor):
+        return self.client.get("/api/v1/search/listings", {"cursor": cursor})
+
+    def test_malformed_cursors_are_rejected_before_searching(self):
+        for data in (
+            {"sa": [1, "42"], "s": "bogus"},
+            {"sa": [1], "s": "newest"},
+            {"sa": [{"match_all": {}}, "42"], "s": "newest"},
+            {"sa": [1, "42"], "s": "newest", "pit": ["x"]},
+            {"sa": [1, "42"]},
+        ):
+            raw = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+            self.assertEqual(self._get(raw).status_code, 400, data)
+        self.assertEqual(self._get("not base64!").status_code, 400)
+        self.client_mock.search.assert_not_called()
+
+    def test_expired_pit_is_a_client_error(self):
+        from opensearchpy.exceptions import NotFoundError, RequestError
+
+        self.client_mock.search.side_effect = NotFoundError(404, "search_context_missing_exception", {})
+        cursor = self.view._encode_cursor([1700000000000, "42"], "newest", "gone")
+        for _ in range(self.breaker.threshold):
+            resp = self._get(cursor)
+            self.assertEqual(resp.status_code, 400)
+            self.assertEqual(resp.json()["detail"], "Invalid or expired cursor")
+
+        self.client_mock.search.side_effect = RequestError(400, "parse_exception", {})
+        resp = self._get(self.view._encode_cursor(["abc", "42"], "price_asc"))
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_cluster_failures_trip_the_breaker(self):
+        from opensearchpy.exceptions import ConnectionTimeout, TransportError
+
+        self.client_mock.search.side_effect = ConnectionTimeout("N/A", "timed out", None)
+        cursor = self.view._encode_cursor([1700000000000, "42"], "newest")
+        self.assertEqual(self._get(cursor).status_code, 200)
+        self.client_mock.search.side_effect = TransportError(503, "unavailable", {})
+        self.assertEqual(self._get(cursor).status_code, 200)
+        self.assertEqual(self.breaker.failures, 2)
+
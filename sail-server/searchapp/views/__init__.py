@@ -1,3 +1,6 @@
+from .listing_facets_view import ListingFacetsView
 from .listing_search_view import ListingSearchView
+from .renormalize_status_view import RenormalizeStatusView
+from .search_cache_stats_view import SearchCacheStatsView
 
-__all__ = ["ListingSearchView"]
+__all__ = ["ListingFacetsView", "ListingSearchView", "RenormalizeStatusView", "SearchCacheStatsView"]
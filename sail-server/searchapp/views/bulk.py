@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from django.db import connection
+
+from listings.models import Listing
+
+from .generation import bump_generation
+from .index import build_document, index_name, is_indexable, prefetch_document_data
+
+try:
+    from opensearchpy import helpers
+except Exception:  # pragma: no cover - library may be missing in some envs
+    helpers = None  # type: ignore
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class BulkStats:
+    indexed: int = 0
+    failed: int = 0
+    last_id: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    failed_ids: List[str] = field(default_factory=list)
+
+    @property
+    def docs_per_sec(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return self.indexed / elapsed if elapsed > 0 else 0.0
+
+
+def read_checkpoint(path: Optional[str]) -> int:
+    """Return the last fully indexed listing id stored in the checkpoint file."""
+    if not path:
+        return 0
+    try:
+        return int(json.loads(Path(path).read_text()).get("last_id", 0))
+    except (OSError, ValueError):
+        return 0
+
+
+def write_checkpoint(path: Optional[str], last_id: int) -> None:
+    if not path:
+        return
+    tmp = Path(f"{path}.tmp")
+    tmp.write_text(json.dumps({"last_id": last_id, "updated_at": time.time()}))
+    tmp.replace(path)
+
+
+def iter_id_chunks(queryset, chunk_size: int, after_id: int = 0) -> Iterator[List[int]]:
+    """Yield listing ids in keyset-ordered chunks (``id > last`` instead of OFFSET)."""
+    last_id = after_id
+    while True:
+        ids = list(
+            queryset.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def build_documents(ids: Sequence[int]) -> List[Dict[str, Any]]:
+    """
+    Load a chunk of listings with all related rows and build their documents.
+
+    Listings that should not be searchable (inactive, expired, deleted) get
+    no document.
+    """
+    listings = [
+        l
+        for l in Listing.objects.filter(id__in=ids).select_related("category", "location").order_by("id")
+        if is_indexable(l)
+    ]
+    data = prefetch_document_data(listings)
+    return [build_document(l, data) for l in listings]
+
+
+def _build_in_worker(ids: Sequence[int]) -> List[Dict[str, Any]]:
+    try:
+        return build_documents(ids)
+    finally:
+        # Worker threads get their own connection; don't leak it past the chunk
+        connection.close()
+
+
+def _actions(docs: Sequence[Dict[str, Any]], index: str, op_type: str = "index") -> Iterator[Dict[str, Any]]:
+    for doc in docs:
+        yield {"_op_type": op_type, "_index": index, "_id": doc["id"], "_source": doc}
+
+
+def _item_id(item: Dict[str, Any]) -> str:
+    return str(next(iter(item.values())).get("_id"))
+
+
+def _succeeded(ok: bool, item: Dict[str, Any]) -> bool:
+    # A "create" conflict means a live write already put a newer document there
+    op_type, info = next(iter(item.items()))
+    return ok or (op_type == "create" and info.get("status") == 409)
+
+
+def retry_failed(
+    client, ids: Sequence[str], index: str, batch_size: int, max_retries: int, op_type: str = "index"
+) -> List[str]:
+    """Rebuild failed documents from the database and resend them with backoff."""
+    remaining = [int(i) for i in ids]
+    for attempt in range(max_retries):
+        if not remaining:
+            break
+        time.sleep(min(2 ** attempt, 30))
+        docs = build_documents(remaining)
+        found = {int(d["id"]) for d in docs}
+        failed: List[int] = []
+        for ok, item in helpers.streaming_bulk(
+            client,
+            _actions(docs, index, op_type),
+            chunk_size=batch_size,
+            max_retries=max_retries,
+            raise_on_error=False,
+            raise_on_exception=False,
+        ):
+            if not _succeeded(ok, item):
+                failed.append(int(_item_id(item)))
+        # Listings deleted in the meantime are not failures
+        remaining = [i for i in failed if i in found]
+    return [str(i) for i in remaining]
+
+
+def bulk_reindex(
+    client,
+    queryset=None,
+    *,
+    index: Optional[str] = None,
+    op_type: str = "index",
+    chunk_size: int = 1000,
+    batch_size: int = 500,
+    workers: int = 4,
+    concurrency: int = 4,
+    max_retries: int = 3,
+    checkpoint: Optional[str] = None,
+    resume: bool = False,
+    progress: Optional[Callable[[BulkStats], None]] = None,
+) -> BulkStats:
+    """
+    Reindex listings through the ``_bulk`` API.
+
+    Listings are streamed in keyset-ordered id chunks. A thread pool loads each
+    chunk with its related rows and builds the documents while
+    ``parallel_bulk`` ships earlier chunks with ``concurrency`` requests in
+    flight. The checkpoint records the highest id of the last chunk whose
+    items were all acknowledged, so an interrupted run can resume there. It
+    stops before the first chunk with failed items until the retry pass has
+    indexed them, so ``--resume`` never skips a failed document.
+
+    Rebuilds pass ``op_type="create"`` so documents dual-written by live
+    updates while the load runs are never overwritten with older data.
+    """
+    if helpers is None:
+        raise RuntimeError("opensearch-py is not installed")
+    if queryset is None:
+        queryset = Listing.objects.filter(status=Listing.Status.ACTIVE)
+    index = index or index_name()
+
+    stats = BulkStats(last_id=read_checkpoint(checkpoint) if resume else 0)
+    # [last id of chunk, number of its docs still awaiting a bulk response, any failed]
+    pending_chunks: List[List[Any]] = []
+    # Set once a chunk had failures: the checkpoint must not move past it
+    held = {"checkpoint": False}
+
+    def generate() -> Iterator[Dict[str, Any]]:
+        # parallel_bulk consumes this generator from its own thread
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                in_flight: List[Any] = []
+                for ids in iter_id_chunks(queryset, chunk_size, after_id=stats.last_id):
+                    # Keep a bounded number of chunks being built ahead of the sender
+                    in_flight.append((ids[-1], pool.submit(_build_in_worker, ids)))
+                    if len(in_flight) >= workers * 2:
+                        yield from emit(*in_flight.pop(0))
+                for last_id, future in in_flight:
+                    yield from emit(last_id, future)
+        finally:
+            connection.close()
+
+    def emit(last_id: int, future) -> Iterator[Dict[str, Any]]:
+        docs = future.result()
+        if docs:
+            pending_chunks.append([last_id, len(docs), False])
+            yield from _actions(docs, index, op_type)
+
+    def ack() -> None:
+        # parallel_bulk yields results in submission order, so chunks complete in order
+        while pending_chunks and pending_chunks[0][1] <= 0:
+            last_id, _, chunk_failed = pending_chunks.pop(0)
+            stats.last_id = last_id
+            held["checkpoint"] = held["checkpoint"] or chunk_failed
+            if not held["checkpoint"]:
+                write_checkpoint(checkpoint, last_id)
+            if progress:
+                progress(stats)
+
+    for ok, item in helpers.parallel_bulk(
+        client,
+        generate(),
+        thread_count=max(1, concurrency),
+        chunk_size=batch_size,
+        raise_on_error=False,
+        raise_on_exception=False,
+    ):
+        if _succeeded(ok, item):
+            stats.indexed += 1
+        else:
+            stats.failed_ids.append(_item_id(item))
+            pending_chunks[0][2] = True
+        pending_chunks[0][1] -= 1
+        ack()
+
+    if stats.failed_ids:
+        logger.warning("Retrying %s failed documents", len(stats.failed_ids))
+        still_failed = retry_failed(client, stats.failed_ids, index, batch_size, max_retries, op_type)
+        stats.indexed += len(stats.failed_ids) - len(still_failed)
+        stats.failed_ids = still_failed
+        if not still_failed:
+            # Every failure is indexed now; a resume may start after the last chunk
+            write_checkpoint(checkpoint, stats.last_id)
+    stats.failed = len(stats.failed_ids)
+    bump_generation()
+    return stats
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from taxonomy.tree import get_tree
+
+from .generation import cache_generation
+
+
+def is_leaf_category(slug: Optional[str]) -> bool:
+    """Attribute facets are only meaningful once the category is narrowed to a leaf."""
+    node = get_tree().categories_by_slug.get(slug) if slug else None
+    return bool(node and node.is_leaf)
+
+
+def facet_cache_key(filters: Dict[str, Any], q: Optional[str], currency: str) -> str:
+    """
+    Key facets on the normalized filter set, not on the raw query string.
+
+    Paging, sorting and parameter order don't change the facets, so all of
+    them share one entry. The index generation of the selected category
+    makes entries computed before the last relevant write unreachable.
+    """
+    normalized = {
+        **{k: v for k, v in filters.items() if k not in {"attrs", "attrs_range", "currency"}},
+        "attrs": {k: sorted(set(v)) for k, v in filters.get("attrs", {}).items()},
+        "attrs_range": filters.get("attrs_range", {}),
+        "q": " ".join((q or "").lower().split()),
+        "currency": currency,
+    }
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    return f"search:facets:{cache_generation(filters.get('category_slug'))}:{digest}"
+
+
+def get_cached_facets(key: str) -> Optional[Dict[str, Any]]:
+    return cache.get(key)
+
+
+def store_facets(key: str, facets: Dict[str, Any]) -> None:
+    cache.set(key, facets, timeout=int(getattr(settings, "SEARCH_FACET_CACHE_TTL", 300)))
+
+
+def facet_aggs(include_attrs: bool) -> Dict[str, Any]:
+    aggs: Dict[str, Any] = {
+        "categories": {
+            "terms": {"field": "category_path", "size": 50}
+        },
+        "locations": {
+            "terms": {"field": "location_path", "size": 50}
+        },
+        "conditions": {
+            "terms": {"field": "condition", "size": 10}
+        },
+        "price_stats": {
+            "stats": {"field": "price_normalized"}
+        },
+    }
+    if include_attrs:
+        aggs["attrs"] = {
+            "nested": {"path": "attrs"},
+            "aggs": {
+                "attr_keys": {
+                    "terms": {"field": "attrs.key", "size": 20},
+                    "aggs": {
+                        "values": {
+                            "terms": {"field": "attrs.value_option_key", "size": 30}
+                        },
+                        "text_values": {
+                            "terms": {"field": "attrs.value_text", "size": 30}
+                        }
+                    }
+                }
+            }
+        }
+    return aggs
+
+
+def format_facets(aggregations: Dict[str, Any], currency: str) -> Dict[str, Any]:
+    """Turn raw aggregation buckets into the facets payload used by the frontend."""
+    facets: Dict[str, Any] = {}
+    for name in ("categories", "locations", "conditions"):
+        if name in aggregations:
+            facets[name] = [
+                {"key": b["key"], "count": b["doc_count"]}
+                for b in aggregations[name]["buckets"]
+            ]
+    if "price_stats" in aggregations:
+        facets["price_range"] = {
+            "min": _display_price(aggregations["price_stats"]["min"], currency),
+            "max": _display_price(aggregations["price_stats"]["max"], currency),
+            "currency": currency,
+        }
+    if "attrs" in aggregations:
+        facets["attributes"] = {}
+        for attr_bucket in aggregations["attrs"]["attr_keys"]["buckets"]:
+            values = []
+            for val_bucket in attr_bucket["values"]["buckets"]:
+                values.append({"key": val_bucket["key"], "count": val_bucket["doc_count"]})
+            for val_bucket in attr_bucket["text_values"]["buckets"]:
+                values.append({"key": val_bucket["key"], "count": val_bucket["doc_count"]})
+            facets["attributes"][attr_bucket["key"]] = values
+    return facets
+
+
+def _display_price(normalized: Optional[float], currency: str) -> Optional[float]:
+    # Price stats are in the base currency; convert them to the requested one
+    if normalized is None or currency == "UZS":
+        return normalized
+    from currency.services import CurrencyService
+
+    default_currency = CurrencyService.get_default_currency()
+    base_currency_code = default_currency.code if default_currency else "UZS"
+    converted = CurrencyService.convert_price(Decimal(str(normalized)), base_currency_code, currency)
+    return float(converted) if converted is not None else normalized
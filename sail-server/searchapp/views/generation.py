@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import time
+from typing import Iterable, Optional
+
+from django.core.cache import cache
+
+GENERATION_KEY = "search:generation"
+# Bumped when a write's categories are unknown; part of every category generation
+BASE_GENERATION_KEY = "search:generation:base"
+
+
+def _category_key(slug: str) -> str:
+    return f"search:generation:cat:{slug}"
+
+
+def current_generation() -> int:
+    """
+    Return the index generation, a counter bumped whenever documents change.
+
+    Caches derived from search results put the generation in their keys, so
+    a bump makes every older entry unreachable without deleting anything.
+    Bumps happen in Celery workers, so the counters must live in the shared
+    cache (see ``CACHES`` in settings and ``searchapp.checks``).
+    """
+    return _get(GENERATION_KEY)
+
+
+def cache_generation(category_slug: Optional[str] = None) -> str:
+    """
+    Generation for caches scoped to one category subtree.
+
+    Writes to other categories leave it untouched, so cached pages of quiet
+    categories survive a busy index. Without a category the global
+    generation is used.
+    """
+    if not category_slug:
+        return str(current_generation())
+    return f"{_get(BASE_GENERATION_KEY)}.{_get(_category_key(category_slug))}"
+
+
+def bump_generation(category_slugs: Optional[Iterable[str]] = None) -> None:
+    """
+    Invalidate caches after an index write.
+
+    ``category_slugs`` are all category path slugs of the documents written
+    or removed (old and new); None means unknown and invalidates every
+    category.
+    """
+    _incr(GENERATION_KEY)
+    if category_slugs is None:
+        _incr(BASE_GENERATION_KEY)
+        return
+    for slug in set(category_slugs):
+        _incr(_category_key(slug))
+
+
+def _get(key: str) -> int:
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _seed(), timeout=None)
+        generation = cache.get(key, 0)
+    return int(generation)
+
+
+def _incr(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _seed(), timeout=None)
+
+
+def _seed() -> int:
+    # Start from the clock so a counter lost to eviction never reuses an old value
+    return int(time.time() * 1000)
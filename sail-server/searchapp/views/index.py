@@ -1,19 +1,47 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
 
 from django.conf import settings
+from django.utils import timezone
 
 from listings.models import Listing, ListingAttributeValue, ListingMedia
-from taxonomy.models import Category, Location
+from taxonomy.spatial import has_coordinates
+from taxonomy.tree import get_tree
 
+from .generation import bump_generation
 from .opensearch_client import get_client
 
 
+# How long a process trusts its view of the write alias. Rebuilds wait this
+# long after adding a new index to the write alias before bulk-loading it.
+WRITE_TARGETS_TTL = 5.0
+
+# The index (or alias) is re-checked at most this often per process
+INDEX_EXISTS_TTL = 60.0
+
+_write_targets: List[str] = []
+_write_targets_expires_at = 0.0
+_index_ensured_until = 0.0
+
+
 def index_name() -> str:
+    """Read alias used by every search; points at exactly one concrete index."""
+    prefix = getattr(settings, "OPENSEARCH_INDEX_PREFIX", "olxclone")
+    return f"{prefix}_listings"
+
+
+def write_alias() -> str:
+    """Alias listing every index that must receive live writes (two during a rebuild)."""
+    return f"{index_name()}_write"
+
+
+def versioned_index_name(suffix: str = "") -> str:
     prefix = getattr(settings, "OPENSEARCH_INDEX_PREFIX", "olxclone")
     version = getattr(settings, "OPENSEARCH_INDEX_VERSION", 1)
-    return f"{prefix}_listings_v{version}"
+    name = f"{prefix}_listings_v{version}"
+    return f"{name}_{suffix}" if suffix else name
 
 
 def mapping_body() -> Dict[str, Any]:
@@ -45,7 +73,10 @@ def mapping_body() -> Dict[str, Any]:
                 "currency": {"type": "keyword"},
                 "condition": {"type": "keyword"},
                 "geo": {"type": "geo_point"},
+                "status": {"type": "keyword"},
+                "created_at": {"type": "date"},
                 "refreshed_at": {"type": "date"},
+                "expires_at": {"type": "date"},
                 "quality_score": {"type": "double"},
                 "attrs": {
                     "type": "nested",
@@ -67,40 +98,175 @@ def mapping_body() -> Dict[str, Any]:
 
 
 def ensure_index():
+    global _index_ensured_until
     client = get_client()
     if not client:
         return
-    idx = index_name()
-    if not client.indices.exists(index=idx):  # type: ignore[attr-defined]
-        client.indices.create(index=idx, body=mapping_body())  # type: ignore[attr-defined]
-
-
-def build_document(listing: Listing) -> Dict[str, Any]:
-    # Build category path up to root
-    cat_path: List[str] = []
-    cat = listing.category
-    while cat:
-        cat_path.append(cat.slug)
-        cat = cat.parent  # type: ignore[attr-defined]
-    cat_path.reverse()
-
-    # Location path
-    loc_path: List[str] = []
-    loc = listing.location
-    while loc:
-        loc_path.append(loc.slug)
-        loc = loc.parent  # type: ignore[attr-defined]
-    loc_path.reverse()
+    if time.monotonic() < _index_ensured_until:
+        return
+    alias = index_name()
+    if client.indices.exists_alias(name=alias):  # type: ignore[attr-defined]
+        _index_ensured_until = time.monotonic() + INDEX_EXISTS_TTL
+        return
+    idx = versioned_index_name()
+    aliases = {alias: {}, write_alias(): {}}
+    if client.indices.exists(index=idx):  # type: ignore[attr-defined]
+        # Index created before aliases were introduced: adopt it
+        client.indices.update_aliases(  # type: ignore[attr-defined]
+            body={"actions": [{"add": {"index": idx, "alias": a}} for a in aliases]}
+        )
+    else:
+        client.indices.create(index=idx, body={**mapping_body(), "aliases": aliases})  # type: ignore[attr-defined]
+    _index_ensured_until = time.monotonic() + INDEX_EXISTS_TTL
+
+
+def alias_indices(alias: str) -> List[str]:
+    client = get_client()
+    if not client:
+        return []
+    try:
+        return sorted(client.indices.get_alias(name=alias).keys())  # type: ignore[attr-defined]
+    except Exception:
+        return []
+
+
+def write_targets() -> List[str]:
+    """Concrete indices behind the write alias, cached for WRITE_TARGETS_TTL seconds."""
+    global _write_targets, _write_targets_expires_at
+    now = time.monotonic()
+    if now >= _write_targets_expires_at:
+        _write_targets = alias_indices(write_alias())
+        _write_targets_expires_at = now + WRITE_TARGETS_TTL
+    return _write_targets or [index_name()]
+
+
+def create_rebuild_index(name: str) -> None:
+    """Create a new versioned index tuned for bulk loading (no replicas, no refresh)."""
+    client = get_client()
+    body = mapping_body()
+    body["settings"]["index"].update({"number_of_replicas": 0, "refresh_interval": "-1"})
+    client.indices.create(index=name, body=body)  # type: ignore[union-attr]
+
+
+def finish_rebuild_index(name: str) -> None:
+    """Restore serving settings on a bulk-loaded index and make its documents visible."""
+    client = get_client()
+    replicas = mapping_body()["settings"]["index"]["number_of_replicas"]
+    client.indices.put_settings(  # type: ignore[union-attr]
+        index=name, body={"index": {"number_of_replicas": replicas, "refresh_interval": "1s"}}
+    )
+    client.indices.refresh(index=name)  # type: ignore[union-attr]
+
+
+def add_write_target(name: str) -> None:
+    get_client().indices.update_aliases(  # type: ignore[union-attr]
+        body={"actions": [{"add": {"index": name, "alias": write_alias()}}]}
+    )
+
+
+def remove_write_target(name: str) -> None:
+    get_client().indices.update_aliases(  # type: ignore[union-attr]
+        body={"actions": [{"remove": {"index": name, "alias": write_alias()}}]}
+    )
+
+
+def swap_aliases(new_index: str) -> List[str]:
+    """Atomically point both aliases at ``new_index`` only; return the indices it replaced."""
+    read, write = index_name(), write_alias()
+    read_indices = set(alias_indices(read)) - {new_index}
+    write_indices = set(alias_indices(write)) - {new_index}
+    actions: List[Dict[str, Any]] = [{"remove": {"index": idx, "alias": read}} for idx in sorted(read_indices)]
+    actions += [{"remove": {"index": idx, "alias": write}} for idx in sorted(write_indices)]
+    actions.append({"add": {"index": new_index, "alias": read}})
+    actions.append({"add": {"index": new_index, "alias": write}})
+    get_client().indices.update_aliases(body={"actions": actions})  # type: ignore[union-attr]
+    bump_generation()
+    return sorted(read_indices | write_indices)
+
+
+def indexed_documents(listing_ids: Iterable[int], fields: str = "category_path") -> Optional[Dict[int, Dict[str, Any]]]:
+    """Sources (limited to ``fields``) of the documents currently indexed for ``listing_ids``; None if unknown."""
+    ids = [str(i) for i in listing_ids]
+    if not ids:
+        return {}
+    try:
+        resp = get_client().mget(  # type: ignore[union-attr]
+            index=index_name(), body={"ids": ids}, _source_includes=fields
+        )
+    except Exception:
+        return None
+    return {int(doc["_id"]): doc.get("_source") or {} for doc in resp.get("docs", []) if doc.get("found")}
+
+
+def is_indexable(listing: Listing) -> bool:
+    """Only listings visible in search get a document; everything else is deleted."""
+    if listing.status != Listing.Status.ACTIVE:
+        return False
+    return listing.expires_at is None or listing.expires_at > timezone.now()
+
+
+def prefetch_document_data(listings: Sequence[Listing]) -> Dict[str, Any]:
+    """
+    Load everything build_document() needs for a batch of listings.
+
+    The number of queries does not depend on the batch size, so bulk indexing
+    can build thousands of documents without per-row lookups. Category and
+    location paths come from the in-memory taxonomy snapshot.
+    """
+    from accounts.models import Profile
+    from currency.services import CurrencyService
+
+    listing_ids = [l.id for l in listings]
+
+    attrs: Dict[int, List[ListingAttributeValue]] = {}
+    for row in ListingAttributeValue.objects.filter(listing_id__in=listing_ids).select_related("attribute"):
+        attrs.setdefault(row.listing_id, []).append(row)
+
+    media: Dict[int, List[ListingMedia]] = {}
+    for m in ListingMedia.objects.filter(listing_id__in=listing_ids).order_by("listing_id", "order", "id"):
+        media.setdefault(m.listing_id, []).append(m)
+
+    seller_names = dict(
+        Profile.objects.filter(user_id__in={l.user_id for l in listings}).values_list("user_id", "display_name")
+    )
+
+    prices = CurrencyService.convert_many([l.price_amount for l in listings], [l.price_currency for l in listings])
+
+    return {
+        "taxonomy": get_tree(),
+        "attrs": attrs,
+        "media": media,
+        "seller_names": seller_names,
+        "prices": dict(zip(listing_ids, prices)),
+    }
+
+
+def _geo_point(listing: Listing, tree) -> Optional[Dict[str, float]]:
+    """The listing's own point, else the centroid of its location or the nearest ancestor that has one."""
+    if listing.lat and listing.lon:
+        return {"lat": listing.lat, "lon": listing.lon}
+    for node in reversed(tree.location_ancestors(listing.location_id)):
+        if has_coordinates(node):
+            return {"lat": node.lat, "lon": node.lon}
+    return None
+
+
+def build_document(listing: Listing, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    if data is None:
+        data = prefetch_document_data([listing])
+
+    # Category and location paths up to root
+    tree = data["taxonomy"]
+    cat_path = tree.category_path_slugs(listing.category_id)
+    loc_path = tree.location_path_slugs(listing.location_id)
     # Location names (ru/uz) for display in search cards
-    loc_display_ru = listing.location.name_ru or listing.location.name or ""
-    loc_display_uz = listing.location.name_uz or listing.location.name or ""
+    location = tree.location(listing.location_id) or listing.location
+    loc_display_ru = location.name_ru or location.name or ""
+    loc_display_uz = location.name_uz or location.name or ""
 
     # Attributes
-    attr_rows = (
-        ListingAttributeValue.objects.filter(listing=listing).select_related("attribute")
-    )
     attrs: List[Dict[str, Any]] = []
-    for row in attr_rows:
+    for row in data["attrs"].get(listing.id, []):
         a = row.attribute
         attrs.append(
             {
@@ -114,24 +280,14 @@ def build_document(listing: Listing) -> Dict[str, Any]:
         )
 
     # Media URLs (first few only)
-    media = ListingMedia.objects.filter(listing=listing).order_by("order", "id")[:5]
+    media = data["media"].get(listing.id, [])[:5]
     media_urls = [m.image.url for m in media if m.image]
 
-    # Normalize price to base currency (UZS) for consistent sorting
-    from currency.services import CurrencyService
-
-    price_normalized = float(
-        CurrencyService.normalize_price_to_base(listing.price_amount or 0, listing.price_currency)
-    )
+    # Price in the base currency (UZS) for consistent sorting
+    price_normalized = float(data["prices"][listing.id])
 
     # Seller info from profile
-    from accounts.models import Profile
-    seller_name = ""
-    try:
-        profile = Profile.objects.get(user_id=listing.user_id)
-        seller_name = profile.display_name or ""
-    except Profile.DoesNotExist:
-        pass
+    seller_name = data["seller_names"].get(listing.user_id) or ""
 
     doc = {
         "id": str(listing.id),
@@ -146,8 +302,11 @@ def build_document(listing: Listing) -> Dict[str, Any]:
         "price_normalized": price_normalized,
         "currency": listing.price_currency,
         "condition": listing.condition,
-        "geo": {"lat": listing.lat, "lon": listing.lon} if listing.lat and listing.lon else None,
+        "geo": _geo_point(listing, tree),
+        "status": listing.status,
+        "created_at": listing.created_at,
         "refreshed_at": listing.refreshed_at,
+        "expires_at": listing.expires_at,
         "quality_score": listing.quality_score,
         "attrs": attrs,
         "media_urls": media_urls,
@@ -167,15 +326,23 @@ def index_listing(listing_id: int):
     except Listing.DoesNotExist:
         delete_listing(listing_id)
         return
+    if not is_indexable(listing):
+        delete_listing(listing_id)
+        return
     doc = build_document(listing)
-    client.index(index=index_name(), id=str(listing_id), body=doc)  # type: ignore[arg-type]
+    # During a rebuild the write alias covers both the live and the new index
+    for idx in write_targets():
+        client.index(index=idx, id=str(listing_id), body=doc)  # type: ignore[arg-type]
+    bump_generation()
 
 
 def delete_listing(listing_id: int):
     client = get_client()
     if not client:
         return
-    try:
-        client.delete(index=index_name(), id=str(listing_id))
-    except Exception:
-        pass
+    for idx in write_targets():
+        try:
+            client.delete(index=idx, id=str(listing_id))
+        except Exception:
+            pass
+    bump_generation()
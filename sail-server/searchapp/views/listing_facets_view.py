@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .facets import facet_aggs, facet_cache_key, format_facets, get_cached_facets, is_leaf_category, store_facets
+from .index import ensure_index, index_name
+from .query_builder import build_query, parse_filters
+from .opensearch_client import get_client, is_cluster_failure, report_failure, report_success, search_available
+
+
+class ListingFacetsView(APIView):
+    """
+    Facets for a listing search, without the results.
+
+    Takes the same filter parameters as ``ListingSearchView`` (paging and
+    sorting are ignored) so the client can load facets and results
+    independently. Attribute facets are only computed for leaf categories.
+
+    Example:
+        GET /api/v1/search/listings/facets?category_slug=phones&currency=USD
+    """
+    authentication_classes: list = []
+    permission_classes: list = []
+
+    def get(self, request):
+        q = request.query_params.get("q")
+        filters = parse_filters(request.query_params)
+        currency = filters.get("currency", "UZS").upper()
+
+        key = facet_cache_key(filters, q, currency)
+        facets = get_cached_facets(key)
+        if facets is not None:
+            return Response({"facets": facets})
+
+        client = get_client()
+        if not client or not search_available():
+            return Response({"facets": {}, "note": "Search backend unavailable"}, status=200)
+        try:  # pragma: no cover
+            ensure_index()
+        except Exception:  # pragma: no cover
+            pass
+
+        body = {
+            "size": 0,
+            "query": build_query(filters, q),
+            "aggs": facet_aggs(is_leaf_category(filters.get("category_slug"))),
+        }
+        try:
+            resp = client.search(index=index_name(), body=body)
+            report_success()
+        except Exception as e:
+            if is_cluster_failure(e):
+                report_failure()
+            return Response({
+                "facets": {},
+                "note": f"Search backend unavailable or index missing: {type(e).__name__}",
+            }, status=200)
+
+        facets = format_facets(resp.get("aggregations", {}), currency)
+        store_facets(key, facets)
+        return Response({"facets": facets})
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import logging
 import os
+import threading
+import time
 from typing import Optional
 from urllib.parse import urlparse, unquote
 
@@ -8,16 +11,27 @@ from django.conf import settings
 
 try:
     from opensearchpy import OpenSearch
+    from opensearchpy.exceptions import ConnectionError as OpenSearchConnectionError, TransportError
 except Exception:  # pragma: no cover - library may be missing in some envs
     OpenSearch = None  # type: ignore
+    OpenSearchConnectionError = TransportError = None  # type: ignore
 
 
-def get_client() -> Optional["OpenSearch"]:
-    if OpenSearch is None:
-        return None
-    url = getattr(settings, "OPENSEARCH_URL", os.environ.get("OPENSEARCH_URL"))
-    if not url:
-        return None
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# (pid, url, client): rebuilt after a fork so processes never share sockets
+_client_state: tuple = (None, None, None)
+
+
+def _build_client(url: str) -> "OpenSearch":
+    options = {
+        # Keep-alive pool shared by every request thread in this process
+        "pool_maxsize": int(getattr(settings, "OPENSEARCH_POOL_MAXSIZE", 10)),
+        "timeout": float(getattr(settings, "OPENSEARCH_TIMEOUT", 5)),
+        "max_retries": int(getattr(settings, "OPENSEARCH_MAX_RETRIES", 1)),
+        "retry_on_timeout": True,
+    }
     try:
         parsed = urlparse(url)
         host = parsed.hostname or "localhost"
@@ -36,8 +50,151 @@ def get_client() -> Optional["OpenSearch"]:
             use_ssl=(scheme == "https"),
             verify_certs=verify_env,
             ssl_show_warn=False,
+            **options,
         )
         return client
     except Exception:
         # fall back to simple constructor; let caller handle ping
-        return OpenSearch(hosts=[url])
+        return OpenSearch(hosts=[url], **options)
+
+
+def get_client() -> Optional["OpenSearch"]:
+    """Return the process-wide client, creating it on first use."""
+    global _client_state
+    if OpenSearch is None:
+        return None
+    url = getattr(settings, "OPENSEARCH_URL", os.environ.get("OPENSEARCH_URL"))
+    if not url:
+        return None
+    pid, cached_url, client = _client_state
+    if pid == os.getpid() and cached_url == url:
+        return client
+    with _lock:
+        pid, cached_url, client = _client_state
+        if pid != os.getpid() or cached_url != url:
+            client = _build_client(url)
+            _client_state = (os.getpid(), url, client)
+        return client
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the cluster is down.
+
+    After ``threshold`` consecutive failures the breaker opens for
+    ``cooldown`` seconds; after that a single caller is let through as a
+    probe and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.failures < self.threshold:
+                return True
+            now = time.monotonic()
+            if now < self.open_until:
+                return False
+            # Half-open: let this caller probe, keep everyone else out meanwhile
+            self.open_until = now + self.cooldown
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.failures == self.threshold:
+                    logger.warning("OpenSearch circuit breaker open for %ss", self.cooldown)
+                self.open_until = time.monotonic() + self.cooldown
+
+
+breaker = CircuitBreaker(
+    threshold=int(getattr(settings, "OPENSEARCH_BREAKER_THRESHOLD", 3)),
+    cooldown=float(getattr(settings, "OPENSEARCH_BREAKER_COOLDOWN", 30)),
+)
+
+_health = {"ok": False, "checked_at": None, "refreshing": False}
+
+
+def _ping() -> bool:
+    client = get_client()
+    try:
+        ok = bool(client and client.ping())
+    except Exception:
+        ok = False
+    if ok:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+    _health.update(ok=ok, checked_at=time.monotonic(), refreshing=False)
+    return ok
+
+
+def _refresh_in_background() -> None:
+    with _lock:
+        if _health["refreshing"]:
+            return
+        _health["refreshing"] = True
+    threading.Thread(target=_ping, name="opensearch-health", daemon=True).start()
+
+
+def search_available() -> bool:
+    """
+    Cheap health check for hot request paths.
+
+    A successful ping is trusted for OPENSEARCH_HEALTH_TTL seconds and then
+    refreshed by a background thread while callers keep using the cached
+    result. Pings only block the caller when the cluster state is unknown or
+    was last seen down, and the circuit breaker limits those to one probe per
+    cooldown once the cluster keeps failing.
+    """
+    if get_client() is None or not breaker.allow():
+        return False
+    checked_at = _health["checked_at"]
+    if checked_at is None or not _health["ok"]:
+        return _ping()
+    if time.monotonic() - checked_at > float(getattr(settings, "OPENSEARCH_HEALTH_TTL", 10)):
+        _refresh_in_background()
+    return True
+
+
+def report_success() -> None:
+    breaker.record_success()
+
+
+def is_cluster_failure(exc: BaseException) -> bool:
+    """
+    True when ``exc`` says the cluster is unhealthy: connection errors,
+    timeouts (``ConnectionTimeout`` is a ``ConnectionError``) and 5xx
+    responses. 4xx responses are the caller's fault and must not count
+    towards the circuit breaker.
+    """
+    if TransportError is None or not isinstance(exc, TransportError):
+        return False
+    if isinstance(exc, OpenSearchConnectionError):
+        return True
+    status = exc.status_code
+    return isinstance(status, int) and status >= 500
+
+
+def is_request_error(exc: BaseException) -> bool:
+    """True for 400/404 responses, e.g. a bad ``search_after`` or an expired point-in-time."""
+    if TransportError is None or not isinstance(exc, TransportError):
+        return False
+    return exc.status_code in (400, 404)
+
+
+def report_failure() -> None:
+    """Record a failed request so the next caller re-checks the cluster."""
+    _health["ok"] = False
+    breaker.record_failure()
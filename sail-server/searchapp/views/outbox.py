@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Iterable, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from ..models import ListingIndexEvent
+from .bulk import build_documents, iter_id_chunks
+from .generation import bump_generation
+from .index import ensure_index, indexed_documents, write_targets
+from .opensearch_client import get_client, search_available
+
+try:
+    from opensearchpy import helpers
+except Exception:  # pragma: no cover - library may be missing in some envs
+    helpers = None  # type: ignore
+
+
+logger = logging.getLogger(__name__)
+
+SCHEDULED_KEY = "search:outbox:scheduled"
+DRAIN_LOCK_KEY = "search:outbox:draining"
+
+
+def mark_listing_dirty(listing_id: int) -> None:
+    """
+    Record that a listing's search document is stale.
+
+    Must run inside the transaction that changed the listing: the outbox row
+    commits (or rolls back) together with the change, and the drain is only
+    scheduled once the transaction has committed.
+    """
+    mark_listings_dirty([listing_id])
+
+
+def mark_listings_dirty(listing_ids) -> None:
+    if get_client() is None:
+        return
+    ListingIndexEvent.objects.bulk_create([ListingIndexEvent(listing_id=i) for i in listing_ids])
+    transaction.on_commit(schedule_drain)
+
+
+def mark_location_listings_dirty(location_id: int, fallback_only: bool = True, chunk_size: int = 5000) -> int:
+    """
+    Queue a rebuild of the listings in a location's subtree; returns how many were queued.
+
+    Documents carry the location path and, for listings without their own
+    coordinates, the centroid of the location or its nearest ancestor that
+    has one. ``fallback_only`` limits the rebuild to those listings (after a
+    centroid change); a moved location needs all of them.
+    """
+    from django.db.models import Q
+
+    from listings.models import Listing
+    from taxonomy.models import Location
+
+    location = Location.objects.filter(pk=location_id).first()
+    if location is None or not location.path or get_client() is None:
+        return 0
+    listings = Listing.objects.in_location(location)
+    if fallback_only:
+        # Same test as index._geo_point: 0 counts as missing
+        listings = listings.filter(Q(lat__isnull=True) | Q(lon__isnull=True) | Q(lat=0) | Q(lon=0))
+    queued = 0
+    for ids in iter_id_chunks(listings, chunk_size):
+        with transaction.atomic():
+            mark_listings_dirty(ids)
+        queued += len(ids)
+    return queued
+
+
+def schedule_drain() -> None:
+    """Schedule one drain per window no matter how many events were written."""
+    from ..tasks import task_drain_index_outbox
+
+    window = getattr(settings, "SEARCH_OUTBOX_WINDOW", 2)
+    if cache.add(SCHEDULED_KEY, 1, timeout=window):
+        task_drain_index_outbox.apply_async(countdown=window)
+
+
+def drain_outbox(batch_size: int = 1000) -> int:
+    """
+    Rebuild every listing with pending outbox events and ship them in one ``_bulk``.
+
+    Events are deduplicated by listing id, documents are built with batched
+    prefetches, and only events whose listing was written successfully are
+    removed; failed ones stay for the next drain. Returns the number of
+    listings processed.
+    """
+    client = get_client()
+    if not client or helpers is None or not search_available():
+        # Events stay in the outbox until the cluster is reachable again
+        return 0
+    if not cache.add(DRAIN_LOCK_KEY, 1, timeout=300):
+        return 0
+    try:
+        ensure_index()
+        processed = 0
+        while True:
+            events = list(ListingIndexEvent.objects.order_by("id").values_list("id", "listing_id")[:batch_size])
+            if not events:
+                return processed
+            done = sync_listings({listing_id for _, listing_id in events})
+            ListingIndexEvent.objects.filter(
+                id__in=[event_id for event_id, listing_id in events if listing_id in done]
+            ).delete()
+            processed += len(done)
+            if len(done) < len({listing_id for _, listing_id in events}):
+                # Something failed; leave the rest for the next scheduled drain
+                return processed
+    finally:
+        cache.delete(DRAIN_LOCK_KEY)
+
+
+def sync_listings(listing_ids: set, activated: Iterable[int] = ()) -> set:
+    """
+    Bring the documents of ``listing_ids`` in line with the database.
+
+    Searchable listings are (re)indexed and everything else is deleted, all in
+    one ``_bulk`` request. ``activated`` are the listings that have just
+    become active; they are percolated against instant saved searches once
+    written. Returns the ids written successfully.
+    """
+    listing_ids = set(listing_ids)
+    activated = set(activated)
+    docs = build_documents(sorted(listing_ids))
+    missing = listing_ids - {int(d["id"]) for d in docs}
+    # Categories the documents are leaving, so their cached pages are invalidated too
+    previous = indexed_documents(listing_ids)
+    old_categories = None
+    if previous is not None:
+        old_categories = {slug for source in previous.values() for slug in source.get("category_path") or []}
+
+    actions: List[Dict[str, Any]] = []
+    for idx in write_targets():
+        actions += [{"_op_type": "index", "_index": idx, "_id": d["id"], "_source": d} for d in docs]
+        actions += [{"_op_type": "delete", "_index": idx, "_id": str(i)} for i in missing]
+
+    failed = set()
+    for ok, item in helpers.streaming_bulk(
+        get_client(), actions, chunk_size=500, raise_on_error=False, raise_on_exception=False
+    ):
+        op_type, info = next(iter(item.items()))
+        # Deleting a document that was never indexed is fine
+        if not ok and not (op_type == "delete" and info.get("status") == 404):
+            failed.add(int(info.get("_id")))
+    if failed:
+        logger.warning("Failed to sync %s listings to search index", len(failed))
+    if len(failed) < len(listing_ids):
+        if old_categories is not None:
+            old_categories.update(slug for d in docs for slug in d.get("category_path", []))
+        bump_generation(old_categories)
+        _schedule_similar_update(listing_ids - failed)
+        # Only real status transitions: a document missing from the index
+        # (reconciliation, a rebuilt index) is not a new listing
+        _percolate([d for d in docs if int(d["id"]) in activated and int(d["id"]) not in failed])
+    return listing_ids - failed
+
+
+def _percolate(docs: List[Dict[str, Any]]) -> None:
+    from savedsearches.percolator import percolate_listings
+
+    if not docs:
+        return
+    try:
+        percolate_listings(docs)
+    except Exception:
+        # Alerts are best effort; the daily digest still covers these listings
+        logger.warning("Percolating %s new listings failed", len(docs), exc_info=True)
+
+
+def _schedule_similar_update(listing_ids: set) -> None:
+    # New and edited listings get their similar listings without waiting for the nightly run
+    from recommendations.tasks import task_update_content_neighbors
+
+    try:
+        task_update_content_neighbors.delay(sorted(listing_ids))
+    except Exception:  # pragma: no cover - the nightly rebuild catches up
+        logger.warning("Could not schedule similar listings update", exc_info=True)
+
+
+def sync_listings_on_commit(listing_ids, activated: bool = False) -> None:
+    """
+    Update or delete the documents right after the current transaction commits.
+
+    Used for status transitions, which must not wait for the outbox window:
+    a deactivated listing has to leave search results immediately.
+    ``activated`` marks transitions to active, which trigger instant
+    saved-search alerts.
+    """
+    from ..tasks import task_sync_listings
+
+    ids = sorted(set(listing_ids))
+    if ids and get_client() is not None:
+        transaction.on_commit(lambda: task_sync_listings.delay(ids, activated))
@@ -0,0 +1,308 @@
+"""
+Filter spec → OpenSearch query compilation, shared by every search path.
+
+The listing search, facets, saved-search counters (page badge and daily
+digest), the run-now endpoint and the percolator all compile their
+queries here, so a saved search matches exactly what the same search in
+the UI shows.
+
+A filter spec is the dict produced by ``parse_filters``; together with the
+text query it round-trips through ``saved_query`` / ``saved_query_spec``
+into ``SavedSearch.query``. Compiled bodies are cached per process for
+``SEARCH_COMPILED_QUERY_TTL`` seconds (price bounds depend on exchange
+rates, so entries must not live forever).
+"""
+from __future__ import annotations
+
+import copy
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from django.conf import settings
+from django.utils.datastructures import MultiValueDict
+
+FILTER_KEYS = {
+    "category_slug", "location_slug", "min_price", "max_price", "condition", "currency", "user_id",
+    "lat", "lon", "radius_km", "bbox",
+}
+# Spellings used by older saved searches
+_ALIASES = {"price_min": "min_price", "price_max": "max_price"}
+COMPILED_CACHE_SIZE = 1024
+
+_lock = threading.Lock()
+_compiled: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def parse_filters(params) -> Dict[str, Any]:
+    """Filter spec from request query params (a ``QueryDict`` or ``MultiValueDict``)."""
+    filters: Dict[str, Any] = {}
+    # Handle repeated keys and comma-separated values
+    for k, values in params.lists():
+        if k.startswith("attrs."):
+            key = k.split(".", 1)[1]
+            # Support range suffixes _min/_max
+            if key.endswith("_min") or key.endswith("_max"):
+                filters.setdefault("attrs_range", {})[key] = values[-1]
+            else:
+                vals: List[str] = []
+                for v in values:
+                    if "," in v:
+                        vals.extend([s for s in v.split(",") if s])
+                    else:
+                        vals.append(v)
+                filters.setdefault("attrs", {})[key] = vals
+        elif k in FILTER_KEYS:
+            filters[k] = values[-1]
+    return filters
+
+
+def filters_from_mapping(params: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    ``parse_filters`` for a plain dict, such as the params stored in a saved search.
+
+    Values may be scalars or lists; a nested ``{"attrs": {key: values}}`` is
+    accepted as well as flat ``attrs.<key>`` entries.
+    """
+    flat: Dict[str, Any] = {_ALIASES.get(k, k): v for k, v in params.items() if k != "attrs"}
+    if isinstance(params.get("attrs"), dict):
+        flat.update({f"attrs.{k}": v for k, v in params["attrs"].items()})
+    return parse_filters(MultiValueDict({
+        k: [str(x) for x in v] if isinstance(v, (list, tuple)) else [str(v)]
+        for k, v in flat.items()
+        if v is not None and v != ""
+    }))
+
+
+def saved_query(filters: Dict[str, Any], q: Optional[str], sort: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Serialize a filter spec into the ``SavedSearch.query`` shape.
+
+    The params use the same names as the search URL, so the frontend can
+    turn them straight back into a search link.
+    """
+    params: Dict[str, Any] = {k: v for k, v in filters.items() if k in FILTER_KEYS}
+    for key, values in filters.get("attrs", {}).items():
+        params[f"attrs.{key}"] = list(values)
+    for key, value in filters.get("attrs_range", {}).items():
+        params[f"attrs.{key}"] = value
+    if q:
+        params["q"] = q
+    if sort:
+        params["sort"] = sort
+    return {"params": params}
+
+
+def saved_query_spec(query: Optional[Mapping[str, Any]]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """(filters, q) of a stored ``SavedSearch.query``, flat or wrapped in ``params``."""
+    query = query or {}
+    params = query.get("params", query)
+    return filters_from_mapping(params), (str(params.get("q") or "").strip() or None)
+
+
+def build_query(filters: Dict[str, Any], q: Optional[str], active_only: bool = True) -> Dict[str, Any]:
+    """
+    Build the ``bool`` query shared by result fetching and facet computation.
+
+    ``active_only=False`` leaves out the status and expiry clauses, for
+    percolator queries that are only ever run against fresh active listings
+    (and may not use ``now``). Returns a copy the caller may extend.
+    """
+    key = json.dumps([filters, q, active_only], sort_keys=True, default=str)
+    ttl = float(getattr(settings, "SEARCH_COMPILED_QUERY_TTL", 60))
+    now = time.monotonic()
+    with _lock:
+        entry = _compiled.get(key)
+        if entry is not None and entry[0] > now:
+            _compiled.move_to_end(key)
+            return copy.deepcopy(entry[1])
+    body = _compile(filters, q, active_only)
+    with _lock:
+        _compiled[key] = (now + ttl, body)
+        _compiled.move_to_end(key)
+        while len(_compiled) > COMPILED_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return copy.deepcopy(body)
+
+
+def geo_origin(filters: Mapping[str, Any]) -> Optional[Tuple[float, float]]:
+    """(lat, lon) from the ``lat``/``lon`` filters; None when missing or out of range."""
+    try:
+        lat, lon = float(filters["lat"]), float(filters["lon"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return (lat, lon) if -90 <= lat <= 90 and -180 <= lon <= 180 else None
+
+
+def geo_bbox(filters: Mapping[str, Any]) -> Optional[Tuple[float, float, float, float]]:
+    """(min_lon, min_lat, max_lon, max_lat) from ``bbox=min_lon,min_lat,max_lon,max_lat``; None if invalid."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in str(filters["bbox"]).split(","))
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        return None
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def clear_compiled_queries() -> None:
+    """Forget cached bodies, e.g. after exchange rates changed."""
+    with _lock:
+        _compiled.clear()
+
+
+def _compile(filters: Dict[str, Any], q: Optional[str], active_only: bool) -> Dict[str, Any]:
+    must: List[Dict[str, Any]] = []
+    filter_clauses: List[Dict[str, Any]] = []
+    if active_only:
+        # Inactive listings are removed from the index on status change; the
+        # expiry clause covers listings that expired since the last expiry run
+        filter_clauses += [
+            {"term": {"status": "active"}},
+            {"bool": {"should": [
+                {"bool": {"must_not": {"exists": {"field": "expires_at"}}}},
+                {"range": {"expires_at": {"gt": "now"}}},
+            ], "minimum_should_match": 1}},
+        ]
+
+    if q:
+        must.append({
+            "multi_match": {
+                "query": q,
+                "fields": ["title^2", "description"],
+                "type": "best_fields",
+            }
+        })
+
+    # Category filter: requires full path slug match; we accept single slug and filter on prefix
+    if slug := filters.get("category_slug"):
+        filter_clauses.append({"terms": {"category_path": [slug]}})
+
+    if lslug := filters.get("location_slug"):
+        filter_clauses.append({"terms": {"location_path": [lslug]}})
+
+    if cnd := filters.get("condition"):
+        filter_clauses.append({"term": {"condition": cnd}})
+
+    # User filter
+    if user_id := filters.get("user_id"):
+        filter_clauses.append({"term": {"user_id": str(user_id)}})
+
+    # Geo filters on the listing point (or its location's centroid, see build_document)
+    origin = geo_origin(filters)
+    try:
+        radius_km = float(filters.get("radius_km") or 0)
+    except (TypeError, ValueError):
+        radius_km = 0
+    # "inf"/"nan" parse as floats but are not distances OpenSearch accepts
+    if origin and math.isfinite(radius_km) and radius_km > 0:
+        filter_clauses.append({"geo_distance": {
+            "distance": f"{radius_km}km",
+            "geo": {"lat": origin[0], "lon": origin[1]},
+        }})
+    if bbox := geo_bbox(filters):
+        # A box with min_lon > max_lon crosses the antimeridian, which OpenSearch handles
+        filter_clauses.append({"geo_bounding_box": {"geo": {
+            "top_left": {"lat": bbox[3], "lon": bbox[0]},
+            "bottom_right": {"lat": bbox[1], "lon": bbox[2]},
+        }}})
+
+    # Price filtering with currency conversion
+    min_price = filters.get("min_price")
+    max_price = filters.get("max_price")
+    currency = filters.get("currency", "UZS").upper()
+
+    if min_price or max_price:
+        from currency.services import CurrencyService
+        from decimal import Decimal
+
+        rng: Dict[str, Any] = {}
+
+        # Convert user's price range to normalized base currency (UZS) for filtering
+        # since price_normalized in index is always in base currency
+        if min_price:
+            min_price_decimal = Decimal(str(min_price))
+            # Convert from user's currency to base currency
+            converted_min = CurrencyService.normalize_price_to_base(min_price_decimal, currency)
+            if converted_min is not None:
+                rng["gte"] = float(converted_min)
+            else:
+                # Fallback: if conversion fails, use original value
+                rng["gte"] = float(min_price)
+
+        if max_price:
+            max_price_decimal = Decimal(str(max_price))
+            # Convert from user's currency to base currency
+            converted_max = CurrencyService.normalize_price_to_base(max_price_decimal, currency)
+            if converted_max is not None:
+                rng["lte"] = float(converted_max)
+            else:
+                # Fallback: if conversion fails, use original value
+                rng["lte"] = float(max_price)
+
+        # Use price_normalized field which stores prices in base currency
+        filter_clauses.append({"range": {"price_normalized": rng}})
+
+    # Attribute filters
+    for key, vals in filters.get("attrs", {}).items():
+        # For each value, create a should; if multiple values, OR them
+        shoulds_all: List[Dict[str, Any]] = []
+        for val in vals:
+            shoulds: List[Dict[str, Any]] = [
+                {"term": {"attrs.value_option_key": str(val)}},
+                {"term": {"attrs.value_text": str(val)}},
+            ]
+            vstr = str(val).lower()
+            if vstr in {"true", "false"}:
+                shoulds.append({"term": {"attrs.value_bool": vstr == "true"}})
+            try:
+                vnum = float(val)
+                shoulds.append({"term": {"attrs.value_number": vnum}})
+            except Exception:
+                pass
+            shoulds_all.append({
+                "bool": {"must": [
+                    {"term": {"attrs.key": key}},
+                    {"bool": {"should": shoulds, "minimum_should_match": 1}},
+                ]}
+            })
+        nested_query = {
+            "nested": {
+                "path": "attrs",
+                "query": {
+                    "bool": {"should": shoulds_all, "minimum_should_match": 1}
+                },
+            }
+        }
+        filter_clauses.append(nested_query)
+
+    # Attribute numeric ranges
+    for rng_key, val in filters.get("attrs_range", {}).items():
+        # rng_key format: <attrkey>_min or <attrkey>_max
+        if rng_key.endswith("_min"):
+            attr_key = rng_key[:-4]
+            rng = {"gte": float(val)}
+        elif rng_key.endswith("_max"):
+            attr_key = rng_key[:-4]
+            rng = {"lte": float(val)}
+        else:
+            continue
+        nested_query = {
+            "nested": {
+                "path": "attrs",
+                "query": {
+                    "bool": {
+                        "must": [
+                            {"term": {"attrs.key": attr_key}},
+                            {"range": {"attrs.value_number": rng}},
+                        ]
+                    }
+                },
+            }
+        }
+        filter_clauses.append(nested_query)
+
+    return {"bool": {"must": must, "filter": filter_clauses}}
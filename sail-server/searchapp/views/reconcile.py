@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import logging
+from typing import Dict, Set
+
+from listings.models import Listing
+
+from .bulk import iter_id_chunks
+from .index import index_name, is_indexable
+from .opensearch_client import get_client
+from .outbox import sync_listings
+
+
+logger = logging.getLogger(__name__)
+
+
+def _searchable_ids(ids: Set[int]) -> Set[int]:
+    rows = Listing.objects.filter(id__in=ids).only("id", "status", "expires_at")
+    return {l.id for l in rows if is_indexable(l)}
+
+
+def reconcile_index(chunk_size: int = 1000) -> Dict[str, int]:
+    """
+    Repair index documents that disagree with the database.
+
+    The search path trusts the index, so this background job is where drift
+    (missed events, manual edits, a listing expiring between expiry runs) is
+    fixed: documents whose listing is no longer searchable are deleted and
+    searchable listings without a document are indexed.
+    """
+    client = get_client()
+    if not client:
+        return {"stale": 0, "missing": 0}
+    idx = index_name()
+    stale = missing = 0
+
+    # Pass 1: walk the index in id order and drop documents for unsearchable listings
+    search_after = None
+    while True:
+        body = {"size": chunk_size, "_source": False, "sort": [{"id": "asc"}], "query": {"match_all": {}}}
+        if search_after:
+            body["search_after"] = search_after
+        hits = client.search(index=idx, body=body).get("hits", {}).get("hits", [])
+        if not hits:
+            break
+        ids = {int(h["_id"]) for h in hits}
+        bad = ids - _searchable_ids(ids)
+        if bad:
+            stale += len(bad)
+            sync_listings(bad)
+        search_after = hits[-1]["sort"]
+
+    # Pass 2: walk active listings and index the ones without a document
+    for ids in iter_id_chunks(Listing.objects.filter(status=Listing.Status.ACTIVE), chunk_size):
+        body = {"size": len(ids), "_source": False, "query": {"ids": {"values": [str(i) for i in ids]}}}
+        hits = client.search(index=idx, body=body).get("hits", {}).get("hits", [])
+        absent = _searchable_ids(set(ids) - {int(h["_id"]) for h in hits})
+        if absent:
+            missing += len(absent)
+            sync_listings(absent)
+
+    if stale or missing:
+        logger.warning("Search index reconciled: %s stale, %s missing documents", stale, missing)
+    return {"stale": stale, "missing": missing}
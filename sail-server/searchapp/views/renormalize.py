@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import logging
+import time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .generation import bump_generation
+from .index import write_targets
+from .opensearch_client import get_client
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = "search:renormalize:running"
+PROGRESS_KEY = "search:renormalize:progress"
+# Sentinel in the pending set meaning "every currency"
+ALL = "*"
+POLL_INTERVAL = 2.0
+# Hard limit of search.renormalize_prices; the lock outlives it so two runs never overlap
+TIME_LIMIT = 3660
+
+# Recomputes price_normalized from the current rate; unchanged documents are
+# no-ops, so re-running with the same rates writes nothing
+SCRIPT = """
+def rate = params.rates.get(ctx._source.currency);
+if (rate == null) { rate = 1.0; }
+double normalized = (ctx._source.price == null ? 0.0 : ctx._source.price) * rate;
+if (ctx._source.price_normalized != null && Math.abs(ctx._source.price_normalized - normalized) < 0.000001) {
+  ctx.op = 'noop';
+} else {
+  ctx._source.price_normalized = normalized;
+}
+"""
+
+
+def base_rates(currencies: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Factor from each currency to the base currency, as ``build_document`` applies it."""
+    from currency.models import Currency
+    from currency.rates import get_rates
+
+    codes = set(currencies) if currencies else set(Currency.objects.values_list("code", flat=True))
+    # Read the rates from the database: this runs right after they changed
+    rates = get_rates(refresh=True)
+    return {code: float(rates.to_base(Decimal("1"), code) or 1) for code in sorted(codes)}
+
+
+def request_renormalize(currencies: Optional[Iterable[str]] = None) -> None:
+    """
+    Queue a re-normalization for listings priced in ``currencies`` (all if None).
+
+    Requests arriving while a run is in progress are merged and picked up by
+    that run when it finishes, so a burst of rate edits costs one extra pass
+    at most, and the last pass always uses the latest rates.
+    """
+    from ..models import RenormalizeRequest
+    from ..tasks import task_renormalize_prices
+
+    # Plain inserts: concurrent requests never overwrite each other
+    RenormalizeRequest.objects.bulk_create(
+        [RenormalizeRequest(currency=code) for code in sorted(set(currencies or [ALL]))]
+    )
+    task_renormalize_prices.delay()
+
+
+def renormalize_pending() -> Optional[Dict[str, Any]]:
+    """Process queued currencies until none are left; returns the last run's progress."""
+    from ..models import RenormalizeRequest
+
+    if not cache.add(LOCK_KEY, 1, timeout=TIME_LIMIT):
+        # The running job sees the queued rows when it finishes
+        return None
+    progress = None
+    claimed = 0
+    try:
+        while True:
+            rows = list(RenormalizeRequest.objects.filter(id__gt=claimed).order_by("id").values_list("id", "currency"))
+            if not rows:
+                return progress
+            claimed = rows[-1][0]
+            pending = {code for _, code in rows}
+            progress = renormalize_prices(None if ALL in pending else sorted(pending))
+            # Only the rows this pass covered; a failed pass leaves its rows queued
+            RenormalizeRequest.objects.filter(id__lte=claimed).delete()
+    finally:
+        cache.delete(LOCK_KEY)
+        if RenormalizeRequest.objects.filter(id__gt=claimed).exists():
+            # Queued between our last check and releasing the lock
+            from ..tasks import task_renormalize_prices
+
+            task_renormalize_prices.delay()
+
+
+def renormalize_prices(currencies: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Rewrite ``price_normalized`` of indexed listings priced in ``currencies``.
+
+    Runs ``update_by_query`` with a painless script on every write target
+    and polls the tasks API, publishing progress under PROGRESS_KEY (see
+    ``renormalize_progress``).
+    """
+    client = get_client()
+    rates = base_rates(currencies)
+    progress: Dict[str, Any] = {
+        "currencies": sorted(rates),
+        "started_at": timezone.now().isoformat(),
+        "total": 0,
+        "updated": 0,
+        "noops": 0,
+        "failures": 0,
+        "done": False,
+    }
+    if not client or not rates:
+        progress["done"] = True
+        return progress
+
+    tasks = []
+    for index in write_targets():
+        resp = client.update_by_query(  # type: ignore[union-attr]
+            index=index,
+            body={
+                "query": {"terms": {"currency": sorted(rates)}},
+                "script": {"source": SCRIPT, "lang": "painless", "params": {"rates": rates}},
+            },
+            conflicts="proceed",
+            slices="auto",
+            refresh=True,
+            wait_for_completion=False,
+        )
+        tasks.append(resp["task"])
+
+    while True:
+        statuses = [client.tasks.get(task_id=task_id) for task_id in tasks]  # type: ignore[union-attr]
+        for key in ("total", "updated", "noops"):
+            progress[key] = sum(s.get("task", {}).get("status", {}).get(key, 0) for s in statuses)
+        progress["failures"] = sum(len((s.get("response") or {}).get("failures", [])) for s in statuses)
+        progress["done"] = all(s.get("completed") for s in statuses)
+        cache.set(PROGRESS_KEY, progress, timeout=86400)
+        if progress["done"]:
+            break
+        time.sleep(POLL_INTERVAL)
+
+    if progress["updated"]:
+        # Cached pages and facets still show the old prices
+        bump_generation()
+    logger.info(
+        "Re-normalized prices for %s: %s updated, %s unchanged of %s",
+        ",".join(progress["currencies"]), progress["updated"], progress["noops"], progress["total"],
+    )
+    return progress
+
+
+def renormalize_progress() -> Dict[str, Any]:
+    from ..models import RenormalizeRequest
+
+    return {
+        "running": cache.get(LOCK_KEY) is not None,
+        "pending": sorted(set(RenormalizeRequest.objects.values_list("currency", flat=True))),
+        "last": cache.get(PROGRESS_KEY),
+    }
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from currency.models import Currency
+
+from .renormalize import renormalize_progress, request_renormalize
+
+
+class RenormalizeStatusView(APIView):
+    """
+    Progress of price re-normalization after rate changes.
+
+    POST queues a run for ``currencies`` (a list of currency codes), or for
+    all currencies when it is omitted.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(renormalize_progress())
+
+    def post(self, request):
+        currencies = request.data.get("currencies") or None
+        if currencies is not None:
+            known = set(Currency.objects.values_list("code", flat=True))
+            if not isinstance(currencies, list) or not all(isinstance(c, str) and c in known for c in currencies):
+                return Response({"detail": "currencies must be a list of known currency codes"}, status=400)
+        request_renormalize(currencies)
+        return Response(renormalize_progress(), status=202)
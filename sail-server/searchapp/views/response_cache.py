@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .generation import cache_generation
+
+STATS_PREFIX = "search:response_cache:stats"
+STATS_FIELDS = ("hits", "misses", "hit_us", "miss_us")
+
+
+def response_cache_key(filters: Dict[str, Any], **params: Any) -> str:
+    """
+    Canonical cache key for a search request.
+
+    Built from the parsed filters rather than the raw query string so that
+    parameter order, repeated vs. comma-separated values and case in ``q``
+    don't split the cache. The generation of the selected category (or the
+    global one) makes entries from before the last relevant index write
+    unreachable.
+    """
+    canonical = {
+        **{k: v for k, v in filters.items() if k not in {"attrs", "attrs_range"}},
+        "attrs": {k: sorted(set(v)) for k, v in filters.get("attrs", {}).items()},
+        "attrs_range": filters.get("attrs_range", {}),
+        **params,
+    }
+    if canonical.get("q"):
+        canonical["q"] = " ".join(str(canonical["q"]).lower().split())
+    digest = hashlib.sha1(json.dumps(canonical, sort_keys=True, default=str).encode()).hexdigest()
+    return f"search:response:{cache_generation(filters.get('category_slug'))}:{digest}"
+
+
+def cached_response(
+    key: str, compute: Callable[[], Optional[Dict[str, Any]]], ttl: Optional[int] = None
+) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Return ``(payload, hit)`` for ``key``, computing it at most once at a time.
+
+    On a miss only the caller that wins the lock runs ``compute``; concurrent
+    callers poll briefly for its result instead of stampeding the cluster,
+    and fall back to computing themselves if it doesn't show up in time.
+    ``compute`` returns None for responses that must not be cached.
+    """
+    ttl = int(ttl if ttl is not None else getattr(settings, "SEARCH_RESPONSE_CACHE_TTL", 30))
+    started = time.monotonic()
+    payload = cache.get(key)
+    owner = payload is None and cache.add(f"{key}:lock", 1, timeout=10)
+    if payload is None and not owner:
+        deadline = started + float(getattr(settings, "SEARCH_RESPONSE_CACHE_WAIT", 2))
+        while payload is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+            payload = cache.get(key)
+    if payload is not None:
+        _record("hits", "hit_us", started)
+        return payload, True
+
+    try:
+        payload = compute()
+        if payload is not None:
+            cache.set(key, payload, timeout=ttl)
+    finally:
+        if owner:
+            cache.delete(f"{key}:lock")
+    _record("misses", "miss_us", started)
+    return payload, False
+
+
+def _record(counter: str, latency: str, started: float) -> None:
+    _incr(counter, 1)
+    _incr(latency, int((time.monotonic() - started) * 1_000_000))
+
+
+def _incr(field: str, delta: int) -> None:
+    key = f"{STATS_PREFIX}:{field}"
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and average latencies (ms) of all processes since the last reset."""
+    values = cache.get_many([f"{STATS_PREFIX}:{f}" for f in STATS_FIELDS])
+    hits, misses, hit_us, miss_us = (int(values.get(f"{STATS_PREFIX}:{f}", 0)) for f in STATS_FIELDS)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else None,
+        "avg_hit_ms": round(hit_us / hits / 1000, 2) if hits else None,
+        "avg_miss_ms": round(miss_us / misses / 1000, 2) if misses else None,
+        "ttl": int(getattr(settings, "SEARCH_RESPONSE_CACHE_TTL", 30)),
+    }
+
+
+def reset_cache_stats() -> None:
+    cache.delete_many([f"{STATS_PREFIX}:{f}" for f in STATS_FIELDS])
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .response_cache import cache_stats, reset_cache_stats
+
+
+class SearchCacheStatsView(APIView):
+    """Search response cache counters for tuning TTLs; DELETE resets them."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+    def delete(self, request):
+        reset_cache_stats()
+        return Response(status=204)
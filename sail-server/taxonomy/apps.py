@@ -5,3 +5,5 @@ class TaxonomyConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "taxonomy"
 
+    def ready(self):  # pragma: no cover
+        from . import signals  # noqa: F401
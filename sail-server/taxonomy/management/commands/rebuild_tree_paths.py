@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from taxonomy.models import Category, Location
+from taxonomy.paths import rebuild_paths
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized path and depth of every category and location"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk UPDATE')
+
+    def handle(self, *args, **options):
+        for model in (Category, Location):
+            changed = rebuild_paths(model, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: {changed} rows updated"))
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.28 on 2026-10-16 23:12
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    # Frozen copy of taxonomy.paths.rebuild_paths as of this migration
+    for name in ("Category", "Location"):
+        model = apps.get_model("taxonomy", name)
+        rows = list(model.objects.values_list("id", "parent_id"))
+        ids = {pk for pk, _ in rows}
+        children = {}
+        for pk, parent_id in rows:
+            children.setdefault(parent_id if parent_id in ids else None, []).append(pk)
+        computed = {}
+        stack = [(pk, "", 0) for pk in children.get(None, [])]
+        while stack:
+            pk, prefix, depth = stack.pop()
+            path = f"{prefix}{pk:08d}/"
+            computed[pk] = (path, depth)
+            stack.extend((child, path, depth + 1) for child in children.get(pk, []))
+        # Nodes only reachable through a cycle become roots
+        for pk in ids - computed.keys():
+            computed[pk] = (f"{pk:08d}/", 0)
+        model.objects.bulk_update(
+            [model(pk=pk, path=path, depth=depth) for pk, (path, depth) in computed.items()],
+            ["path", "depth"],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxonomy', '0009_alter_location_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,21 @@
 from __future__ import annotations
 
-from django.db import models
+from django.db import models, transaction
 from django.utils.text import slugify
 
+from .paths import PATH_MAX_LENGTH, sync_path
+
+
+def _save_with_path(instance, save, *args, **kwargs) -> None:
+    update_fields = kwargs.get("update_fields")
+    if instance.path and update_fields is not None and "parent" not in update_fields:
+        save(*args, **kwargs)
+        return
+    # A move that would create a cycle is rolled back with the row itself
+    with transaction.atomic():
+        save(*args, **kwargs)
+        sync_path(instance)
+
 
 class Location(models.Model):
     class Kind(models.TextChoices):
@@ -21,6 +34,9 @@ class Location(models.Model):
     slug = models.SlugField(max_length=255)
     lat = models.FloatField(null=True, blank=True)
     lon = models.FloatField(null=True, blank=True)
+    # Materialized path and depth, maintained by save() (see taxonomy.paths)
+    path = models.CharField(max_length=PATH_MAX_LENGTH, blank=True, default="", db_index=True)
+    depth = models.PositiveSmallIntegerField(default=0)
 
     class Meta:
         indexes = [
@@ -31,10 +47,17 @@ class Location(models.Model):
     def __str__(self) -> str:  # pragma: no cover
         return f"{self.name} ({self.kind})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what search documents were built from (see taxonomy.signals)
+        instance._loaded_geo = tuple(instance.__dict__.get(f) for f in ("lat", "lon", "parent_id"))
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        _save_with_path(self, super().save, *args, **kwargs)
 
 
 class Category(models.Model):
@@ -52,6 +75,9 @@ class Category(models.Model):
     icon_image = models.ImageField(upload_to="category_icons/", null=True, blank=True)
     is_leaf = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
+    # Materialized path and depth, maintained by save() (see taxonomy.paths)
+    path = models.CharField(max_length=PATH_MAX_LENGTH, blank=True, default="", db_index=True)
+    depth = models.PositiveSmallIntegerField(default=0)
 
     class Meta:
         indexes = [
@@ -68,7 +94,7 @@ class Category(models.Model):
             self.slug = slugify(self.name)
         if self.parent and self.level == 0:
             self.level = (self.parent.level or 0) + 1
-        super().save(*args, **kwargs)
+        _save_with_path(self, super().save, *args, **kwargs)
 
 
 class Attribute(models.Model):
@@ -0,0 +1,78 @@
+"""
+Materialized paths for the Category and Location trees.
+
+Each row stores ``path``, the fixed-width ids of its ancestors and itself
+(``"00000003/00000017/"``), and ``depth`` (0 for roots). A subtree is then
+one indexed prefix predicate, ``path__startswith=node.path``, and sorting
+by path lists a tree depth-first.
+
+``Category.save`` / ``Location.save`` keep the columns current, including
+rewriting the whole subtree when a node moves; ``rebuild_paths`` (and the
+``rebuild_tree_paths`` command) recomputes them from the parent links.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Concat, Substr
+
+SEGMENT_WIDTH = 8
+SEPARATOR = "/"
+PATH_MAX_LENGTH = 255
+
+
+def path_segment(pk: int) -> str:
+    return f"{pk:0{SEGMENT_WIDTH}d}{SEPARATOR}"
+
+
+def sync_path(instance) -> None:
+    """Bring ``instance``'s path (and its descendants' if it moved) in line with its parent."""
+    model = type(instance)
+    parent_path, parent_depth = "", -1
+    if instance.parent_id:
+        parent_path, parent_depth = model.objects.filter(pk=instance.parent_id).values_list("path", "depth").get()
+    if instance.path and parent_path.startswith(instance.path):
+        raise ValueError("Cannot move a node under itself or one of its descendants")
+    path = parent_path + path_segment(instance.pk)
+    depth = parent_depth + 1
+    if path == instance.path and depth == instance.depth:
+        return
+    if instance.path:
+        # Moved: re-root the whole subtree in one statement
+        old_path = instance.path
+        model.objects.filter(path__startswith=old_path).update(
+            path=Concat(Value(path), Substr("path", len(old_path) + 1), output_field=CharField()),
+            depth=F("depth") + (depth - instance.depth),
+        )
+    else:
+        model.objects.filter(pk=instance.pk).update(path=path, depth=depth)
+    instance.path, instance.depth = path, depth
+
+
+def compute_paths(rows: List[Tuple[int, Optional[int]]]) -> Dict[int, Tuple[str, int]]:
+    """(path, depth) per id from (id, parent_id) pairs; rows under a cycle or missing parent become roots."""
+    children: Dict[Optional[int], List[int]] = {}
+    ids = {pk for pk, _ in rows}
+    for pk, parent_id in rows:
+        children.setdefault(parent_id if parent_id in ids else None, []).append(pk)
+    result: Dict[int, Tuple[str, int]] = {}
+    stack = [(pk, "", 0) for pk in children.get(None, [])]
+    while stack:
+        pk, prefix, depth = stack.pop()
+        path = prefix + path_segment(pk)
+        result[pk] = (path, depth)
+        stack.extend((child, path, depth + 1) for child in children.get(pk, []))
+    # Nodes only reachable through a cycle are left out above; treat them as roots
+    for pk in ids - result.keys():
+        result[pk] = (path_segment(pk), 0)
+    return result
+
+
+def rebuild_paths(model, batch_size: int = 1000) -> int:
+    """Recompute path and depth of every row of ``model``; returns the number of rows changed."""
+    current = {pk: (path, depth) for pk, path, depth in model.objects.values_list("id", "path", "depth")}
+    computed = compute_paths(list(model.objects.values_list("id", "parent_id")))
+    changed = [model(pk=pk, path=path, depth=depth) for pk, (path, depth) in computed.items() if current.get(pk) != (path, depth)]
+    model.objects.bulk_update(changed, ["path", "depth"], batch_size=batch_size)
+    return len(changed)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from .models import Attribute, Category, Location
+from .tree import get_tree
 
 
 class AttributeSerializer(serializers.ModelSerializer):
@@ -39,6 +40,8 @@ class CategoryNodeSerializer(serializers.Serializer):
     order = serializers.IntegerField()
     icon = serializers.CharField(required=False, allow_blank=True)
     icon_url = serializers.CharField(required=False, allow_blank=True)
+    # Only with ?with_counts=1
+    listing_count = serializers.IntegerField(required=False)
     children = serializers.ListField(child=serializers.DictField(), allow_empty=True)
 
 
@@ -51,7 +54,9 @@ class LocationSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "name_ru", "name_uz", "slug", "kind", "lat", "lon", "has_children", "parent"]
 
     def get_has_children(self, obj):  # pragma: no cover
-        return obj.children.exists()
+        # From the taxonomy snapshot instead of one query per row
+        node = get_tree().location(obj.id)
+        return bool(node.children) if node else obj.children.exists()
 
     def get_name(self, obj):  # pragma: no cover
         request = self.context.get("request") if self.context else None
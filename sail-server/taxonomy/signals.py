@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Attribute, Category, Location
+from .tree import bump_version
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+def on_taxonomy_changed(sender, **kwargs):
+    # Bump now for this connection's own reads, and again after commit so no
+    # other process can reload the pre-commit data and keep it
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+@receiver(post_save, sender=Location)
+def on_location_geo_changed(sender, instance, created, **kwargs):
+    # Listings without coordinates are indexed at a location centroid, and every
+    # document carries the location path: rebuild them when either changes
+    loaded = getattr(instance, "_loaded_geo", None)
+    if created or loaded is None:
+        return
+    lat, lon, parent_id = loaded
+    moved = parent_id != instance.parent_id
+    if not moved and (lat, lon) == (instance.lat, instance.lon):
+        return
+    from searchapp.tasks import task_reindex_location
+    from searchapp.views.opensearch_client import get_client
+
+    if get_client() is None:
+        return
+    location_id, fallback_only = instance.id, not moved
+    transaction.on_commit(lambda: task_reindex_location.delay(location_id, fallback_only))
+    instance._loaded_geo = (instance.lat, instance.lon, instance.parent_id)
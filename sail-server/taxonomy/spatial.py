@@ -0,0 +1,114 @@
+"""
+Nearest-location lookups over the taxonomy snapshot.
+
+Location coordinates are projected onto the unit sphere and put in one
+KD-tree per location kind, so a k-nearest query is logarithmic in the
+number of locations and euclidean distance in 3-D orders points exactly
+like great-circle distance. Distances returned are haversine kilometres.
+
+The index is built from ``taxonomy.tree.get_tree()`` and rebuilt when the
+snapshot is reloaded; ancestors come from the same snapshot, so a lookup
+never touches the database. Without scipy, queries fall back to a linear
+haversine scan.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .tree import LocationNode, TaxonomyTree, get_tree
+
+try:
+    import numpy as np
+    from scipy.spatial import cKDTree
+except Exception:  # pragma: no cover - optional in some envs
+    np = None  # type: ignore
+    cKDTree = None  # type: ignore
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _unit_xyz(lat: float, lon: float) -> Tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+def has_coordinates(node: LocationNode) -> bool:
+    return node.lat is not None and node.lon is not None and not (node.lat == 0 and node.lon == 0)
+
+
+class LocationIndex:
+    """Immutable; built for one taxonomy snapshot (identified by its fingerprint)."""
+
+    def __init__(self, fingerprint: str, locations: Iterable[LocationNode]):
+        self.fingerprint = fingerprint
+        self._by_kind: Dict[str, List[LocationNode]] = {}
+        for node in locations:
+            if has_coordinates(node):
+                self._by_kind.setdefault(node.kind, []).append(node)
+        self._trees = {}
+        if cKDTree is not None:
+            self._trees = {
+                kind: cKDTree(np.array([_unit_xyz(n.lat, n.lon) for n in nodes]))
+                for kind, nodes in self._by_kind.items()
+            }
+
+    @property
+    def kinds(self) -> List[str]:
+        return sorted(self._by_kind)
+
+    def __len__(self) -> int:
+        return sum(len(nodes) for nodes in self._by_kind.values())
+
+    def nearest(
+        self, lat: float, lon: float, k: int = 1, kinds: Optional[Iterable[str]] = None
+    ) -> List[Tuple[LocationNode, float]]:
+        """
+        The ``k`` locations closest to (lat, lon) with their distance in km, closest first.
+
+        ``kinds`` limits the search to those ``Location.Kind`` values (all if None).
+        """
+        k = max(1, k)
+        kinds = self.kinds if kinds is None else [kind for kind in kinds if kind in self._by_kind]
+        candidates: List[LocationNode] = []
+        for kind in kinds:
+            nodes = self._by_kind[kind]
+            if kind in self._trees:
+                count = min(k, len(nodes))
+                _, idx = self._trees[kind].query(_unit_xyz(lat, lon), k=count)
+                candidates.extend(nodes[i] for i in np.atleast_1d(idx))
+            else:
+                candidates.extend(nodes)
+        return heapq.nsmallest(
+            k,
+            ((node, haversine_km(lat, lon, node.lat, node.lon)) for node in candidates),
+            key=lambda pair: pair[1],
+        )
+
+
+_lock = threading.Lock()
+_state: Dict[str, Optional[LocationIndex]] = {"index": None}
+
+
+def get_location_index(tree: Optional[TaxonomyTree] = None) -> LocationIndex:
+    """The index for the current taxonomy snapshot, built on first use after each reload."""
+    tree = tree or get_tree()
+    index = _state["index"]
+    if index is not None and index.fingerprint == tree.fingerprint:
+        return index
+    with _lock:
+        index = _state["index"]
+        if index is None or index.fingerprint != tree.fingerprint:
+            index = LocationIndex(tree.fingerprint, tree.locations.values())
+            _state["index"] = index
+        return index
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from taxonomy.models import Attribute, Category, Location
+from taxonomy.tree import get_tree
+
+
+class TaxonomyTreeTests(APITestCase):
+    def setUp(self):
+        self.vehicles = Category.objects.create(name="Vehicles", slug="vehicles")
+        self.cars = Category.objects.create(name="Cars", slug="cars", parent=self.vehicles)
+        self.sedans = Category.objects.create(name="Sedans", slug="sedans", parent=self.cars, is_leaf=True)
+        Attribute.objects.create(category=self.vehicles, key="year", label="Year", type=Attribute.Type.NUMBER)
+        Attribute.objects.create(category=self.sedans, key="doors", label="Doors", type=Attribute.Type.NUMBER)
+        self.region = Location.objects.create(name="Tashkent Region", slug="tashkent-region", kind=Location.Kind.REGION)
+        self.city = Location.objects.create(
+            name="Chirchiq", name_uz="Chirchiq", slug="chirchiq", kind=Location.Kind.CITY, parent=self.region
+        )
+
+    def test_paths_descendants_and_inherited_attributes(self):
+        tree = get_tree()
+        with self.assertNumQueries(0):
+            self.assertEqual(tree.category_path_slugs(self.sedans.id), ["vehicles", "cars", "sedans"])
+            self.assertEqual(
+                tree.category_descendants(self.vehicles.id), {self.vehicles.id, self.cars.id, self.sedans.id}
+            )
+            self.assertEqual([a.key for a in tree.category_attributes(self.sedans.id)], ["doors", "year"])
+            self.assertEqual([a.key for a in tree.category_attributes(self.cars.id)], ["year"])
+            self.assertEqual(tree.location_path_names(self.city.id, "uz"), ["Tashkent Region", "Chirchiq"])
+
+    def test_snapshot_reloads_after_change(self):
+        get_tree()
+        Category.objects.create(name="Trucks", slug="trucks", parent=self.vehicles)
+        self.assertEqual(get_tree().category_path_slugs(Category.objects.get(slug="trucks").id), ["vehicles", "trucks"])
+
+    def test_snapshot_expires_without_bump(self):
+        from django.test import override_settings
+
+        tree = get_tree()
+        # A change whose version bump never reached this process
+        Category.objects.filter(pk=self.cars.pk).update(slug="automobiles")
+        with override_settings(TAXONOMY_VERSION_CHECK_INTERVAL=0, TAXONOMY_MAX_SNAPSHOT_AGE=0):
+            reloaded = get_tree()
+        self.assertEqual(reloaded.version, tree.version)
+        self.assertNotEqual(reloaded.fingerprint, tree.fingerprint)
+        self.assertEqual(reloaded.category_path_slugs(self.sedans.id), ["vehicles", "automobiles", "sedans"])
+
+    def test_category_attributes_view_uses_snapshot(self):
+        get_tree()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("category-attributes", args=[self.sedans.id]))
+        self.assertEqual([a["key"] for a in response.json()], ["doors", "year"])
+
+    def test_reverse_geocode_uses_spatial_index(self):
+        self.region.lat, self.region.lon = 41.3, 69.3
+        self.region.save()
+        self.city.lat, self.city.lon = 41.47, 69.58
+        self.city.save()
+        Location.objects.create(
+            name="Angren", slug="angren", kind=Location.Kind.CITY, parent=self.region, lat=41.02, lon=70.14
+        )
+        get_tree()
+        url = reverse("reverse-geocode")
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"lat": 41.31, "lon": 69.28, "k": 2})
+        data = response.json()
+        # The region centroid is closer, but cities are preferred
+        self.assertEqual(data["slug"], "chirchiq")
+        self.assertEqual(data["path"], "Tashkent Region > Chirchiq")
+        self.assertAlmostEqual(data["distance"], 30.7, delta=0.5)
+        self.assertEqual([c["slug"] for c in data["candidates"]], ["chirchiq", "angren"])
+        self.assertEqual(self.client.get(url, {"lat": 41.31, "lon": 69.28, "kind": "region"}).json()["slug"], "tashkent-region")
+        for lat, lon in (("nan", "nan"), ("inf", "1"), ("1", "-inf"), ("91", "69"), ("41", "181")):
+            self.assertEqual(self.client.get(url, {"lat": lat, "lon": lon}).status_code, 400, (lat, lon))
+
+    def test_materialized_paths_follow_moves(self):
+        from django.contrib.auth import get_user_model
+        from listings.models import Listing
+
+        self.sedans.refresh_from_db()
+        self.assertEqual(self.sedans.depth, 2)
+        self.assertTrue(self.sedans.path.startswith(self.vehicles.path + self.cars.path[-9:]))
+        user = get_user_model().objects.create_user(username="seller", password="pass123")
+        listing = Listing.objects.create(user=user, category=self.sedans, location=self.city, title="Sedan")
+        self.assertEqual(list(Listing.objects.in_category("vehicles")), [listing])
+        self.assertEqual(list(Listing.objects.in_location(self.region)), [listing])
+
+        transport = Category.objects.create(name="Transport", slug="transport")
+        self.cars.parent = transport
+        self.cars.save()
+        self.sedans.refresh_from_db()
+        self.assertEqual(self.sedans.path, transport.path + self.cars.path[-9:] + self.sedans.path[-9:])
+        self.assertFalse(Listing.objects.in_category("vehicles").exists())
+        self.assertEqual(list(Listing.objects.in_category(transport)), [listing])
+        self.assertFalse(Listing.objects.in_category("unknown").exists())
+        Location.objects.create(name="Chirchiq", slug="chirchiq", kind=Location.Kind.DISTRICT, parent=self.region)
+        with self.assertRaises(ValueError):
+            Listing.objects.in_location("chirchiq")
+        with self.assertRaises(ValueError):
+            Listing.objects.in_category(Category(pk=999, slug="unsaved"))
+
+        transport.parent = self.sedans
+        with self.assertRaises(ValueError):
+            transport.save()
+
+    def test_taxonomy_endpoints_are_prerendered_with_etags(self):
+        url = reverse("categories-tree")
+        first = self.client.get(url, {"lang": "uz"})
+        etag = first["ETag"]
+        self.assertEqual(first["Cache-Control"], "public, no-cache")
+        with self.assertNumQueries(0):
+            again = self.client.get(url, {"lang": "uz"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(self.client.get(url, {"lang": "uz"}).content, first.content)
+
+        locations = self.client.get(reverse("locations"))
+        self.assertEqual([(l["slug"], l["has_children"]) for l in locations.json()], [("tashkent-region", True)])
+
+        # Any taxonomy change produces a new payload
+        Category.objects.create(name="Boats", slug="boats", parent=self.vehicles)
+        changed = self.client.get(url, {"lang": "uz"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+        self.assertIn("boats", [c["slug"] for c in changed.json()[0]["children"]])
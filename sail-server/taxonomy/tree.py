@@ -0,0 +1,270 @@
+"""
+Process-local snapshot of the taxonomy (categories, locations, attributes).
+
+The trees are small and change rarely but are read on almost every request
+and for every indexed document, so they are loaded whole (one query per
+model) and kept in memory. Ancestor paths, descendant sets and the
+inherited attribute schema of each category are precomputed, so lookups
+never touch the database.
+
+Any change to Category, Location or Attribute bumps a version number in the
+shared cache (see ``taxonomy.signals``); each process notices the new
+version within ``TAXONOMY_VERSION_CHECK_INTERVAL`` seconds and reloads.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Attribute, Category, Location
+
+VERSION_KEY = "taxonomy:version"
+
+
+def _localized(name: str, name_ru: Optional[str], name_uz: Optional[str], lang: str) -> str:
+    if lang == "uz":
+        return name_uz or name or name_ru or ""
+    return name_ru or name or name_uz or ""
+
+
+@dataclass(slots=True)
+class CategoryNode:
+    id: int
+    parent_id: Optional[int]
+    slug: str
+    name: str
+    name_ru: str
+    name_uz: str
+    level: int
+    is_leaf: bool
+    order: int
+    icon: str
+    icon_url: str
+    # Root → self
+    path_ids: Tuple[int, ...] = ()
+    children: List[int] = field(default_factory=list)
+
+    def display_name(self, lang: str) -> str:
+        return _localized(self.name, self.name_ru, self.name_uz, lang)
+
+
+@dataclass(slots=True)
+class LocationNode:
+    id: int
+    parent_id: Optional[int]
+    kind: str
+    slug: str
+    name: str
+    name_ru: Optional[str]
+    name_uz: Optional[str]
+    lat: Optional[float]
+    lon: Optional[float]
+    # Root → self
+    path_ids: Tuple[int, ...] = ()
+    children: List[int] = field(default_factory=list)
+
+    def display_name(self, lang: str) -> str:
+        return _localized(self.name, self.name_ru, self.name_uz, lang)
+
+
+class TaxonomyTree:
+    """Immutable once built; a reload builds a new instance and swaps it in."""
+
+    def __init__(self, version: int, categories, locations, attributes):
+        self.version = version
+        # Identifies the contents: two snapshots with equal fingerprints hold the same data,
+        # whatever their version (a reload after TAXONOMY_MAX_SNAPSHOT_AGE keeps the version)
+        self.fingerprint = _fingerprint(categories, locations, attributes)
+        self.categories: Dict[int, CategoryNode] = categories
+        self.categories_by_slug: Dict[str, CategoryNode] = {c.slug: c for c in categories.values()}
+        self.locations: Dict[int, LocationNode] = locations
+        self._category_descendants = _descendants(categories)
+        self._location_descendants = _descendants(locations)
+
+        own: Dict[int, List[Attribute]] = {}
+        for attr in attributes:
+            own.setdefault(attr.category_id, []).append(attr)
+        # Attributes declared on a category apply to its whole subtree
+        self._category_attributes: Dict[int, List[Attribute]] = {
+            cid: sorted(
+                (a for pid in node.path_ids for a in own.get(pid, [])),
+                key=lambda a: a.key,
+            )
+            for cid, node in categories.items()
+        }
+
+    @classmethod
+    def load(cls, version: int) -> "TaxonomyTree":
+        categories = {
+            c.id: CategoryNode(
+                id=c.id,
+                parent_id=c.parent_id,
+                slug=c.slug,
+                name=c.name,
+                name_ru=c.name_ru,
+                name_uz=c.name_uz,
+                level=c.level,
+                is_leaf=c.is_leaf,
+                order=c.order,
+                icon=c.icon,
+                icon_url=c.icon_image.url if c.icon_image else "",
+            )
+            for c in Category.objects.all()
+        }
+        locations = {
+            l.id: LocationNode(
+                id=l.id,
+                parent_id=l.parent_id,
+                kind=l.kind,
+                slug=l.slug,
+                name=l.name,
+                name_ru=l.name_ru,
+                name_uz=l.name_uz,
+                lat=l.lat,
+                lon=l.lon,
+            )
+            for l in Location.objects.all()
+        }
+        _link(categories)
+        _link(locations)
+        for children in (n.children for n in categories.values()):
+            children.sort(key=lambda cid: (categories[cid].order, categories[cid].name))
+        return cls(version, categories, locations, list(Attribute.objects.all()))
+
+    # Categories
+
+    def category(self, category_id: Optional[int]) -> Optional[CategoryNode]:
+        return self.categories.get(category_id) if category_id else None
+
+    def category_ancestors(self, category_id: Optional[int]) -> List[CategoryNode]:
+        """The category and its ancestors, root first."""
+        node = self.category(category_id)
+        return [self.categories[i] for i in node.path_ids] if node else []
+
+    def category_path_slugs(self, category_id: Optional[int]) -> List[str]:
+        return [n.slug for n in self.category_ancestors(category_id)]
+
+    def category_path_names(self, category_id: Optional[int], lang: str) -> List[str]:
+        return [n.display_name(lang) for n in self.category_ancestors(category_id)]
+
+    def category_descendants(self, category_id: int) -> FrozenSet[int]:
+        """Ids of the category and everything below it."""
+        return self._category_descendants.get(category_id, frozenset())
+
+    def category_roots(self) -> List[CategoryNode]:
+        roots = [c for c in self.categories.values() if c.parent_id not in self.categories]
+        return sorted(roots, key=lambda c: (c.order, c.name))
+
+    def category_attributes(self, category_id: Optional[int]) -> List[Attribute]:
+        """Attributes of the category including inherited ones, sorted by key."""
+        return self._category_attributes.get(category_id, []) if category_id else []
+
+    # Locations
+
+    def location(self, location_id: Optional[int]) -> Optional[LocationNode]:
+        return self.locations.get(location_id) if location_id else None
+
+    def location_ancestors(self, location_id: Optional[int]) -> List[LocationNode]:
+        """The location and its ancestors, root first."""
+        node = self.location(location_id)
+        return [self.locations[i] for i in node.path_ids] if node else []
+
+    def location_path_slugs(self, location_id: Optional[int]) -> List[str]:
+        return [n.slug for n in self.location_ancestors(location_id)]
+
+    def location_path_names(self, location_id: Optional[int], lang: str) -> List[str]:
+        return [n.display_name(lang) for n in self.location_ancestors(location_id)]
+
+    def location_descendants(self, location_id: int) -> FrozenSet[int]:
+        """Ids of the location and everything below it."""
+        return self._location_descendants.get(location_id, frozenset())
+
+
+def _link(nodes) -> None:
+    """Fill children lists and root → self id paths of an adjacency-list tree."""
+    for node in nodes.values():
+        if node.parent_id in nodes:
+            nodes[node.parent_id].children.append(node.id)
+    for node in nodes.values():
+        path = []
+        current, seen = node, set()
+        # `seen` guards against cycles in bad data
+        while current is not None and current.id not in seen:
+            seen.add(current.id)
+            path.append(current.id)
+            current = nodes.get(current.parent_id)
+        node.path_ids = tuple(reversed(path))
+
+
+def _fingerprint(categories, locations, attributes) -> str:
+    digest = hashlib.sha1()
+    for nodes in (categories, locations):
+        for node_id in sorted(nodes):
+            node = nodes[node_id]
+            digest.update(repr([getattr(node, f) for f in node.__slots__ if f not in ("children", "path_ids")]).encode())
+    for attr in sorted(attributes, key=lambda a: a.pk):
+        digest.update(
+            repr((
+                attr.pk, attr.category_id, attr.key, attr.label, attr.label_ru, attr.label_uz, attr.type,
+                attr.unit, attr.options, attr.is_indexed, attr.is_required, attr.min_number, attr.max_number,
+            )).encode()
+        )
+    return digest.hexdigest()
+
+
+def _descendants(nodes) -> Dict[int, FrozenSet[int]]:
+    below: Dict[int, set] = {i: set() for i in nodes}
+    for node in nodes.values():
+        for ancestor_id in node.path_ids:
+            below[ancestor_id].add(node.id)
+    return {i: frozenset(ids) for i, ids in below.items()}
+
+
+_lock = threading.Lock()
+_state = {"tree": None, "checked_at": 0.0, "loaded_at": 0.0}
+
+
+def current_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a version lost to eviction never repeats
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY, 0)
+    return int(version)
+
+
+def bump_version() -> None:
+    """Make every process reload its snapshot; called when the taxonomy changes."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+    # This process doesn't wait for the next version check
+    _state["checked_at"] = 0.0
+
+
+def get_tree() -> TaxonomyTree:
+    """Return the current snapshot, reloading it if the shared version moved on."""
+    tree: Optional[TaxonomyTree] = _state["tree"]
+    now = time.monotonic()
+    interval = float(getattr(settings, "TAXONOMY_VERSION_CHECK_INTERVAL", 5))
+    if tree is not None and now - _state["checked_at"] < interval:
+        return tree
+    version = current_version()
+    _state["checked_at"] = now
+    max_age = float(getattr(settings, "TAXONOMY_MAX_SNAPSHOT_AGE", 300))
+    if tree is not None and tree.version == version and now - _state["loaded_at"] < max_age:
+        return tree
+    with _lock:
+        tree = _state["tree"]
+        if tree is None or tree.version != version or now - _state["loaded_at"] >= max_age:
+            tree = TaxonomyTree.load(version)
+            _state["tree"] = tree
+            _state["loaded_at"] = now
+        return tree
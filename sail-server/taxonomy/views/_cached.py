@@ -0,0 +1,60 @@
+"""
+Pre-rendered taxonomy responses.
+
+The category tree, attribute lists and location lists change rarely but are
+requested on almost every page. Each distinct response (per language and
+parameters) is rendered to JSON once per taxonomy snapshot and kept in the
+shared cache together with a strong ETag, the hash of its bytes. Keys carry
+the snapshot's content fingerprint, so a taxonomy change (see
+``taxonomy.signals``) makes every older blob unreachable without deleting
+anything.
+
+By default clients must revalidate on every use (``no-cache``); an
+unchanged taxonomy costs them an empty 304. ``TAXONOMY_CACHE_MAX_AGE``
+lets browsers and CDNs skip revalidation for that many seconds, and
+taxonomy edits then reach them only after that delay.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Callable, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from ..tree import get_tree
+
+PAYLOAD_TTL = 86400
+
+
+def cached_json(request, name: str, build: Callable[[], Any]) -> HttpResponse:
+    """
+    Serve ``build()`` as JSON, rendered at most once per taxonomy snapshot.
+
+    ``name`` must identify the response completely (endpoint, language,
+    parameters). Answers ``If-None-Match`` revalidations with 304.
+    """
+    key = f"taxonomy:payload:{get_tree().fingerprint}:{name}"
+    entry: Tuple[str, bytes] = cache.get(key)
+    if entry is None:
+        body = JSONRenderer().render(build())
+        entry = (f'"{hashlib.sha1(body).hexdigest()}"', body)
+        cache.set(key, entry, timeout=PAYLOAD_TTL)
+    etag, body = entry
+
+    # If-None-Match uses the weak comparison, so a W/ prefix still matches
+    client_etags = {tag.removeprefix("W/") for tag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))}
+    if etag in client_etags or "*" in client_etags:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    max_age = int(getattr(settings, "TAXONOMY_CACHE_MAX_AGE", 0))
+    response["Cache-Control"] = f"public, max-age={max_age}" if max_age > 0 else "public, no-cache"
+    # The language may come from the Accept-Language header
+    patch_vary_headers(response, ["Accept-Language"])
+    return response
@@ -7,3 +7,24 @@ def _lang_from_request(request) -> str:
     if header.startswith("uz"):
         return "uz"
     return "ru"
+
+
+def _with_counts(request) -> bool:
+    # Listing counts are opt-in: ?with_counts=1
+    return (request.query_params.get("with_counts") or "").lower() in {"1", "true", "yes"}
+
+
+def _location_data(node, name_lang: str) -> dict:
+    # Same shape as LocationSerializer, built from the taxonomy snapshot
+    return {
+        "id": node.id,
+        "name": node.display_name(name_lang),
+        "name_ru": node.name_ru,
+        "name_uz": node.name_uz,
+        "slug": node.slug,
+        "kind": node.kind,
+        "lat": node.lat,
+        "lon": node.lon,
+        "has_children": bool(node.children),
+        "parent": node.parent_id,
+    }
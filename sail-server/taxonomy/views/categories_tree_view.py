@@ -1,11 +1,36 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..models import Category
+from listings.rollups import category_counts
+
 from ..serializers import CategoryNodeSerializer
-from ._utils import _lang_from_request
+from ..tree import CategoryNode, TaxonomyTree, get_tree
+from ._cached import cached_json
+from ._utils import _lang_from_request, _with_counts
+
+
+def _sorted(nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(nodes, key=lambda n: (n.get("order", 0), n.get("name", "")))
+
+
+def _node(
+    tree: TaxonomyTree, c: CategoryNode, lang: str, recursive: bool, counts: Optional[Dict[int, int]] = None
+) -> Dict[str, Any]:
+    node = {
+        "id": c.id,
+        "name": c.display_name(lang),
+        "slug": c.slug,
+        "icon": c.icon,
+        "icon_url": c.icon_url,
+        "is_leaf": c.is_leaf,
+        "order": c.order,
+        "children": _sorted([_node(tree, tree.categories[i], lang, True, counts) for i in c.children]) if recursive else [],
+    }
+    if counts is not None:
+        node["listing_count"] = counts.get(c.id, 0)
+    return node
 
 
 class CategoriesTreeView(APIView):
@@ -13,57 +38,33 @@ class CategoriesTreeView(APIView):
     permission_classes: list = []
 
     def get(self, request):
-        parent_id = request.query_params.get("parent_id")
         lang = _lang_from_request(request)
-        qs = Category.objects.all().order_by("order", "name")
-        if parent_id:
-            try:
-                pid = int(parent_id)
-                qs = qs.filter(parent_id=pid)
-                # Only return direct children as a flat list
-                data = [
-                    {
-                        "id": c.id,
-                        "name": (c.name_uz if lang == "uz" else c.name_ru) or c.name,
-                        "slug": c.slug,
-                        "icon": c.icon,
-                        "icon_url": (c.icon_image.url if c.icon_image else ""),
-                        "is_leaf": c.is_leaf,
-                        "order": c.order,
-                        "children": [],
-                    }
-                    for c in qs
-                ]
-                return Response(CategoryNodeSerializer(data, many=True).data)
-            except ValueError:
-                pass
+        try:
+            parent_id = int(request.query_params.get("parent_id") or 0) or None
+        except ValueError:
+            parent_id = None
+        if _with_counts(request):
+            # Counts change with every listing, so these are never pre-rendered.
+            # Active listings per node, descendants included: one read of the
+            # rollup table, limited to the children when only those are returned
+            ids = None
+            if parent_id:
+                parent = get_tree().category(parent_id)
+                ids = parent.children if parent else []
+            return Response(self._data(lang, parent_id, category_counts(ids)))
+        return cached_json(request, f"categories:{lang}:{parent_id or ''}", lambda: self._data(lang, parent_id))
 
-        # Build full tree from roots
-        categories = list(qs)
-        nodes: Dict[int, Dict[str, Any]] = {}
-        roots: List[Dict[str, Any]] = []
-        for c in categories:
-            nodes[c.id] = {
-                "id": c.id,
-                "name": (c.name_uz if lang == "uz" else c.name_ru) or c.name,
-                "slug": c.slug,
-                "icon": c.icon,
-                "icon_url": (c.icon_image.url if c.icon_image else ""),
-                "is_leaf": c.is_leaf,
-                "order": c.order,
-                "children": [],
-            }
-        for c in categories:
-            node = nodes[c.id]
-            if c.parent_id and c.parent_id in nodes:
-                nodes[c.parent_id]["children"].append(node)
-            else:
-                roots.append(node)
-        # Ensure child order
-        def sort_children(arr: List[Dict[str, Any]]):
-            arr.sort(key=lambda n: (n.get("order", 0), n.get("name", "")))
-            for n in arr:
-                sort_children(n["children"])  # type: ignore
+    def _data(self, lang: str, parent_id: Optional[int], counts: Optional[Dict[int, int]] = None):
+        tree = get_tree()
+        if parent_id:
+            parent = tree.category(parent_id)
+            # Only return direct children as a flat list
+            data = [
+                _node(tree, tree.categories[i], lang, False, counts)
+                for i in (parent.children if parent else [])
+            ]
+            return CategoryNodeSerializer(data, many=True).data
 
-        sort_children(roots)
-        return Response(CategoryNodeSerializer(roots, many=True).data)
+        # Build full tree from roots, ordered by (order, localized name) on every level
+        roots: List[Dict[str, Any]] = _sorted([_node(tree, c, lang, True, counts) for c in tree.category_roots()])
+        return CategoryNodeSerializer(roots, many=True).data
@@ -1,9 +1,23 @@
+from typing import Any, Dict, List, Optional
+
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..models import Location
-from ..serializers import LocationSerializer
-from ._utils import _lang_from_request
+from listings.rollups import location_counts
+
+from ..tree import get_tree
+from ._cached import cached_json
+from ._utils import _location_data, _with_counts
+
+
+def _children(parent_id: Optional[int], name_lang: str) -> List[Dict[str, Any]]:
+    tree = get_tree()
+    if parent_id:
+        parent = tree.location(parent_id)
+        nodes = [tree.locations[i] for i in parent.children] if parent else []
+    else:
+        nodes = [n for n in tree.locations.values() if n.parent_id is None]
+    return [_location_data(n, name_lang) for n in sorted(nodes, key=lambda n: n.name)]
 
 
 class LocationsView(APIView):
@@ -12,13 +26,22 @@ class LocationsView(APIView):
 
     def get(self, request):
         parent_id = request.query_params.get("parent_id")
-        lang = _lang_from_request(request)
+        # Names follow ?lang only, as LocationSerializer does
+        name_lang = "uz" if request.query_params.get("lang") == "uz" else "ru"
         if parent_id:
             try:
-                pid = int(parent_id)
+                pid: Optional[int] = int(parent_id)
             except ValueError:
                 return Response([], status=200)
-            qs = Location.objects.filter(parent_id=pid).order_by("name")
         else:
-            qs = Location.objects.filter(parent__isnull=True).order_by("name")
-        return Response(LocationSerializer(qs, many=True, context={"request": request}).data)
+            pid = None
+        if _with_counts(request):
+            # Counts change with every listing, so these are never pre-rendered.
+            # Active listings per node, descendants included: one read of the
+            # rollup table, for the returned nodes only
+            data = _children(pid, name_lang)
+            counts = location_counts([row["id"] for row in data])
+            for row in data:
+                row["listing_count"] = counts.get(row["id"], 0)
+            return Response(data)
+        return cached_json(request, f"locations:{name_lang}:{pid or ''}", lambda: _children(pid, name_lang))
@@ -1,17 +1,25 @@
-from math import sqrt
+import math
 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from ..models import Location
-from ..serializers import LocationSerializer
-from ._utils import _lang_from_request
+from ..spatial import get_location_index
+from ..tree import get_tree
+from ._utils import _lang_from_request, _location_data
+
+
+DEFAULT_KINDS = (Location.Kind.CITY, Location.Kind.DISTRICT)
+MAX_K = 20
 
 
 class ReverseGeocodeView(APIView):
     """
     Reverse geocode: given lat/lon coordinates, find the nearest location.
     Returns the most specific location (city/district) if available.
+
+    ``kind`` (comma-separated, or ``any``) picks the location kinds to match
+    and ``k`` > 1 adds the k nearest as ``candidates``.
     """
     authentication_classes: list = []
     permission_classes: list = []
@@ -22,51 +30,48 @@ class ReverseGeocodeView(APIView):
             lon = float(request.query_params.get("lon", 0))
         except (TypeError, ValueError):
             return Response({"error": "Invalid coordinates"}, status=400)
+        # float() accepts nan/inf, which the KD-tree and haversine reject
+        if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+            return Response({"error": "Invalid coordinates"}, status=400)
 
         if lat == 0 and lon == 0:
             return Response({"error": "Coordinates required"}, status=400)
 
         lang = _lang_from_request(request)
-
-        # Find locations with coordinates
-        locations_with_coords = Location.objects.filter(
-            lat__isnull=False,
-            lon__isnull=False
-        ).exclude(lat=0, lon=0)
-
-        if not locations_with_coords.exists():
+        tree = get_tree()
+        index = get_location_index(tree)
+        if not len(index):
             return Response({"error": "No locations with coordinates available"}, status=404)
 
-        # Calculate distances and find nearest
-        nearest = None
-        min_distance = float('inf')
-
-        for loc in locations_with_coords:
-            # Simple Euclidean distance (good enough for city-level matching)
-            distance = sqrt((loc.lat - lat) ** 2 + (loc.lon - lon) ** 2)
-            if distance < min_distance:
-                min_distance = distance
-                nearest = loc
+        kind_param = (request.query_params.get("kind") or "").upper()
+        if kind_param == "ANY":
+            kinds = None
+        elif kind_param:
+            kinds = [k for k in kind_param.split(",") if k]
+        else:
+            # The most specific kinds that have coordinates at all
+            kinds = [k for k in DEFAULT_KINDS if k in index.kinds] or None
+        try:
+            k = min(max(int(request.query_params.get("k", 1)), 1), MAX_K)
+        except (TypeError, ValueError):
+            k = 1
 
-        if not nearest:
+        matches = index.nearest(lat, lon, k=k, kinds=kinds)
+        if not matches:
             return Response({"error": "No nearby location found"}, status=404)
 
-        # Build the location path (from root to leaf)
-        path_parts = []
-        current = nearest
-        location_chain = []
-
-        while current:
-            location_chain.insert(0, current)
-            name = getattr(current, f"name_{lang}", None) or current.name
-            path_parts.insert(0, name)
-            current = current.parent
-
-        path = " > ".join(path_parts)
+        name_lang = "uz" if request.query_params.get("lang") == "uz" else "ru"
+        serialized = _serialize(tree, *matches[0], name_lang, lang)
+        if k > 1:
+            serialized["candidates"] = [_serialize(tree, node, dist, name_lang, lang) for node, dist in matches]
+        return Response(serialized)
 
-        # Serialize the location
-        serialized = LocationSerializer(nearest, context={"request": request}).data
-        serialized["path"] = path
-        serialized["distance"] = min_distance
 
-        return Response(serialized)
+def _serialize(tree, node, distance_km: float, name_lang: str, lang: str):
+    return {
+        **_location_data(node, name_lang),
+        # The location path (from root to leaf)
+        "path": " > ".join(tree.location_path_names(node.id, lang)),
+        # Great-circle distance in kilometres
+        "distance": round(distance_km, 3),
+    }